@@ -0,0 +1,96 @@
+"""
+Exercise 5: scale-up benchmark for the parameterised file-lock net.
+
+For growing numbers of processes N, builds create_scaled_net(N, ...) and
+reports:
+- net-construction time
+- memory footprint of the built net (tracemalloc)
+- firings/second of a random driver, on the SNAKES backend and on the
+  compiled backend (both through petri_tools.EnablingTracker)
+
+    python3 benchmark_scale.py
+    python3 benchmark_scale.py --sizes 10 100 1000 10000 --read-ratio 0.5
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from exercise5 import create_scaled_net
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import CompiledNet, EnablingTracker
+
+
+def build(processes, files, read_ratio):
+    """Return (net, seconds, bytes) for one construction."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    net = create_scaled_net(processes, files, read_ratio)
+    seconds = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return net, seconds, size
+
+
+def random_run(tracker, firings, seed=0):
+    """
+    Fire up to `firings` random enabled transitions; return (firings/second,
+    firings made). Fewer are made if the net deadlocks first.
+    """
+    rnd = random.Random(seed)
+    names = [t.name for t in tracker.net.transition()]
+    done = 0
+    start = time.perf_counter()
+    for _ in range(firings):
+        enabled = [name for name in names if tracker.is_enabled(name)]
+        if not enabled:
+            break
+        name = rnd.choice(enabled)
+        tracker.fire(name, rnd.choice(tracker.modes(name)))
+        done += 1
+    return done / (time.perf_counter() - start), done
+
+
+def benchmark(sizes, read_ratio, firings, snakes_firings):
+    print("=" * 78)
+    print("EXERCISE 5: Scaled File-Lock Net Benchmark")
+    print(f"read_ratio={read_ratio}, files=max(1, N // 50)")
+    print("=" * 78)
+    print(f"{'N':>7} {'files':>6} {'build (ms)':>11} {'memory (KiB)':>13} "
+          f"{'SNAKES fire/s':>14} {'compiled fire/s':>16}")
+    print("-" * 78)
+    for n in sizes:
+        files = max(1, n // 50)
+        net, seconds, size = build(n, files, read_ratio)
+        snakes_rate, snakes_done = random_run(EnablingTracker(net),
+                                              snakes_firings)
+        net = create_scaled_net(n, files, read_ratio)
+        compiled_rate, compiled_done = random_run(
+            EnablingTracker(net, CompiledNet(net)), firings)
+        stopped = snakes_done < snakes_firings or compiled_done < firings
+        print(f"{n:>7} {files:>6} {seconds * 1000:>11.1f} {size / 1024:>13.1f} "
+              f"{snakes_rate:>14.0f} {compiled_rate:>16.0f}"
+              f"{' *' if stopped else ''}")
+        if stopped:
+            print(f"        * deadlocked after {snakes_done} SNAKES / "
+                  f"{compiled_done} compiled firings")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 100, 1000, 5000])
+    parser.add_argument('--read-ratio', type=float, default=0.25)
+    parser.add_argument('--firings', type=int, default=20000,
+                        help="random firings per size (compiled backend)")
+    parser.add_argument('--snakes-firings', type=int, default=200,
+                        help="random firings per size (SNAKES backend)")
+    args = parser.parse_args()
+    benchmark(args.sizes, args.read_ratio, args.firings, args.snakes_firings)
@@ -0,0 +1,120 @@
+"""
+Exercise 5: memory and copy cost of the marking representations.
+
+For growing create_scaled_net(N) nets, a random walk collects --markings
+reachable markings, which are then held in three forms:
+
+    SNAKES    snakes.nets.Marking of MultiSets
+    dicts     {place: {token: count}} (compiled form, petri_tools.CompiledNet)
+    compact   petri_tools.store.CompactMarking (counter array + interned
+              token-id arrays)
+
+and the benchmark reports bytes per marking (tracemalloc), microseconds
+per full copy, and microseconds per successor (copy-on-write firing:
+CompiledNet.successor vs CompactMarking.fire).
+
+    python3 benchmark_store.py
+    python3 benchmark_store.py --sizes 100 10000 --markings 100
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from exercise5 import create_scaled_net
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import CompiledNet
+from petri_tools.store import Layout
+from petri_tools.trace import to_counts, to_marking
+
+
+def walk(engine, steps, seed=0):
+    """(transition, binding) pairs and markings of a random run."""
+    rng = random.Random(seed)
+    marking = engine.marking
+    markings, firings = [], []
+    for _ in range(steps):
+        enabled = [(name, binding) for name in engine.transitions
+                   for binding in engine.modes(name, marking)]
+        if not enabled:
+            break
+        name, binding = rng.choice(enabled)
+        marking = engine.successor(marking, name, binding)
+        markings.append(marking)
+        firings.append((name, binding))
+    return markings, firings
+
+
+def footprint(convert, markings):
+    """Bytes per marking of [convert(m) for m in markings]."""
+    tracemalloc.start()
+    kept = [convert(marking) for marking in markings]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size / len(markings)
+
+
+def timed(function, items, repeat=1):
+    """Microseconds per call of function(item)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            function(item)
+    return (time.perf_counter() - start) / (repeat * len(items)) * 1e6
+
+
+def benchmark(sizes, count, read_ratio, seed):
+    print("=" * 78)
+    print("EXERCISE 5: Marking Representations (create_scaled_net)")
+    print(f"{count} random-walk markings per size, read_ratio={read_ratio}, "
+          f"files=max(1, N // 50)")
+    print("=" * 78)
+    print(f"{'N':>6} | {'bytes/marking':^26} | {'us/copy':^23} | "
+          f"{'us/successor':^15}")
+    print(f"{'':>6} | {'SNAKES':>8} {'dicts':>8} {'compact':>8} | "
+          f"{'SNAKES':>7} {'dicts':>7} {'compact':>7} | "
+          f"{'dicts':>7} {'compact':>7}")
+    print("-" * 78)
+    for n in sizes:
+        net = create_scaled_net(n, max(1, n // 50), read_ratio)
+        engine = CompiledNet(net)
+        layout = Layout(net)
+        markings, firings = walk(engine, count, seed)
+        packed = [layout.pack(marking) for marking in markings]  # interns
+        sizes_ = (footprint(to_marking, markings),
+                  footprint(to_counts, markings),
+                  footprint(layout.pack, markings))
+        snakes = [to_marking(marking) for marking in markings]
+        copies = (timed(lambda m: m.copy(), snakes),
+                  timed(to_counts, markings),
+                  timed(lambda m: m.copy(), packed))
+        # successor of every walked marking by the next firing of the walk
+        pairs = list(zip(markings, firings[1:]))
+        compact_pairs = list(zip(packed, firings[1:]))
+        successors = (
+            timed(lambda p: engine.successor(p[0], *p[1]), pairs),
+            timed(lambda p: p[0].fire(engine, *p[1]), compact_pairs))
+        for marking, compact in zip(markings, packed):
+            assert compact.unpack() == marking
+        print(f"{n:>6} | {sizes_[0]:>8.0f} {sizes_[1]:>8.0f} {sizes_[2]:>8.0f} "
+              f"| {copies[0]:>7.1f} {copies[1]:>7.1f} {copies[2]:>7.1f} "
+              f"| {successors[0]:>7.1f} {successors[1]:>7.1f}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 100, 1000, 5000])
+    parser.add_argument('--markings', type=int, default=200)
+    parser.add_argument('--read-ratio', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.sizes, args.markings, args.read_ratio, args.seed)
@@ -1,6 +1,28 @@
-import snakes.plugins
-snakes.plugins.load('gv', 'snakes.nets', 'nets')
-from nets import *
+"""
+Exercise 5: file locking, simulated step by step.
+
+Two processes read a file and then write it; a token-based Lock and an
+inhibitor arc (Writing --o StartWrite) keep the Writing critical section
+exclusive. The run fires a fixed sequence of eight steps, prints the
+marking after each one and draws PNG snapshots (petri_tools.Renderer);
+create_scaled_net() builds the same net for N processes and F files.
+
+    python3 exercise5.py
+    python3 exercise5.py --render final --quiet
+    python3 exercise5.py --render none --firings --trace trace.jsonl
+"""
+
+import os
+import sys
+
+# Plain SNAKES classes: the gv plugin is only loaded when a net is drawn
+from snakes.nets import *
+
+# Shared Petri net tooling (enabling tracker, ...) lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import EnablingTracker, Inhibitor, Renderer, TraceRecorder
+from petri_tools.drawing import PetriNet    # draw() loads the gv plugin
+from petri_tools.trace import print_firing
 
 # ==========================================
 # EXERCISE 5: File Locking with Test Arcs
@@ -12,16 +34,16 @@ from nets import *
 # 
 # This implementation showcases TWO locking mechanisms:
 # 1. Token-Based Lock (Primary): Uses a Lock place with tokens
-# 2. Test Arc Concept (Educational): Demonstrates test arc logic
+# 2. Inhibitor Arc: StartWrite may only fire while Writing is EMPTY
 # 
-# SNAKES Test Arcs: SNAKES doesn't have native inhibitor arcs,
-# but supports Test arcs via add_input with Test() instead of Variable().
+# SNAKES Test Arcs: add_input with Test() instead of Variable().
 # Test arcs READ tokens without CONSUMING them (test for presence).
 #
-# For inhibitor behavior (block if token exists), we use the inverse:
+# Inhibitor Arcs: add_input with Inhibitor() (petri_tools.Inhibitor).
 # - Normal: Fire WHEN token present
-# - Inhibitor: Fire WHEN token ABSENT  
-# We achieve this via guards checking place emptiness.
+# - Inhibitor: Fire WHEN token ABSENT
+# The emptiness check is part of the transition's enabling check and
+# looks at the place's token count only (O(1), no token listing).
 
 def create_net():
     """
@@ -32,9 +54,9 @@ def create_net():
     - StartWrite consumes lock
     - EndWrite returns lock
     
-    Mechanism 2: Test Arc Concept (Educational)
-    - Demonstrates testing place state without consuming tokens
-    - Shows how inhibitor behavior can be simulated
+    Mechanism 2: Inhibitor Arc
+    - Writing --o StartWrite: StartWrite is enabled only while the
+      critical section is empty (tested, nothing consumed)
     """
     n = PetriNet('Exercise 5 - Dual Lock Demonstration')
 
@@ -68,6 +90,7 @@ def create_net():
     n.add_transition(Transition('StartWrite'))
     n.add_input('ReadyToWrite', 'StartWrite', Variable('p'))
     n.add_input('Lock', 'StartWrite', Variable('lock'))  # Consumes lock
+    n.add_input('Writing', 'StartWrite', Inhibitor())    # Writing empty
     n.add_output('Writing', 'StartWrite', Variable('p'))
 
     # EndWrite: Writing → Idle
@@ -79,56 +102,157 @@ def create_net():
 
     return n
 
+def create_scaled_net(processes=2, files=1, read_ratio=0.0):
+    """
+    Generator variant of create_net() for load-testing the simulator and
+    the analysis tools at hundreds or thousands of processes.
+
+    processes  -- number of process tokens in Idle (ids 1..N)
+    files      -- number of files, each protected by its own lock token
+    read_ratio -- fraction of processes that only read (they go back from
+                  Reading to Idle and never take a lock); the others are
+                  writers and follow the create_net() cycle
+
+    With files=1 the structure is exactly create_net() (integer process
+    tokens, one 'available' lock). With files>1, process tokens become
+    (p, f) pairs, process p works on file f = (p - 1) % files + 1, and
+    Lock holds one token per file id; StartWrite unifies f between the
+    ReadyToWrite token and the Lock token, so each file is locked on its own.
+    create_scaled_net(2) builds the same net as create_net().
+    """
+    readers = int(round(processes * read_ratio))
+    writers = processes - readers
+    n = PetriNet(f'Exercise 5 - Scaled Lock Net '
+                 f'({processes} processes, {files} files)')
+    n.globals['writers'] = writers  # ids 1..writers write, the rest only read
+
+    if files == 1:
+        proc = Variable('p')
+        idle = list(range(1, processes + 1))
+        locks = ['available']
+        lock_in, lock_out = Variable('lock'), Expression("'available'")
+    else:
+        proc = Tuple([Variable('p'), Variable('f')])
+        idle = [(p, (p - 1) % files + 1) for p in range(1, processes + 1)]
+        locks = list(range(1, files + 1))
+        lock_in, lock_out = Variable('f'), Variable('f')
+
+    n.add_place(Place('Idle', idle))
+    n.add_place(Place('Reading', []))
+    n.add_place(Place('ReadyToWrite', []))
+    n.add_place(Place('Writing', []))
+    n.add_place(Place('Lock', locks))
+
+    n.add_transition(Transition('StartRead'))
+    n.add_input('Idle', 'StartRead', proc)
+    n.add_output('Reading', 'StartRead', proc)
+
+    # Only writers move on to ReadyToWrite; readers go straight back
+    n.add_transition(Transition('EndRead', Expression('p <= writers')
+                                if readers else None))
+    n.add_input('Reading', 'EndRead', proc)
+    n.add_output('ReadyToWrite', 'EndRead', proc)
+    if readers:
+        n.add_transition(Transition('FinishRead', Expression('p > writers')))
+        n.add_input('Reading', 'FinishRead', proc)
+        n.add_output('Idle', 'FinishRead', proc)
+
+    n.add_transition(Transition('StartWrite'))
+    n.add_input('ReadyToWrite', 'StartWrite', proc)
+    n.add_input('Lock', 'StartWrite', lock_in)
+    if files == 1:
+        # Per-file locks would need a per-file inhibitor; one file: as create_net()
+        n.add_input('Writing', 'StartWrite', Inhibitor())
+    n.add_output('Writing', 'StartWrite', proc)
+
+    n.add_transition(Transition('EndWrite'))
+    n.add_input('Writing', 'EndWrite', proc)
+    n.add_output('Idle', 'EndWrite', proc)
+    n.add_output('Lock', 'EndWrite', lock_out)
+
+    return n
+
 def demonstrate_test_arc_concept(net):
     """
-    Educational function demonstrating Test Arc CONCEPT.
+    Educational function demonstrating Test and Inhibitor Arcs.
     
     In formal Petri net theory:
     - Test Arc: Reads token presence WITHOUT consuming it
     - Inhibitor Arc: Blocks transition WHEN token is present
     
-    SNAKES Implementation Notes:
-    - SNAKES supports Test() for non-consuming reads
-    - Inhibitor arcs must be simulated via guards or procedural checks
-    - This function demonstrates the conceptual behavior
+    The test arc is a real SNAKES `Test` arc: a copy of the net gets a
+    probe transition LockFree reading Lock through
+    `Test(Value('available'))`. It has a mode exactly when the lock is
+    free, and firing it leaves the Lock token where it was. The inhibitor
+    arc is the one on StartWrite, answered by `label.check(...)` (the
+    test SNAKES runs when deciding whether StartWrite is enabled). The
+    simulated net itself is not changed.
     """
-    writing_tokens = list(net.place('Writing').tokens)
-    lock_tokens = list(net.place('Lock').tokens)
+    writing, inhibitor = [(place, label)
+                          for place, label in net.transition('StartWrite').input()
+                          if place.name == 'Writing'][0]
+    probe = net.copy()
+    probe.add_transition(Transition('LockFree'))
+    probe.add_input('Lock', 'LockFree', Test(Value('available')))
+    lock_free = probe.transition('LockFree')
+    lock = probe.place('Lock')
     
     print("    " + "=" * 60)
     print("    TEST ARC CONCEPT DEMONSTRATION")
     print("    " + "=" * 60)
-    print(f"    Writing place: {writing_tokens}")
-    print(f"    Lock place: {lock_tokens}")
+    print(f"    Writing place: {len(writing.tokens)} token(s)")
+    print(f"    Lock place: {len(lock.tokens)} token(s)")
     print()
     
-    # Test Arc Logic: Check WITHOUT consuming
-    if len(lock_tokens) > 0:
+    # Test Arc Logic: the probe fires WITHOUT consuming the lock token
+    modes = lock_free.modes()
+    if modes:
+        lock_free.fire(modes[0])
         print("    ✓ TEST ARC: Lock token is PRESENT")
-        print("    → StartWrite transition CAN fire (lock available)")
+        print(f"    → Lock -[test]-> LockFree fired, Lock still holds "
+              f"{len(lock.tokens)} token(s)")
+        print("    → StartWrite's consuming Lock arc CAN be satisfied")
     else:
         print("    ✗ TEST ARC: Lock token is ABSENT")
-        print("    → StartWrite transition is BLOCKED (lock held)")
+        print("    → LockFree has no mode: the lock is held")
     
-    # Inhibitor Arc Logic: Block WHEN present
-    if len(writing_tokens) > 0:
+    # Inhibitor Arc Logic: Block WHEN present (O(1) emptiness check)
+    if not inhibitor.check(Substitution(), writing.tokens):
         print()
-        print("    ✗ INHIBITOR CONCEPT: Writing place is NOT EMPTY")
-        print("    → If we had an inhibitor arc, StartWrite would be BLOCKED")
-        print("    → Our token-based lock achieves the same mutual exclusion")
+        print("    ✗ INHIBITOR ARC: Writing place is NOT EMPTY")
+        print("    → StartWrite is BLOCKED by its inhibitor arc")
+        print("    → The token-based lock enforces the same mutual exclusion")
     else:
         print()
-        print("    ✓ INHIBITOR CONCEPT: Writing place is EMPTY")
-        print("    → No inhibitor arc would block this")
+        print("    ✓ INHIBITOR ARC: Writing place is EMPTY")
+        print("    → The inhibitor arc does not block StartWrite")
     
     print("    " + "=" * 60)
     print()
 
-def run_simulation():
+def run_simulation(render='all', every=1, verbose=True, trace_path=None,
+                   firings=False):
     """
     Runs simulation with educational commentary on locking mechanisms.
+
+    Every firing is logged as a delta record in a petri_tools.TraceRecorder
+    (returned). The marking dumps after each step read the trace and are
+    skipped with verbose=False; trace_path also writes it to a JSONL file,
+    firings=True prints one line per record.
+
+    render -- when PNG snapshots are drawn: 'none', 'final', 'every'
+              (every `every`-th step), 'all', 'parallel' (process pool
+              during the run) or 'deferred' (rendered after the run),
+              see petri_tools.Renderer
     """
     net = create_net()
+    renderer = Renderer(net, render, every)
+    trace = TraceRecorder(net.get_marking(), path=trace_path)
+    if firings:
+        trace.subscribe(print_firing)
+    # Keeps the modes of every transition up to date after each firing,
+    # re-checking only the transitions next to the places that changed
+    tracker = EnablingTracker(net)
     
     print("=" * 70)
     print("EXERCISE 5: File Locking - Academic Implementation")
@@ -141,17 +265,23 @@ def run_simulation():
 
     def save_state(step_name, description=""):
         filename = f"simulation_{step_name}.png"
-        net.draw(filename)
+        drawn = renderer.snapshot(filename)
         print(f"    [{step_name}] {description}")
-        print(f"    Saved: {filename}")
+        if drawn:
+            print(f"    Saved: {filename}")
         print()
 
+    def fire(name, binding):
+        trace.record(name, binding, tracker.fire(name, binding))
+
     def show_marking():
-        print(f"    Marking: Idle={list(net.place('Idle').tokens)}, "
-              f"Reading={list(net.place('Reading').tokens)}, "
-              f"ReadyToWrite={list(net.place('ReadyToWrite').tokens)}, "
-              f"Writing={list(net.place('Writing').tokens)}, "
-              f"Lock={list(net.place('Lock').tokens)}")
+        if not verbose:
+            return
+        print(f"    Marking: Idle={trace.tokens('Idle')}, "
+              f"Reading={trace.tokens('Reading')}, "
+              f"ReadyToWrite={trace.tokens('ReadyToWrite')}, "
+              f"Writing={trace.tokens('Writing')}, "
+              f"Lock={trace.tokens('Lock')}")
         print()
 
     # === SIMULATION SEQUENCE ===
@@ -160,28 +290,28 @@ def run_simulation():
     show_marking()
 
     print("[STEP 1] Process 1 starts reading...")
-    net.transition('StartRead').fire(Substitution(p=1))
+    fire('StartRead', Substitution(p=1))
     save_state("01_P1_Reading", "Process 1 reading file")
     show_marking()
 
     print("[STEP 2] Process 1 finishes reading...")
-    net.transition('EndRead').fire(Substitution(p=1))
+    fire('EndRead', Substitution(p=1))
     save_state("02_P1_ReadyToWrite", "Process 1 ready to write")
     show_marking()
 
     print("[STEP 3] Process 1 acquires lock and enters critical section...")
     demonstrate_test_arc_concept(net)
-    net.transition('StartWrite').fire(Substitution(p=1, lock='available'))
+    fire('StartWrite', Substitution(p=1, lock='available'))
     save_state("03_P1_Writing", "Process 1 WRITING (lock held)")
     show_marking()
 
     print("[STEP 4] Process 2 starts reading (concurrent)...")
-    net.transition('StartRead').fire(Substitution(p=2))
+    fire('StartRead', Substitution(p=2))
     save_state("04_P2_Reading", "Process 2 reading while P1 writes")
     show_marking()
     
     print("[STEP 5] Process 2 finishes reading, wants to write...")
-    net.transition('EndRead').fire(Substitution(p=2))
+    fire('EndRead', Substitution(p=2))
     save_state("05_P2_ReadyToWrite_BLOCKED", "P2 BLOCKED - lock unavailable")
     show_marking()
     
@@ -190,8 +320,8 @@ def run_simulation():
     print("    " + "=" * 60)
     demonstrate_test_arc_concept(net)
     
-    # Check if StartWrite can fire
-    modes = list(net.transition('StartWrite').modes())
+    # Check if StartWrite can fire (cached by the tracker, no re-scan)
+    modes = tracker.modes('StartWrite')
     if not modes:
         print("    ✓ SUCCESS: StartWrite has NO valid modes")
         print("    → Process 2 is blocked from entering Writing")
@@ -202,35 +332,55 @@ def run_simulation():
     print()
 
     print("[STEP 6] Process 1 finishes writing, releases lock...")
-    net.transition('EndWrite').fire(Substitution(p=1))
+    fire('EndWrite', Substitution(p=1))
     save_state("06_P1_Idle_LockReleased", "P1 done, lock returned")
     show_marking()
 
     print("[STEP 7] Process 2 can now acquire lock...")
     demonstrate_test_arc_concept(net)
-    net.transition('StartWrite').fire(Substitution(p=2, lock='available'))
+    fire('StartWrite', Substitution(p=2, lock='available'))
     save_state("07_P2_Writing", "Process 2 now WRITING")
     show_marking()
     
     print("[STEP 8] Process 2 finishes...")
-    net.transition('EndWrite').fire(Substitution(p=2))
+    fire('EndWrite', Substitution(p=2))
     save_state("08_P2_Idle_Final", "Both processes idle, lock available")
     show_marking()
 
+    images = renderer.close()
+    trace.close()
     print("=" * 70)
     print("[*] Simulation Complete!")
-    print("[*] Generated 9 PNG images demonstrating mutual exclusion.")
+    print(f"[*] Generated {len(images)} PNG images demonstrating mutual exclusion.")
     print("=" * 70)
     print()
     print("THEORETICAL SUMMARY:")
     print("- Token-Based Lock: Primary mechanism (formal Petri net)")
-    print("- Test Arc Concept: Educational demonstration (procedural)")
-    print("- Both achieve mutual exclusion for the Writing critical section")
+    print("- Inhibitor Arc: Writing --o StartWrite (formal Petri net)")
+    print("- Test Arc: Lock -[test]-> LockFree probe, reads without consuming")
+    print("- Lock and inhibitor both enforce mutual exclusion for Writing")
     print("=" * 70)
+    return trace
 
 if __name__ == "__main__":
+    import argparse
+    from petri_tools.rendering import MODES
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--render', choices=MODES, default='all',
+                        help="which marking snapshots are drawn with Graphviz")
+    parser.add_argument('--render-every', type=int, default=1, metavar='K',
+                        help="with --render every: draw every K-th step")
+    parser.add_argument('--quiet', action='store_true',
+                        help="do not print the marking after each step")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write the firing trace to FILE (JSONL)")
+    parser.add_argument('--firings', action='store_true',
+                        help="print one delta line per firing")
+    args = parser.parse_args()
     try:
-        run_simulation()
+        run_simulation(args.render, args.render_every, not args.quiet,
+                       args.trace, args.firings)
     except Exception as e:
         print(f"Error: {e}")
         import traceback
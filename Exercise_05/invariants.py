@@ -0,0 +1,85 @@
+"""
+Exercise 5: structural analysis of the file-lock net (no simulation).
+
+The incidence matrix of create_net() is read off the arcs and its
+P-invariants are computed with petri_tools.structure. The invariant
+Lock + Writing = 1 holds in every reachable marking, so Writing is
+bounded by 1: mutual exclusion is proven before any state is explored.
+
+On the P/T expansion (one place per (place, token), petri_tools.expand)
+the same analysis gives one invariant per process plus the lock law
+Lock['available'] + Writing[1] + ... + Writing[N] = 1. The benchmark
+times it for create_scaled_net(N) with thousands of places/transitions.
+
+    python3 invariants.py                   # create_net() + N = 10 .. 1000
+    python3 invariants.py --sizes 100 2000
+"""
+
+import os
+import sys
+import time
+
+from exercise5 import create_net, create_scaled_net
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools.expand import expand
+from petri_tools.structure import analyse, label
+
+
+def report(structure):
+    """Print invariants and bounds of an analysed net."""
+    print(f"  {structure}")
+    for invariant in structure.p_invariants:
+        print(f"    P-invariant: {structure.law(invariant)}")
+    for invariant in structure.t_invariants:
+        print(f"    T-invariant: {structure.cycle(invariant)}")
+    for place, bound in zip(structure.places, structure.bounds):
+        print(f"    bound {label(place)}: {'-' if bound is None else bound}")
+
+
+def prove_mutual_exclusion(structure):
+    """Writing <= 1 from the P-invariant Lock + Writing = 1."""
+    total = structure.is_p_invariant({'Lock': 1, 'Writing': 1})
+    writing = structure.bounds[structure.places.index('Writing')]
+    print(f"  Lock + Writing = {total} in every reachable marking "
+          f"=> Writing <= {writing}: "
+          f"{'mutual exclusion PROVEN' if writing == 1 else 'not proven'}")
+    return writing == 1
+
+
+def benchmark(sizes):
+    print("=" * 78)
+    print("EXERCISE 5: Structural Analysis of the File-Lock Net")
+    print("=" * 78)
+    print("create_net(), colour-blind token counts:")
+    structure = analyse(create_net())
+    report(structure)
+    prove_mutual_exclusion(structure)
+    print("create_net(), P/T expansion:")
+    report(analyse(expand(create_net())))
+    print("-" * 78)
+    print(f"{'N':>6} {'places':>7} {'trans':>7} {'P-inv':>6} {'T-inv':>6} "
+          f"{'bounded':>8} {'expand s':>9} {'analyse s':>10}")
+    for n in sizes:
+        start = time.perf_counter()
+        ptnet = expand(create_scaled_net(n))
+        expanded = time.perf_counter() - start
+        structure = analyse(ptnet)
+        print(f"{n:>6} {len(structure.places):>7} "
+              f"{len(structure.transitions):>7} "
+              f"{len(structure.p_invariants):>6} "
+              f"{len(structure.t_invariants):>6} "
+              f"{'all' if structure.conservative else 'no':>8} "
+              f"{expanded:>9.2f} {structure.seconds:>10.2f}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 100, 500, 1000])
+    args = parser.parse_args()
+    benchmark(args.sizes)
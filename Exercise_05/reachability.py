@@ -0,0 +1,173 @@
+"""
+Exercise 5: full reachability graph of the file-lock net.
+
+run_simulation() in exercise5.py demonstrates mutual exclusion along ONE
+hand-written firing sequence. This script builds the COMPLETE
+reachability graph of the create_net() structure with N processes in
+Idle (create_scaled_net(N)), and checks on every reachable marking that
+Writing never holds more than one token. It also reports deadlocks and
+states/second.
+
+    python3 reachability.py            # N = 2 .. 10
+    python3 reachability.py --max-n 12 # up to 12 processes (~2.7M states)
+    python3 reachability.py --por      # full vs stubborn-set reduced graph
+    python3 reachability.py --por --full-max-n 10 --max-n 40
+    python3 reachability.py --symmetry --max-n 40
+
+With --por the same checks run on the partial-order reduced graph
+(stubborn sets, petri_tools.stubborn): once with Writing as the only
+visible place (mutual exclusion) and once without an invariant
+(deadlocks only, maximal reduction). The full graph is built only up to
+--full-max-n for comparison.
+
+With --symmetry the process ids 1..N are declared interchangeable
+(petri_tools.symmetry): one marking per class of markings equal up to
+renaming processes, C(N+2, 2) + C(N+1, 2) classes instead of
+3^N + N * 3^(N-1) markings.
+"""
+
+import os
+import sys
+
+from exercise5 import create_scaled_net
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import explore
+
+
+def mutual_exclusion(marking):
+    """Safety property: at most one process in the critical section."""
+    return sum(marking['Writing'].values()) <= 1
+
+
+def expected_states(processes):
+    """
+    Closed form for this net: without the lock each process is in one of
+    Idle/Reading/ReadyToWrite (3^N), plus one writer and N-1 others.
+    """
+    return 3 ** processes + processes * 3 ** (processes - 1)
+
+
+def analyse(processes):
+    """Explore the N-process lock net and return the StateSpace."""
+    return explore(create_scaled_net(processes), invariant=mutual_exclusion)
+
+
+def analyse_reduced(processes, invariant=True):
+    """Stubborn-set reduced exploration of the N-process lock net."""
+    if invariant:
+        return explore(create_scaled_net(processes), invariant=mutual_exclusion,
+                       reduction="stubborn", visible=['Writing'])
+    return explore(create_scaled_net(processes), reduction="stubborn")
+
+
+def expected_classes(processes):
+    """
+    Closed form up to process renaming: how many processes are in
+    Idle/Reading/ReadyToWrite, with nobody or one process writing.
+    """
+    return ((processes + 2) * (processes + 1) // 2
+            + (processes + 1) * processes // 2)
+
+
+def analyse_symmetric(processes):
+    """Explore the N-process lock net up to renaming of the processes."""
+    return explore(create_scaled_net(processes), invariant=mutual_exclusion,
+                   symmetry=[range(1, processes + 1)])
+
+
+def benchmark(max_n=10, min_n=2):
+    print("=" * 78)
+    print("EXERCISE 5: Reachability Graph of the File-Lock Net")
+    print("=" * 78)
+    print(f"{'N':>3} {'states':>10} {'edges':>11} {'deadlocks':>9} "
+          f"{'Writing<=1':>10} {'seconds':>8} {'states/s':>10}")
+    print("-" * 78)
+    for n in range(min_n, max_n + 1):
+        space = analyse(n)
+        assert space.states == expected_states(n), "unexpected state count"
+        print(f"{n:>3} {space.states:>10} {space.edges:>11} "
+              f"{len(space.deadlocks):>9} "
+              f"{'OK' if not space.violations else 'VIOLATED':>10} "
+              f"{space.seconds:>8.2f} {space.states_per_second:>10.0f}")
+        for key in space.violations[:3]:
+            print(f"    counter-example: {space.marking(key)}")
+        for key in space.deadlocks[:3]:
+            print(f"    deadlock: {space.marking(key)}")
+    print("=" * 78)
+
+
+def benchmark_por(max_n=20, min_n=2, full_max_n=9):
+    print("=" * 78)
+    print("EXERCISE 5: Full vs Partial-Order Reduced State Space")
+    print("=" * 78)
+    print(f"{'N':>3} {'full':>9} {'sec':>6} {'reduced':>8} {'sec':>6} "
+          f"{'dl-only':>8} {'sec':>6} {'deadlocks':>9} {'Writing<=1':>10}")
+    print("-" * 78)
+    for n in range(min_n, max_n + 1):
+        if n <= full_max_n:
+            full = analyse(n)
+            full_cols = f"{full.states:>9} {full.seconds:>6.2f}"
+        else:
+            full, full_cols = None, f"{'-':>9} {'-':>6}"
+        safe = analyse_reduced(n)
+        dead = analyse_reduced(n, invariant=False)
+        if full is not None:
+            assert len(full.deadlocks) == len(dead.deadlocks)
+            assert bool(full.violations) == bool(safe.violations)
+        print(f"{n:>3} {full_cols} {safe.states:>8} {safe.seconds:>6.2f} "
+              f"{dead.states:>8} {dead.seconds:>6.2f} "
+              f"{len(dead.deadlocks):>9} "
+              f"{'OK' if not safe.violations else 'VIOLATED':>10}")
+        for key in safe.violations[:3]:
+            print(f"    counter-example: {safe.marking(key)}")
+        for key in dead.deadlocks[:3]:
+            print(f"    deadlock: {dead.marking(key)}")
+    print("=" * 78)
+
+
+def benchmark_symmetry(max_n=20, min_n=2, full_max_n=9):
+    print("=" * 78)
+    print("EXERCISE 5: Full vs Symmetry-Reduced State Space")
+    print("=" * 78)
+    print(f"{'N':>3} {'full':>9} {'sec':>6} {'classes':>8} {'edges':>8} "
+          f"{'sec':>6} {'deadlocks':>9} {'Writing<=1':>10}")
+    print("-" * 78)
+    for n in range(min_n, max_n + 1):
+        if n <= full_max_n:
+            full = analyse(n)
+            full_cols = f"{full.states:>9} {full.seconds:>6.2f}"
+        else:
+            full_cols = f"{'-':>9} {'-':>6}"
+        space = analyse_symmetric(n)
+        assert space.states == expected_classes(n), "unexpected class count"
+        print(f"{n:>3} {full_cols} {space.states:>8} {space.edges:>8} "
+              f"{space.seconds:>6.2f} {len(space.deadlocks):>9} "
+              f"{'OK' if not space.violations else 'VIOLATED':>10}")
+        for key in space.violations[:3]:
+            print(f"    counter-example: {space.marking(key)}")
+        for key in space.deadlocks[:3]:
+            print(f"    deadlock: {space.marking(key)}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-n', type=int, default=2)
+    parser.add_argument('--max-n', type=int, default=10)
+    parser.add_argument('--por', action='store_true',
+                        help='compare with the stubborn-set reduced graph')
+    parser.add_argument('--symmetry', action='store_true',
+                        help='compare with the graph up to process renaming')
+    parser.add_argument('--full-max-n', type=int, default=9,
+                        help='with --por/--symmetry: largest N for the full graph')
+    args = parser.parse_args()
+    if args.symmetry:
+        benchmark_symmetry(args.max_n, args.min_n, args.full_max_n)
+    elif args.por:
+        benchmark_por(args.max_n, args.min_n, args.full_max_n)
+    else:
+        benchmark(args.max_n, args.min_n)
@@ -0,0 +1,70 @@
+"""
+Exercise 5: symbolic (BDD) verification of the N-process lock net.
+
+petri_tools.symbolic computes the reachable markings of create_scaled_net(N)
+as one binary decision diagram and checks on it that no reachable marking
+has two tokens in Writing, and that no reachable marking is dead. The
+BDD grows linearly in N while the number of markings grows as 3^N, so
+the check runs at process counts whose explicit state space would never
+fit in memory. Up to --explicit-max-n the explicit search (explore())
+runs too, for comparison.
+
+    python3 verify_symbolic.py
+    python3 verify_symbolic.py --sizes 10 100 300 --explicit-max-n 9
+"""
+
+import os
+import sys
+
+from exercise5 import create_scaled_net
+from reachability import mutual_exclusion
+from verify_unfolding import measured
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import explore
+from petri_tools.symbolic import reachable
+
+
+def verify(processes):
+    """Reachable set of the N-process lock net, violations, deadlocks."""
+    space = reachable(create_scaled_net(processes))
+    return space, space.at_least(['Writing'], 2), space.deadlocks()
+
+
+def benchmark(sizes, explicit_max_n):
+    print("=" * 78)
+    print("EXERCISE 5: Symbolic (BDD) Verification of the Lock Net")
+    print("=" * 78)
+    print(f"{'N':>4} {'states':>11} {'nodes':>6} {'sec':>7} {'KiB':>8} "
+          f"{'Writing<=1':>10} {'deadlock':>8} | {'explicit s':>10} "
+          f"{'KiB':>8}")
+    print("-" * 78)
+    for n in sizes:
+        (space, two, dead), seconds, peak = measured(verify, n)
+        explicit = f"{'-':>10} {'-':>8}"
+        if n <= explicit_max_n:
+            full, e_seconds, e_peak = measured(
+                explore, create_scaled_net(n), invariant=mutual_exclusion)
+            assert full.states == space.states
+            explicit = f"{e_seconds:>10.2f} {e_peak / 1024:>8.0f}"
+        print(f"{n:>4} {space.states:>11.3g} {space.nodes:>6} "
+              f"{seconds:>7.2f} {peak / 1024:>8.0f} "
+              f"{'VIOLATED' if two else 'OK':>10} "
+              f"{'yes' if dead else 'no':>8} | {explicit}")
+        if two:
+            print(f"    counter-example: {space.marking(two)}")
+        if dead:
+            print(f"    deadlock: {space.marking(dead)}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[2, 5, 8, 10, 20, 50])
+    parser.add_argument('--explicit-max-n', type=int, default=8)
+    args = parser.parse_args()
+    benchmark(args.sizes, args.explicit_max_n)
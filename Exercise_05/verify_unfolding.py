@@ -0,0 +1,124 @@
+"""
+Exercise 5: verification of the N-process lock net on its unfolding.
+
+Two questions, answered on a complete finite prefix of the unfolding
+(petri_tools.unfolding) instead of the reachability graph:
+
+    "can two tokens ever be in Writing?"   Prefix.coverable(['Writing'], 2)
+    "is there a reachable deadlock?"       Prefix.deadlock()
+
+The prefix holds each firing once instead of every interleaving, so it
+grows polynomially in N where the reachability graph grows as 3^N. For
+every N the benchmark reports prefix size, time and peak memory
+(tracemalloc) and, up to --explicit-max-n, the same for explore().
+
+    python3 verify_unfolding.py
+    python3 verify_unfolding.py --sizes 2 5 10 20 50 --explicit-max-n 10
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+from exercise5 import create_scaled_net
+from reachability import mutual_exclusion
+from snakes.nets import PetriNet, Place, Transition, Value, dot
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import explore
+from petri_tools.unfolding import unfold
+
+
+def measured(function, *args, **kwargs):
+    """Return (result, seconds, peak bytes) of one call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def verify(processes):
+    """Unfold the N-process lock net and answer both questions."""
+    prefix = unfold(create_scaled_net(processes))
+    return prefix, prefix.coverable(['Writing'], 2), prefix.deadlock()
+
+
+def cutoff_consumers(prefix):
+    """Events of `prefix` consuming a condition produced by a cut-off."""
+    return [e for e, preset in enumerate(prefix.preset)
+            if any(prefix.producer[b] is not None
+                   and prefix.cutoff[prefix.producer[b]] for b in preset)]
+
+
+def check_cutoffs():
+    """
+    Nothing is appended after a cut-off event. In this net the A cycle
+    (t1, t2) returns to its initial marking after two events, a cut-off
+    whose a1 condition is concurrent with b4, reached later by u1..u3;
+    Sync must only consume the initial a1.
+    """
+    n = PetriNet('cut-off')
+    for name in ('a1', 'a2', 'b1', 'b2', 'b3', 'b4', 'done'):
+        n.add_place(Place(name, [dot] if name in ('a1', 'b1') else []))
+    for name, src, dst in (('t1', 'a1', 'a2'), ('t2', 'a2', 'a1'),
+                           ('u1', 'b1', 'b2'), ('u2', 'b2', 'b3'),
+                           ('u3', 'b3', 'b4')):
+        n.add_transition(Transition(name))
+        n.add_input(src, name, Value(dot))
+        n.add_output(dst, name, Value(dot))
+    n.add_transition(Transition('Sync'))
+    n.add_input('a1', 'Sync', Value(dot))
+    n.add_input('b4', 'Sync', Value(dot))
+    n.add_output('done', 'Sync', Value(dot))
+    prefix = unfold(n)
+    assert any(prefix.cutoff), prefix
+    assert cutoff_consumers(prefix) == [], cutoff_consumers(prefix)
+    assert [prefix.ptnet.instances[t][0] for t in prefix.events].count('Sync') == 1
+    for processes in (2, 5):
+        assert cutoff_consumers(unfold(create_scaled_net(processes))) == []
+
+
+def benchmark(sizes, explicit_max_n):
+    check_cutoffs()
+    print("=" * 78)
+    print("EXERCISE 5: Unfolding vs Explicit Verification of the Lock Net")
+    print("=" * 78)
+    print(f"{'N':>4} {'events':>7} {'conds':>7} {'sec':>7} {'KiB':>8} "
+          f"{'2 Writing':>9} {'deadlock':>8} | {'states':>8} {'sec':>7} "
+          f"{'KiB':>8}")
+    print("-" * 78)
+    for n in sizes:
+        (prefix, two, dead), seconds, peak = measured(verify, n)
+        explicit = f"{'-':>8} {'-':>7} {'-':>8}"
+        if n <= explicit_max_n:
+            space, e_seconds, e_peak = measured(
+                explore, create_scaled_net(n), invariant=mutual_exclusion)
+            assert bool(space.violations) == (two is not None)
+            assert bool(space.deadlocks) == (dead is not None)
+            explicit = (f"{space.states:>8} {e_seconds:>7.2f} "
+                        f"{e_peak / 1024:>8.0f}")
+        print(f"{n:>4} {len(prefix.events):>7} {len(prefix.conditions):>7} "
+              f"{seconds:>7.2f} {peak / 1024:>8.0f} "
+              f"{'yes' if two else 'no':>9} {'yes' if dead else 'no':>8} | "
+              f"{explicit}")
+        if two:
+            print(f"    two writers after: {two}")
+        if dead:
+            print(f"    deadlock after: {dead}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[2, 4, 6, 8, 10, 20, 40])
+    parser.add_argument('--explicit-max-n', type=int, default=9)
+    args = parser.parse_args()
+    benchmark(args.sizes, args.explicit_max_n)
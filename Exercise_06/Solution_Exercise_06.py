@@ -1,6 +1,28 @@
-import snakes.plugins
-snakes.plugins.load('gv', 'snakes.nets', 'nets')
-from nets import *
+"""
+Exercise 6: the E-Scooter sharing CPN, simulated step by step.
+
+Commuters reserve a scooter, ride it and pay from their balance
+(ProcessPayment, or PaymentDeclined when the balance is too low); paid
+rides end up in the BillingHistory ledger. The run fires a fixed
+scenario on the SNAKES or the compiled backend (petri_tools.CompiledNet)
+and draws PNG snapshots; create_fleet_net() and create_city_net() build
+the same net for whole fleets.
+
+    python3 Solution_Exercise_06.py
+    python3 Solution_Exercise_06.py --backend compiled --render none
+    python3 Solution_Exercise_06.py --ledger billing.csv --quiet
+"""
+
+import os
+import random
+import sys
+
+# Plain SNAKES classes: the gv plugin is only loaded when a net is drawn
+from snakes.nets import *
+
+# Shared Petri net tooling (compiled backend, ...) lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools.drawing import PetriNet    # draw() loads the gv plugin
 
 # ==========================================
 # EXERCISE 6: E-Scooter CPN Model (A++ Version)
@@ -15,9 +37,53 @@ from nets import *
 # 4. Clock-based timestamps for realistic duration
 # 5. Design rationale documentation
 
-def create_net():
+def calculate_cost(duration_minutes):
+    """Ride tariff: 1.00€ unlock fee + 0.20€ per minute (rounded to cents)."""
+    return round(1.0 + (duration_minutes * 0.20), 2)
+
+def advance_clock(target, minutes):
+    """
+    Moves the single Clock token forward by `minutes` (time passing
+    outside the net). `target` is a SNAKES net or a petri_tools.CompiledNet.
+    """
+    if hasattr(target, 'marking'):
+        (now,) = target.marking['Clock']
+        target.marking['Clock'] = {now + minutes: 1}
+    else:
+        (now,) = target.place('Clock').tokens
+        target.place('Clock').reset([now + minutes])
+    return now + minutes
+
+# Initial tokens of the exercise scenario
+COMMUTERS = [('UserA', 10), ('UserB', 50)]
+SCOOTERS = [
+    ('Scooter1', 'StationMain'),
+    ('Scooter2', 'StationPark'),
+    ('Scooter3', 'StationWest')
+]
+
+def create_net(keyed=False, commuters=COMMUTERS, scooters=SCOOTERS,
+               clock=600, name='E-Scooter CPN - Enhanced', stations=None,
+               ledger=None):
     """
     Creates an enhanced Coloured Petri Net (CPN) for E-Scooter System.
+
+    The initial CommuterPool / ScooterPool / Clock tokens default to the
+    exercise scenario; create_fleet_net() passes generated ones.
+
+    With keyed=True, CommuterPool and ScooterPool are
+    petri_tools.KeyedPlace stores (indexed by UserID / ScooterID, and
+    ScooterPool also by Location) instead of flat multisets.
+
+    stations -- {Location: (x, y)} for a city net (see create_city_net()):
+                commuters carry their position, a Stations place lists the
+                coordinates, EndRide docks the scooter at a station `dest`
+                and the commuter continues from there. With keyed=True,
+                ScooterPool is a petri_tools.spatial.SpatialPlace.
+    ledger   -- petri_tools.Ledger: BillingHistory becomes a SinkPlace that
+                streams its tokens to the ledger instead of keeping them
+
+    Guards and arc expressions are petri_tools.guards.CachedExpression.
     
     Color Sets:
     - Commuter: (UserID: str, Wallet: int)
@@ -25,8 +91,25 @@ def create_net():
     - Reservation: (UserID: str, ScooterID: str, Wallet: int)
     - ActiveRide: (UserID: str, ScooterID: str, StartTime: int, Wallet: int)
     - Bill: (UserID: str, Cost: float, Wallet: int)
+    City net: Commuter and Bill also carry the position (X, Y), and
+    - Station: (Location: str, X: float, Y: float)
     """
-    n = PetriNet('E-Scooter CPN - Enhanced')
+    n = PetriNet(name)
+    # Functions callable from arc expressions and guards
+    n.globals['calculate_cost'] = calculate_cost
+    if keyed:
+        from petri_tools import KeyedPlace
+        commuter_place = lambda name, tokens: KeyedPlace(name, tokens, key=0)
+        scooter_place = lambda name, tokens: KeyedPlace(name, tokens,
+                                                        key=0, index=1)
+        if stations is not None:
+            from petri_tools.spatial import SpatialPlace
+            scooter_place = lambda name, tokens: SpatialPlace(
+                name, tokens, key=0, index=1, positions=stations)
+    else:
+        commuter_place = scooter_place = Place
+    # Commuter position (x, y) in a city net, carried until the next Reserve
+    where = [Variable('x'), Variable('y')] if stations is not None else []
 
     # -----------------------------------------------------------------------
     # PLACES
@@ -34,19 +117,15 @@ def create_net():
     
     # CommuterPool: Idle users
     # Token: (UserID, WalletBalance)
-    n.add_place(Place('CommuterPool', [('UserA', 10), ('UserB', 50)]))
+    n.add_place(commuter_place('CommuterPool', commuters))
 
     # ScooterPool: Available scooters
     # Token: (ScooterID, Location)
-    n.add_place(Place('ScooterPool', [
-        ('Scooter1', 'StationMain'), 
-        ('Scooter2', 'StationPark'),
-        ('Scooter3', 'StationWest')
-    ]))
+    n.add_place(scooter_place('ScooterPool', scooters))
 
     # Clock: Global time counter
     # Token: single integer representing current time (minutes from midnight)
-    n.add_place(Place('Clock', [600]))  # Start at 600 (10:00 AM)
+    n.add_place(Place('Clock', [clock]))  # Start at 600 (10:00 AM)
 
     # ReservedState: User + Scooter + Wallet
     # Token: (UserID, ScooterID, WalletBalance)
@@ -62,12 +141,22 @@ def create_net():
 
     # BillingHistory: Successful transactions
     # Token: (UserID, Cost, Status)
-    n.add_place(Place('BillingHistory', []))
+    if ledger is None:
+        n.add_place(Place('BillingHistory', []))
+    else:
+        from petri_tools import SinkPlace
+        n.add_place(SinkPlace('BillingHistory', ledger))
     
     # InsufficientBalance: Error state
     # Token: (UserID, RequiredCost, ActualBalance)
     n.add_place(Place('InsufficientBalance', []))
 
+    if stations is not None:
+        # Stations: docking points of a city net (read only)
+        # Token: (Location, X, Y)
+        n.add_place(Place('Stations', [(loc, x, y) for loc, (x, y)
+                                       in sorted(stations.items())]))
+
     # -----------------------------------------------------------------------
     # TRANSITIONS
     # -----------------------------------------------------------------------
@@ -75,7 +164,7 @@ def create_net():
     # === Reserve ===
     # User selects scooter, carries wallet through flow
     n.add_transition(Transition('Reserve'))
-    n.add_input('CommuterPool', 'Reserve', Tuple([Variable('u'), Variable('bal')]))
+    n.add_input('CommuterPool', 'Reserve', Tuple([Variable('u'), Variable('bal')] + where))
     n.add_input('ScooterPool', 'Reserve', Tuple([Variable('s'), Variable('loc')]))
     n.add_output('ReservedState', 'Reserve', Tuple([Variable('u'), Variable('s'), Variable('bal')]))
 
@@ -90,25 +179,28 @@ def create_net():
 
     # === EndRide ===
     # End ride, calculate cost DYNAMICALLY based on time difference
-    # Cost Formula: 1.0 + (duration * 0.20)
-    # We pass fixed duration for simulation, but use expression for calculation
+    # Cost Formula: 1.0 + (duration * 0.20), duration = now - start_t
+    # The current time is read from Clock (consumed and returned unchanged),
+    # so every variable is bound by the net and EndRide fires autonomously
     n.add_transition(Transition('EndRide'))
     n.add_input('OnRide', 'EndRide', Tuple([Variable('u'), Variable('s'), Variable('start_t'), Variable('bal')]))
+    n.add_input('Clock', 'EndRide', Variable('now'))
+    n.add_output('Clock', 'EndRide', Variable('now'))  # Return clock unchanged
     
     # Return scooter to pool at destination
-    n.add_output('ScooterPool', 'EndRide', Tuple([Variable('s'), Value('StationDest')]))
+    if stations is None:
+        n.add_output('ScooterPool', 'EndRide', Tuple([Variable('s'), Value('StationDest')]))
+    else:
+        # City net: dock at any station `dest`; its coordinates become the
+        # commuter's new position
+        n.add_input('Stations', 'EndRide', Test(Tuple([Variable('dest')] + where)))
+        n.add_output('ScooterPool', 'EndRide', Tuple([Variable('s'), Variable('dest')]))
     
-    # Calculate cost dynamically: we'll use duration as a parameter
-    # For simulation, duration is calculated externally and passed
-    # In production, would read from Clock place
+    # Calculate cost inside the net from the Clock token and start_t
     n.add_output('PaymentQueue', 'EndRide', 
                  Tuple([Variable('u'), 
-                        Variable('cost'),  # Cost will be calculated externally
-                        Variable('bal')]))
-    
-    # Helper function to calculate cost
-    def calculate_cost(duration_minutes):
-        return 1.0 + (duration_minutes * 0.20)
+                        Expression('calculate_cost(now - start_t)'),
+                        Variable('bal')] + where))
 
     # === ProcessPayment (Success Path) ===
     # Debit wallet if sufficient balance
@@ -116,7 +208,7 @@ def create_net():
     n.add_transition(Transition('ProcessPayment', 
                                 guard=Expression('bal >= cost')))
     n.add_input('PaymentQueue', 'ProcessPayment', 
-                Tuple([Variable('u'), Variable('cost'), Variable('bal')]))
+                Tuple([Variable('u'), Variable('cost'), Variable('bal')] + where))
     
     # Record transaction
     n.add_output('BillingHistory', 'ProcessPayment', 
@@ -124,7 +216,7 @@ def create_net():
     
     # Return user to pool with UPDATED balance (bal - cost)
     n.add_output('CommuterPool', 'ProcessPayment', 
-                 Tuple([Variable('u'), Expression('bal - cost')]))
+                 Tuple([Variable('u'), Expression('bal - cost')] + where))
 
     # === PaymentDeclined (Error Path) ===
     # If wallet < cost, move to error state
@@ -132,19 +224,170 @@ def create_net():
     n.add_transition(Transition('PaymentDeclined', 
                                 guard=Expression('bal < cost')))
     n.add_input('PaymentQueue', 'PaymentDeclined', 
-                Tuple([Variable('u'), Variable('cost'), Variable('bal')]))
+                Tuple([Variable('u'), Variable('cost'), Variable('bal')] + where))
     
     # Send to error handling
     n.add_output('InsufficientBalance', 'PaymentDeclined', 
                  Tuple([Variable('u'), Variable('cost'), Variable('bal')]))
 
+    # Guards and arc expressions are compiled once, not re-evaluated as
+    # strings on every SNAKES firing
+    from petri_tools.guards import cache_expressions
+    cache_expressions(n)
     return n
 
-def run_simulation():
+def wallet_draw(wallet, rng):
+    """
+    Callable drawing one commuter balance from `rng`: `wallet` is
+    (low, high) for uniform integers, or a callable(rng) returning one.
+    """
+    if callable(wallet):
+        return lambda: wallet(rng)
+    low, high = wallet
+    return lambda: rng.randint(low, high)
+
+def create_fleet_net(commuters=10, scooters=10, stations=3,
+                     wallet=(5, 50), seed=0, keyed=False, ledger=None):
+    """
+    Generator for capacity planning: the create_net() CPN structure with
+    configurable numbers of commuters, scooters and stations.
+
+    wallet -- (low, high): balances drawn uniformly (integers) per commuter,
+              or a callable(rng) returning one balance
+    seed   -- seed of the wallet draws, so fleets are reproducible
+
+    Scooter i is parked at station ((i - 1) % stations) + 1.
+    """
+    rng = random.Random(seed)
+    draw = wallet_draw(wallet, rng)
+    users = [(f'User{i}', draw()) for i in range(1, commuters + 1)]
+    fleet = [(f'Scooter{i}', f'Station{(i - 1) % stations + 1}')
+             for i in range(1, scooters + 1)]
+    return create_net(keyed, users, fleet, ledger=ledger,
+                      name=f'E-Scooter CPN - Fleet ({commuters} commuters, '
+                           f'{scooters} scooters, {stations} stations)')
+
+def create_city_net(commuters=10, scooters=10, stations=3, size=10.0,
+                    wallet=(5, 50), seed=0, keyed=False, ledger=None):
+    """
+    create_fleet_net() on a map: stations and commuters get uniformly drawn
+    coordinates in a `size` x `size` square (km), see create_net(stations=...).
+
+    Scooter i is parked at station ((i - 1) % stations) + 1.
+    """
+    rng = random.Random(seed)
+    draw = wallet_draw(wallet, rng)
+    spot = lambda: (round(rng.uniform(0, size), 3), round(rng.uniform(0, size), 3))
+    positions = {f'Station{i}': spot() for i in range(1, stations + 1)}
+    users = [(f'User{i}', draw()) + spot() for i in range(1, commuters + 1)]
+    fleet = [(f'Scooter{i}', f'Station{(i - 1) % stations + 1}')
+             for i in range(1, scooters + 1)]
+    return create_net(keyed, users, fleet, stations=positions, ledger=ledger,
+                      name=f'E-Scooter CPN - City ({commuters} commuters, '
+                           f'{scooters} scooters, {stations} stations)')
+
+def station_positions(target):
+    """
+    {Location: (x, y)} of a city net (SNAKES net or petri_tools.CompiledNet),
+    read from its Stations place.
+    """
+    if hasattr(target, 'marking'):
+        tokens = target.marking['Stations']
+    else:
+        tokens = target.place('Stations').tokens
+    return {loc: (x, y) for (loc, x, y) in tokens}
+
+def commuter_binding(token):
+    """Reserve variables of a CommuterPool token (u, bal[, x, y])."""
+    return dict(zip(('u', 'bal', 'x', 'y'), token))
+
+def reserve_modes(net, station=None, user=None, nearest=None):
+    """
+    Enumerates Reserve bindings without the full CommuterPool x ScooterPool
+    cartesian product, using the indices of a keyed net (create_net(keyed=True)).
+
+    station -- only scooters parked at this Location (secondary index)
+    user    -- only this UserID (primary-key lookup)
+    nearest -- city net (create_city_net(keyed=True)) only: for each
+               commuter, only the `nearest` scooters closest to them
+               (spatial index of ScooterPool); replaces `station`
+    """
+    commuters = net.place('CommuterPool')
+    scooters = net.place('ScooterPool')
+    if user is not None:
+        token = commuters.get(user)
+        users = [token] if token is not None else []
+    else:
+        users = list(commuters.tokens)
+    if station is not None:
+        parked = scooters.select(station)
+    else:
+        parked = list(scooters.tokens)
+    modes = []
+    for commuter in users:
+        if nearest is not None:
+            parked = scooters.nearest(commuter[2], commuter[3], nearest)
+        for (s, loc) in parked:
+            modes.append(Substitution(s=s, loc=loc, **commuter_binding(commuter)))
+    return modes
+
+BILLING_FIELDS = ('UserID', 'Cost', 'Status')
+
+def run_simulation(backend='snakes', render='all', every=1, verbose=True,
+                   trace_path=None, firings=False, ledger_path=None):
     """
     Runs enhanced simulation with dynamic calculations and error handling.
+
+    backend='snakes'   fires through SNAKES Transition.fire(Substitution)
+    backend='compiled' fires through petri_tools.CompiledNet (same markings)
+    render             'none', 'final', 'every' (every `every`-th step),
+                       'all', 'parallel' or 'deferred', see
+                       petri_tools.Renderer
+
+    Every firing (and clock advance) is logged in a
+    petri_tools.TraceRecorder, which is returned; verbose=False skips the
+    state dumps, trace_path writes the trace as JSONL and firings=True
+    prints one delta line per record.
+
+    BillingHistory streams to a petri_tools.Ledger (appended to the CSV
+    file ledger_path, if given) that keeps per-user totals and the last
+    few records; the net's BillingHistory place stays empty.
     """
-    net = create_net()
+    from petri_tools import Ledger, Renderer, TraceRecorder
+    from petri_tools.ledger import sink_places
+    from petri_tools.trace import print_firing, snakes_fire
+    ledger = Ledger(ledger_path, BILLING_FIELDS, capacity=10)
+    net = create_net(ledger=ledger)
+    renderer = Renderer(net, render, every)
+    trace = TraceRecorder(net.get_marking(), path=trace_path,
+                          sinks=sink_places(net))
+    if firings:
+        trace.subscribe(print_firing)
+    if backend == 'compiled':
+        from petri_tools import CompiledNet
+        engine = CompiledNet(net)
+    elif backend != 'snakes':
+        raise ValueError(f"unknown backend {backend!r}")
+
+    def fire(name, **binding):
+        if backend == 'compiled':
+            delta = engine.fire(name, binding)
+            engine.sync(net)  # keep net.draw() in step
+        else:
+            delta = snakes_fire(net, name, binding)
+        trace.record(name, binding, delta)
+
+    def advance(minutes):
+        if backend == 'compiled':
+            now = advance_clock(engine, minutes)
+            engine.sync(net)
+        else:
+            now = advance_clock(net, minutes)
+        trace.record(None, {'minutes': minutes},
+                     ((('Clock', now - minutes),), (('Clock', now),)))
+        print(f"    Clock advanced by {minutes} min → {now}")
+        return now
+
     print("=" * 70)
     print("EXERCISE 6: E-Scooter CPN Model (A++ Enhanced)")
     print("Student: Siddharth D. Patni (sp01)")
@@ -159,16 +402,19 @@ def run_simulation():
 
     def save(name, desc=""):
         filename = f"sim_scooter_{name}.png"
-        net.draw(filename)
+        drawn = renderer.snapshot(filename)
         print(f"    [{name}] {desc}")
-        print(f"    Saved: {filename}")
+        if drawn:
+            print(f"    Saved: {filename}")
 
     def show_state():
-        print(f"    Commuters: {list(net.place('CommuterPool').tokens)}")
-        print(f"    Scooters: {list(net.place('ScooterPool').tokens)}")
-        print(f"    Clock: {list(net.place('Clock').tokens)}")
-        print(f"    OnRide: {list(net.place('OnRide').tokens)}")
-        print(f"    PaymentQueue: {list(net.place('PaymentQueue').tokens)}")
+        if not verbose:
+            return
+        print(f"    Commuters: {trace.tokens('CommuterPool')}")
+        print(f"    Scooters: {trace.tokens('ScooterPool')}")
+        print(f"    Clock: {trace.tokens('Clock')}")
+        print(f"    OnRide: {trace.tokens('OnRide')}")
+        print(f"    PaymentQueue: {trace.tokens('PaymentQueue')}")
         print()
 
     # === SIMULATION ===
@@ -178,64 +424,62 @@ def run_simulation():
     show_state()
 
     print("[STEP 1] UserA reserves Scooter1...")
-    net.transition('Reserve').fire(Substitution(
-        u='UserA', bal=10, s='Scooter1', loc='StationMain'))
+    fire('Reserve', u='UserA', bal=10, s='Scooter1', loc='StationMain')
     save("01_Reserved", "UserA reserved, wallet=10€")
     show_state()
 
     print("[STEP 2] UserA starts ride at time 600...")
-    net.transition('StartRide').fire(Substitution(
-        u='UserA', s='Scooter1', bal=10, t=600))
+    fire('StartRide', u='UserA', s='Scooter1', bal=10, t=600)
     save("02_Riding", "UserA riding, start_time=600")
     show_state()
 
     print("[STEP 3] UserB reserves Scooter2 (concurrent)...")
-    net.transition('Reserve').fire(Substitution(
-        u='UserB', bal=50, s='Scooter2', loc='StationPark'))
+    fire('Reserve', u='UserB', bal=50, s='Scooter2', loc='StationPark')
     save("03_Concurrency", "UserB reserved while UserA rides")
     show_state()
 
     print("[STEP 4] UserA ends ride after 15 minutes...")
-    cost_a = 1.0 + (15 * 0.20)  # 4.00€
-    print(f"    Cost = 1.0 + (15 * 0.20) = {cost_a}€")
-    net.transition('EndRide').fire(Substitution(
-        u='UserA', s='Scooter1', start_t=600, bal=10, cost=cost_a))
+    now = advance(15)
+    print(f"    Cost = calculate_cost({now} - 600) = {calculate_cost(now - 600)}€")
+    fire('EndRide', u='UserA', s='Scooter1', start_t=600, bal=10, now=now)
     save("04_RideEnded", "Cost calculated: 4.00€")
     show_state()
 
     print("[STEP 5] Processing payment for UserA...")
     print("    Wallet: 10€ >= Cost: 4.00€ → SUCCESS")
-    net.transition('ProcessPayment').fire(Substitution(
-        u='UserA', cost=4.0, bal=10))
+    fire('ProcessPayment', u='UserA', cost=4.0, bal=10)
     save("05_PaymentSuccess", "UserA paid, new balance=6€")
     show_state()
 
-    print("[STEP 6] UserB starts ride at time 600 (same clock value)...")
-    net.transition('StartRide').fire(Substitution(
-        u='UserB', s='Scooter2', bal=50, t=600))
+    print(f"[STEP 6] UserB starts ride at time {now}...")
+    fire('StartRide', u='UserB', s='Scooter2', bal=50, t=now)
     save("06_UserB_Riding", "UserB riding")
     show_state()
 
     print("[STEP 7] UserB ends ride after 5 minutes...")
-    cost_b = 1.0 + (5 * 0.20)  # 2.00€
-    print(f"    Cost = 1.0 + (5 * 0.20) = {cost_b}€")
-    net.transition('EndRide').fire(Substitution(
-        u='UserB', s='Scooter2', start_t=600, bal=50, cost=cost_b))
+    start_b = now
+    now = advance(5)
+    print(f"    Cost = calculate_cost({now} - {start_b}) = "
+          f"{calculate_cost(now - start_b)}€")
+    fire('EndRide', u='UserB', s='Scooter2', start_t=start_b, bal=50, now=now)
     save("07_UserB_RideEnded", "UserB cost: 2.00€")
     show_state()
 
     print("[STEP 8] Processing payment for UserB...")
     print("    Wallet: 50€ >= Cost: 2.00€ → SUCCESS")
-    net.transition('ProcessPayment').fire(Substitution(
-        u='UserB', cost=2.0, bal=50))
+    fire('ProcessPayment', u='UserB', cost=2.0, bal=50)
     save("08_Final", "Both users paid, balances updated")
     show_state()
 
+    images = renderer.close()
+    trace.close()
+    ledger.close()
     print("=" * 70)
     print("[*] Simulation Complete!")
+    print(f"[*] Generated {len(images)} PNG images.")
     print()
     print("[*] ACADEMIC DEMONSTRATION:")
-    print("    ✓ Cost calculated via formula (1.0 + duration * 0.20)")
+    print("    ✓ Cost calculated inside the net: calculate_cost(now - start_t)")
     print("    ✓ Wallet balances properly tracked through workflow")
     print("    ✓ Dynamic expressions demonstrated in code")
     print("    ✓ Error handling with guards (bal >= cost)")
@@ -245,13 +489,41 @@ def run_simulation():
         print(f"    {token[0]}: {token[1]}€")
     print()
     print("[*] Billing History:")
-    for record in net.place('BillingHistory').tokens:
+    for record in ledger.recent:
         print(f"    {record[0]}: {record[1]}€ - {record[2]}")
+    for user, (rides, paid) in sorted(ledger.totals.items()):
+        print(f"    {user}: {rides} ride(s), {paid:.2f}€ paid")
+    if ledger_path is not None:
+        print(f"    Ledger: {ledger_path}")
     print("=" * 70)
+    return trace
 
 if __name__ == "__main__":
+    import argparse
+    from petri_tools.rendering import MODES
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=['snakes', 'compiled'],
+                        default='snakes',
+                        help="firing engine (both produce identical markings)")
+    parser.add_argument('--render', choices=MODES, default='all',
+                        help="which marking snapshots are drawn with Graphviz")
+    parser.add_argument('--render-every', type=int, default=1, metavar='K',
+                        help="with --render every: draw every K-th step")
+    parser.add_argument('--quiet', action='store_true',
+                        help="do not print the state after each step")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write the firing trace to FILE (JSONL)")
+    parser.add_argument('--firings', action='store_true',
+                        help="print one delta line per firing")
+    parser.add_argument('--ledger', metavar='FILE',
+                        help="append the BillingHistory records to FILE (CSV)")
+    args = parser.parse_args()
     try:
-        run_simulation()
+        run_simulation(backend=args.backend, render=args.render,
+                       every=args.render_every, verbose=not args.quiet,
+                       trace_path=args.trace, firings=args.firings,
+                       ledger_path=args.ledger)
     except Exception as e:
         print(f"Error: {e}")
         import traceback
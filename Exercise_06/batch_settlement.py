@@ -0,0 +1,241 @@
+"""
+Exercise 6: vectorised batch settlement of PaymentQueue.
+
+When many rides end in the same tick, ProcessPayment / PaymentDeclined
+fire once per PaymentQueue token, each evaluating its `bal >= cost` /
+`bal < cost` guard through SNAKES' expression evaluator. settle_payments()
+drains the whole queue in one step instead: balances and costs go into
+NumPy arrays, one vectorised comparison splits the tokens, and the
+results are pushed to the same places the two transitions would fill:
+
+    bal >= cost  ->  BillingHistory (u, cost, 'PAID')  +  CommuterPool (u, bal - cost)
+    bal <  cost  ->  InsufficientBalance (u, cost, bal)
+
+(city nets: PaymentQueue and CommuterPool tokens also carry x, y)
+
+    python3 batch_settlement.py        # equivalence check + benchmark
+
+Each size is settled three ways from the same queue: SNAKES firing one
+token at a time (only up to --snakes-max, it is quadratic in the queue
+length), CompiledNet firing one token at a time, and settle_payments().
+"equal" compares the resulting markings.
+"""
+
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from Solution_Exercise_06 import create_city_net, create_fleet_net
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import CompiledNet, Ledger, TraceRecorder
+from petri_tools.checkpoint import replay
+from petri_tools.ledger import sink_places
+from petri_tools.trace import to_marking
+
+
+def settle(tokens):
+    """
+    Settle a list of PaymentQueue tokens (u, cost, bal), or
+    (u, cost, bal, x, y) in a city net: fields after bal are the
+    commuter's position and come back in its CommuterPool token.
+
+    Returns (paid, declined, returned): the BillingHistory,
+    InsufficientBalance and CommuterPool tokens, as firing ProcessPayment /
+    PaymentDeclined once per token would produce them. NumPy keeps the
+    Python arithmetic types (int - int stays int, anything else is float).
+    """
+    if not tokens:
+        return [], [], []
+    cost = np.array([token[1] for token in tokens])
+    bal = np.array([token[2] for token in tokens])
+    ok = bal >= cost
+    left = (bal - cost)[ok].tolist()
+    settled = [token for token, good in zip(tokens, ok.tolist()) if good]
+    paid = [(token[0], c, 'PAID')
+            for token, c in zip(settled, cost[ok].tolist())]
+    returned = [(token[0], balance) + token[3:]
+                for token, balance in zip(settled, left)]
+    declined = [token[:3] for token, good in zip(tokens, ok.tolist())
+                if not good]
+    return paid, declined, returned
+
+
+def settle_payments(target):
+    """
+    Drain PaymentQueue of `target` (a SNAKES net or a
+    petri_tools.CompiledNet) in one batch. Returns (#paid, #declined).
+    A BillingHistory sink place (net built with a ledger) gets the paid
+    tokens in its ledger, as the firings would.
+    """
+    if hasattr(target, 'marking'):
+        queue = target.tokens('PaymentQueue')
+        target.marking['PaymentQueue'] = {}
+        paid, declined, returned = settle(queue)
+        for place, tokens in (('BillingHistory', paid),
+                              ('InsufficientBalance', declined),
+                              ('CommuterPool', returned)):
+            if place in target.sinks:
+                target.sinks[place].extend(tokens)
+                continue
+            counts = target.marking[place]
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+    else:
+        queue = list(target.place('PaymentQueue').tokens)
+        target.place('PaymentQueue').empty()
+        paid, declined, returned = settle(queue)
+        target.place('BillingHistory').add(paid)
+        target.place('InsufficientBalance').add(declined)
+        target.place('CommuterPool').add(returned)
+    return len(paid), len(declined)
+
+
+# ---------------------------------------------------------------------------
+# EQUIVALENCE CHECK AND BENCHMARK
+# ---------------------------------------------------------------------------
+
+def pending_net(payments, seed=0, ledger=None):
+    """A fleet net whose PaymentQueue holds `payments` pending rides."""
+    rng = random.Random(seed)
+    net = create_fleet_net(commuters=0, scooters=1, stations=1, ledger=ledger)
+    net.place('PaymentQueue').add([
+        (f'User{i}', round(1.0 + rng.randint(1, 60) * 0.20, 2),
+         rng.randint(0, 20))
+        for i in range(1, payments + 1)])
+    return net
+
+
+def fire_individually(engine):
+    """Reference: fire ProcessPayment / PaymentDeclined once per token."""
+    for u, cost, bal in engine.tokens('PaymentQueue'):
+        name = 'ProcessPayment' if bal >= cost else 'PaymentDeclined'
+        engine.fire(name, dict(u=u, cost=cost, bal=bal))
+
+
+def fire_individually_snakes(net):
+    """Reference on the SNAKES path (guards evaluated by SNAKES)."""
+    from snakes.nets import Substitution
+    for u, cost, bal in list(net.place('PaymentQueue').tokens):
+        binding = Substitution(u=u, cost=cost, bal=bal)
+        for name in ('ProcessPayment', 'PaymentDeclined'):
+            trans = net.transition(name)
+            if trans.enabled(binding):
+                trans.fire(binding)
+                break
+
+
+def check_ledger(payments=200):
+    """
+    With BillingHistory as a ledger sink, the batch, per-token firing,
+    a trace of it and its replay all leave BillingHistory empty and
+    count every paid ride in the ledger.
+    """
+    expected = sum(1 for _, cost, bal in pending_net(payments).place(
+        'PaymentQueue').tokens if bal >= cost)
+    for target in ('snakes', 'compiled'):
+        ledger = Ledger()
+        net = pending_net(payments, ledger=ledger)
+        if target == 'compiled':
+            net = CompiledNet(net)
+        settle_payments(net)
+        assert ledger.count == expected
+        assert not net.get_marking().get('BillingHistory')
+
+    ledger = Ledger()
+    net = pending_net(payments, ledger=ledger)
+    engine = CompiledNet(net)
+    trace = TraceRecorder(net.get_marking(), sinks=sink_places(net))
+    for u, cost, bal in engine.tokens('PaymentQueue'):
+        name = 'ProcessPayment' if bal >= cost else 'PaymentDeclined'
+        binding = dict(u=u, cost=cost, bal=bal)
+        trace.record(name, binding, engine.fire(name, binding))
+    assert ledger.count == expected
+    assert to_marking(trace.marking) == engine.get_marking()
+    assert not trace.marking_at(payments).get('BillingHistory')
+
+    replayed = Ledger()
+    fresh = CompiledNet(pending_net(payments, ledger=replayed))
+    replay(fresh, trace.records)
+    assert replayed.count == expected and fresh.marking == engine.marking
+
+
+def check_city(payments=200, seed=0):
+    """
+    City-net PaymentQueue tokens (u, cost, bal, x, y): the batch gives
+    the markings of per-token firing, positions kept in CommuterPool.
+    """
+    rng = random.Random(seed)
+    queue = [(f'User{i}', round(1.0 + rng.randint(1, 60) * 0.20, 2),
+              rng.randint(0, 20), rng.uniform(0, 10), rng.uniform(0, 10))
+             for i in range(1, payments + 1)]
+    engines = []
+    for _ in range(2):
+        engine = CompiledNet(create_city_net(commuters=0, scooters=1,
+                                             stations=1))
+        engine.marking['PaymentQueue'] = {token: 1 for token in queue}
+        engines.append(engine)
+    fired, batch = engines
+    for _ in queue:
+        name, binding = fired.choose('ProcessPayment')
+        fired.fire(name, binding)
+    settle_payments(batch)
+    assert batch.get_marking() == fired.get_marking()
+    assert all(len(token) == 4 for token in batch.tokens('CommuterPool'))
+
+
+def benchmark(sizes, snakes_max=10000):
+    check_ledger()
+    check_city()
+    print("=" * 78)
+    print("EXERCISE 6: Batch Settlement of PaymentQueue")
+    print("=" * 78)
+    print(f"{'pending':>8} {'SNAKES (s)':>11} {'compiled (s)':>13} "
+          f"{'batch (s)':>10} {'vs SNAKES':>10} {'vs compiled':>12} {'equal':>6}")
+    print("-" * 78)
+    for size in sizes:
+        net = None
+        if size <= snakes_max:
+            net = pending_net(size)
+            start = time.perf_counter()
+            fire_individually_snakes(net)
+            snakes_time = time.perf_counter() - start
+
+        engine = CompiledNet(pending_net(size))
+        start = time.perf_counter()
+        fire_individually(engine)
+        compiled_time = time.perf_counter() - start
+
+        batch = CompiledNet(pending_net(size))
+        start = time.perf_counter()
+        settle_payments(batch)
+        batch_time = time.perf_counter() - start
+
+        equal = batch.marking == engine.marking
+        if net is not None:
+            equal = equal and batch.get_marking() == net.get_marking()
+        if net is None:
+            snakes_col, speedup_col = '-', '-'
+        else:
+            snakes_col = f"{snakes_time:.3f}"
+            speedup_col = f"{snakes_time / batch_time:.1f}x"
+        print(f"{size:>8} {snakes_col:>11} {compiled_time:>13.3f} "
+              f"{batch_time:>10.3f} {speedup_col:>10} "
+              f"{compiled_time / batch_time:>11.1f}x {str(equal):>6}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--snakes-max', type=int, default=10000,
+                        help="largest queue also settled through SNAKES")
+    args = parser.parse_args()
+    benchmark(args.sizes, args.snakes_max)
@@ -0,0 +1,152 @@
+"""
+Exercise 6: load driver for generated E-Scooter fleets.
+
+Builds create_fleet_net(...) for growing fleet sizes and keeps firing
+enabled transitions (compiled backend) until a target number of completed
+rides has landed in BillingHistory. Reports rides/second, peak memory,
+the average cost of each transition firing and the time spent on binding
+searches that found nothing (a disabled transition probed by the random
+order). Every size runs in a fresh interpreter, so its peak RSS is its
+own and not the maximum over the sizes before it.
+
+    python3 fleet_driver.py
+    python3 fleet_driver.py --sizes 10 1000 100000 --rides 5000
+"""
+
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from Solution_Exercise_06 import advance_clock, create_fleet_net
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import CompiledNet
+
+
+def peak_rss_mib():
+    """Peak resident set size of this process so far, in MiB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in KiB on Linux
+    return rss / 2**20 if sys.platform == 'darwin' else rss / 1024
+
+
+class FleetDriver(object):
+    """
+    Fires enabled transitions of a fleet net in random order.
+
+    Bindings are picked with CompiledNet.first() (the first fitting
+    tokens), so one step costs O(#transitions) instead of enumerating
+    e.g. the CommuterPool x ScooterPool modes of Reserve. EndRide computes
+    the ride cost itself from the Clock token, which the driver moves one
+    minute forward every `steps_per_minute` firings.
+    """
+
+    def __init__(self, net, seed=0, steps_per_minute=10):
+        self.engine = CompiledNet(net)
+        self.rng = random.Random(seed)
+        self.steps_per_minute = steps_per_minute
+        self.names = list(self.engine.transitions)
+        self.fired = Counter()
+        self.seconds = Counter()     # search + fire, successful firings
+        self.missed = Counter()      # first() searches that found nothing
+        self.miss_seconds = Counter()
+        self.steps = 0
+        self.rides = 0
+
+    def step(self):
+        """Fire one enabled transition; return its name (None if dead)."""
+        for name in self.rng.sample(self.names, len(self.names)):
+            start = time.perf_counter()
+            binding = self.engine.first(name)
+            if binding is None:
+                self.missed[name] += 1
+                self.miss_seconds[name] += time.perf_counter() - start
+                continue
+            self.engine.fire(name, binding)
+            self.seconds[name] += time.perf_counter() - start
+            self.fired[name] += 1
+            if name == 'ProcessPayment':
+                self.rides += 1
+            self.steps += 1
+            if self.steps % self.steps_per_minute == 0:
+                advance_clock(self.engine, 1)
+            return name
+        return None
+
+    def run(self, rides):
+        """Fire until `rides` rides are billed (or nothing is enabled)."""
+        while self.rides < rides:
+            if self.step() is None:
+                break
+        return self.rides
+
+
+def run_size(commuters, rides, seed):
+    """Build and drive one fleet size; print its report."""
+    scooters = max(1, commuters // 2)
+    stations = max(1, scooters // 20)
+    baseline = peak_rss_mib()
+    start = time.perf_counter()
+    net = create_fleet_net(commuters, scooters, stations,
+                           wallet=(20, 200), seed=seed)
+    driver = FleetDriver(net, seed)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    done = driver.run(rides)
+    seconds = time.perf_counter() - start
+    peak = peak_rss_mib()
+    print(f"[{commuters + scooters} tokens] {commuters} commuters, "
+          f"{scooters} scooters, {stations} stations")
+    print(f"    build+compile {built:.2f}s, {done} rides in {seconds:.2f}s "
+          f"= {done / seconds:.0f} rides/s")
+    print(f"    peak RSS {peak:.0f} MiB, +{peak - baseline:.0f} MiB over the "
+          f"{baseline:.0f} MiB before building the net")
+    print(f"    declined payments: {driver.fired['PaymentDeclined']}")
+    for name in driver.names:
+        if driver.fired[name] or driver.missed[name]:
+            cost = driver.seconds[name] / max(1, driver.fired[name]) * 1e6
+            miss = (driver.miss_seconds[name]
+                    / max(1, driver.missed[name]) * 1e6)
+            print(f"    {name:<16} {driver.fired[name]:>8} firings "
+                  f"{cost:>8.1f} us/firing {driver.missed[name]:>8} "
+                  f"misses {miss:>6.1f} us/miss")
+    missed = sum(driver.miss_seconds.values())
+    print(f"    failed binding searches: {missed * 1e3:.0f} ms "
+          f"({missed / seconds:.0%} of the run)")
+
+
+def benchmark(sizes, rides, seed):
+    print("=" * 78)
+    print("EXERCISE 6: Fleet Load Driver (compiled backend)")
+    print(f"target={rides} billed rides per size, scooters=commuters//2, "
+          f"stations=scooters//20")
+    print("each size runs in a fresh process (peak RSS of that size only)")
+    print("=" * 78)
+    sys.stdout.flush()
+    for commuters in sizes:
+        subprocess.run([sys.executable, os.path.abspath(__file__),
+                        '--size', str(commuters), '--rides', str(rides),
+                        '--seed', str(seed)], check=True)
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 100, 1000, 10000, 66000],
+                        help="numbers of commuters (tokens = 1.5x)")
+    parser.add_argument('--rides', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.size is not None:       # one size, in the process started above
+        run_size(args.size, args.rides, args.seed)
+    else:
+        benchmark(args.sizes, args.rides, args.seed)
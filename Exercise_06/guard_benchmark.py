@@ -0,0 +1,173 @@
+"""
+Exercise 6: guard evaluation cost, SNAKES expressions vs compiled ones.
+
+Every PaymentQueue token (u, cost, bal) is settled by ProcessPayment
+(guard `bal >= cost`) or PaymentDeclined (guard `bal < cost`). The
+benchmark times, on the same random tokens,
+
+    guard       -- one evaluation of `bal >= cost`: SNAKES `Expression`
+                   vs petri_tools.guards.CachedExpression (compiled once
+                   into a function)
+    decision    -- which of the two transitions a token enables:
+                   on the SNAKES path, Transition.enabled() on
+                   ProcessPayment, then firing it or PaymentDeclined
+                   (plain / cached guard and arc expressions); compiled,
+                   CompiledNet.first() on both vs CompiledNet.choose(),
+                   which tests one guard of the exclusive pair per token
+
+"guards/token" is the number of guard evaluations per decision.
+
+    python3 guard_benchmark.py
+    python3 guard_benchmark.py --tokens 100000
+"""
+
+import os
+import random
+import sys
+import time
+
+from Solution_Exercise_06 import create_fleet_net
+from snakes.nets import Expression, Substitution
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import CompiledNet
+from petri_tools.guards import CachedExpression, cache_expressions
+
+
+def payment_tokens(count, seed=0):
+    """Random PaymentQueue tokens, about a third of them declined."""
+    rng = random.Random(seed)
+    return [(f'User{i}', round(1.0 + rng.randint(1, 60) * 0.20, 2),
+             rng.randint(0, 20)) for i in range(count)]
+
+
+def rate(function, items):
+    """Calls of function(item) per second over `items`."""
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def payment_net(cached):
+    """Fleet net with cached (create_net's default) or plain SNAKES
+    guard and arc expressions."""
+    net = create_fleet_net(commuters=0, scooters=1, stations=1)
+    if not cached:
+        for trans in net.transition():
+            labels = [trans.guard] + [label for _, label in trans.input()]
+            labels += [label for _, label in trans.output()]
+            for label in labels:
+                for expr in getattr(label, '_components', [label]):
+                    if type(expr) is CachedExpression:
+                        object.__setattr__(expr, '__class__', Expression)
+    return net
+
+
+def check_cached():
+    """create_net() really leaves CachedExpression guards and arcs."""
+    net = create_fleet_net(commuters=3, scooters=2, stations=1)
+    expressions = []
+    for trans in net.transition():
+        if str(trans.guard) != 'True':
+            expressions.append(trans.guard)
+        for _, label in list(trans.input()) + list(trans.output()):
+            expressions.extend(
+                expr for expr in getattr(label, '_components', [label])
+                if isinstance(expr, Expression))
+    assert len(expressions) == 4, expressions
+    for expr in expressions:
+        assert type(expr) is CachedExpression, (expr, type(expr))
+    assert cache_expressions(net) == 0
+    assert all(type(expr) is Expression
+               for expr in _guards(payment_net(False)))
+    try:
+        CachedExpression('bal >= cost')(Substitution(bal=1))
+    except NameError:
+        pass
+    else:
+        raise AssertionError("unbound variable not reported")
+    try:
+        CachedExpression('bal >= cost')(Substitution(bal=1, cost='x'))
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("error of the expression hidden")
+
+
+def _guards(net):
+    return [trans.guard for trans in net.transition()
+            if str(trans.guard) != 'True']
+
+
+def snakes_settle(net):
+    """Settle one token on the SNAKES path: put it in PaymentQueue, test
+    ProcessPayment then PaymentDeclined with enabled(), fire the one
+    enabled (which evaluates the output arc expressions too)."""
+    queue = net.place('PaymentQueue')
+    paid, declined = (net.transition('ProcessPayment'),
+                      net.transition('PaymentDeclined'))
+
+    def settle(item):
+        token, binding = item
+        queue.add([token])
+        trans = paid if paid.enabled(binding) else declined
+        trans.fire(binding)
+    return settle
+
+
+def benchmark(count, seed):
+    check_cached()
+    tokens = payment_tokens(count, seed)
+    bindings = [Substitution(u=u, cost=cost, bal=bal) for u, cost, bal in tokens]
+    declined = sum(1 for _, cost, bal in tokens if bal < cost) / count
+    plain = Expression('bal >= cost')
+    cached = CachedExpression('bal >= cost')
+    assert [plain(b) for b in bindings] == [cached(b) for b in bindings]
+
+    rows = []
+    for label, net in (("SNAKES settle", payment_net(False)),
+                       ("SNAKES settle, cached", payment_net(True))):
+        rows.append((label, rate(snakes_settle(net), list(zip(tokens, bindings))),
+                     1 + declined))
+        assert len(net.place('InsufficientBalance').tokens) == \
+            round(declined * count)
+
+    engine = CompiledNet(create_fleet_net(commuters=0, scooters=1, stations=1))
+    markings = [{'PaymentQueue': {token: 1}} for token in tokens]
+    first = engine._first['ProcessPayment'], engine._first['PaymentDeclined']
+    rows.append(("compiled first() x2",
+                 rate(lambda m: first[0](m) or first[1](m), markings),
+                 1 + declined))
+    choose = engine._choose['ProcessPayment']
+    assert [choose(m)[0] == 'ProcessPayment' for m in markings] == \
+        [bal >= cost for _, cost, bal in tokens]
+    rows.append(("compiled choose()", rate(choose, markings), 1))
+
+    print("=" * 66)
+    print("EXERCISE 6: Guard Evaluation (ProcessPayment / PaymentDeclined)")
+    print(f"{count} random PaymentQueue tokens, {declined:.0%} declined")
+    print("=" * 66)
+    base = rate(plain, bindings)
+    print(f"{'guard bal >= cost':<32} {'evals/s':>12} {'speed-up':>9}")
+    print(f"{'  SNAKES Expression':<32} {base:>12,.0f} {1:>8.1f}x")
+    fast = rate(cached, bindings)
+    print(f"{'  CachedExpression':<32} {fast:>12,.0f} {fast / base:>8.1f}x")
+    print("-" * 66)
+    print(f"{'decision per token':<32} {'tokens/s':>12} {'speed-up':>9} "
+          f"{'guards/token':>12}")
+    for label, speed, guards in rows:
+        print(f"  {label:<30} {speed:>12,.0f} {speed / rows[0][1]:>8.1f}x "
+              f"{guards:>12.2f}")
+    print("=" * 66)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.tokens, args.seed)
@@ -0,0 +1,59 @@
+"""
+Exercise 6: structural analysis of the E-Scooter CPN (no simulation).
+
+Counting the tokens of each place regardless of colour, the incidence
+matrix of create_net() has three P-invariants:
+
+    Clock = 1
+    ScooterPool + ReservedState + OnRide = #scooters
+    CommuterPool + ReservedState + OnRide + PaymentQueue
+        + InsufficientBalance = #commuters
+
+so scooters and commuters are conserved by every firing, and only
+BillingHistory (which only ever grows) is unbounded. The laws are checked
+with Structure.is_p_invariant() and timed on generated fleets: the
+colour-blind matrix does not grow with the fleet.
+
+    python3 invariants.py
+"""
+
+import os
+import sys
+
+from Solution_Exercise_06 import create_fleet_net, create_net
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools.structure import analyse
+
+SCOOTERS = {'ScooterPool': 1, 'ReservedState': 1, 'OnRide': 1}
+COMMUTERS = {'CommuterPool': 1, 'ReservedState': 1, 'OnRide': 1,
+             'PaymentQueue': 1, 'InsufficientBalance': 1}
+
+
+def report(structure):
+    """Print invariants, bounds and the two conservation laws."""
+    print(f"  {structure}")
+    for invariant in structure.p_invariants:
+        print(f"    P-invariant: {structure.law(invariant)}")
+    for invariant in structure.t_invariants:
+        print(f"    T-invariant: {structure.cycle(invariant)}")
+    print(f"    unbounded (no invariant): {', '.join(structure.uncovered)}")
+    print(f"    scooters conserved:  {structure.is_p_invariant(SCOOTERS)}")
+    print(f"    commuters conserved: {structure.is_p_invariant(COMMUTERS)}")
+
+
+def main():
+    print("=" * 78)
+    print("EXERCISE 6: Structural Analysis of the E-Scooter CPN")
+    print("=" * 78)
+    print("create_net():")
+    report(analyse(create_net()))
+    for size in (1000, 100000):
+        print(f"create_fleet_net({size}, {size}):")
+        report(analyse(create_fleet_net(size, size)))
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Exercise 6: Monte-Carlo runs of the E-Scooter CPN.
+
+run_simulation() in Solution_Exercise_06.py replays one scripted trace.
+This script simulates the net stochastically instead: for every seed, a
+TimedSimulation (see timed_simulation.py) fires the transitions of the
+create_net() net with sampled arrival and ride-duration distributions, and
+the outcome (revenue, declined payments, scooter utilisation) is
+aggregated over thousands of seeds. Seeds are independent, so they are
+spread over a multiprocessing pool; the result of one seed does not depend
+on the worker that ran it.
+
+    python3 monte_carlo.py                                # 2000 seeds
+    python3 monte_carlo.py --runs 10000 --ride exp:12 --arrival uniform:20,90
+    python3 monte_carlo.py --commuters 200 --scooters 50   # generated fleet
+"""
+
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+from Solution_Exercise_06 import create_fleet_net, create_net
+from timed_simulation import TimedSimulation
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import CompiledNet
+
+
+class Distribution(object):
+    """
+    Whole-minute duration sampler, usable as a TimedSimulation duration
+    (a callable(rng)). Picklable, so it can be sent to pool workers.
+
+    uniform:LOW,HIGH   randint(LOW, HIGH)
+    exp:MEAN           exponential with mean MEAN, at least 1 minute
+    const:N            always N
+    """
+
+    def __init__(self, spec):
+        kind, _, args = spec.partition(':')
+        values = [float(v) for v in args.split(',')] if args else []
+        arity = {'uniform': 2, 'exp': 1, 'const': 1}
+        if kind not in arity or len(values) != arity[kind]:
+            raise ValueError(f"bad distribution {spec!r} "
+                             f"(uniform:LOW,HIGH, exp:MEAN or const:N)")
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+
+    def __call__(self, rng):
+        if self.kind == 'uniform':
+            low, high = self.values
+            return rng.randint(int(low), int(high))
+        if self.kind == 'exp':
+            return max(1, round(rng.expovariate(1.0 / self.values[0])))
+        return int(self.values[0])
+
+    def __repr__(self):
+        return self.spec
+
+
+# Compiled engines per worker process, keyed by net structure: compiling
+# costs more than simulating a day of the small create_net() scenario
+_ENGINES = {}
+
+
+def run_seed(seed, config):
+    """
+    One independent simulation; everything random derives from `seed`.
+    Returns a dict of per-run metrics.
+    """
+    if config['commuters'] is None:
+        net = create_net()
+        scooters = len(net.place('ScooterPool').tokens)
+    else:
+        scooters = config['scooters']
+        net = create_fleet_net(config['commuters'], scooters,
+                               config['stations'], wallet=(5, 60), seed=seed)
+    engine = _ENGINES.get(net.name)
+    if engine is None:
+        engine = _ENGINES[net.name] = CompiledNet(net)
+    else:
+        engine.set_marking(net.get_marking())
+    sim = TimedSimulation(engine, seed, ride_minutes=config['ride'],
+                          gap_minutes=config['arrival'])
+    sim.set_clock(config['start'])
+    sim.start()
+    sim.run(config['end'])
+    marking = sim.engine.marking
+    minutes = config['end'] - config['start']
+    return {
+        'seed': seed,
+        'rides': sim.fired['EndRide'],
+        'revenue': sum(cost * n for (u, cost, status), n
+                       in marking['BillingHistory'].items()),
+        'declined': sum(marking['InsufficientBalance'].values()),
+        'utilisation': sim.ride_time / (scooters * minutes),
+    }
+
+
+def _run(job):
+    return run_seed(*job)
+
+
+def monte_carlo(runs, config, workers=None, first_seed=0):
+    """Run seeds first_seed .. first_seed + runs - 1; return the results."""
+    jobs = [(seed, config) for seed in range(first_seed, first_seed + runs)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_run(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(_run, jobs, chunksize=max(1, runs // (8 * workers)))
+    return sorted(results, key=lambda result: result['seed'])
+
+
+def report(results, seconds, workers):
+    print("=" * 70)
+    print("EXERCISE 6: Monte-Carlo Simulation")
+    print(f"{len(results)} seeds on {workers} worker(s) in {seconds:.2f}s "
+          f"({len(results) / seconds:.0f} runs/s)")
+    print("=" * 70)
+    print(f"{'metric':<14} {'mean':>10} {'stdev':>10} {'p5':>10} "
+          f"{'p50':>10} {'p95':>10}")
+    print("-" * 70)
+    for metric in ('rides', 'revenue', 'declined', 'utilisation'):
+        values = sorted(result[metric] for result in results)
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+        stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+        print(f"{metric:<14} {statistics.mean(values):>10.3f} {stdev:>10.3f} "
+              f"{pick(0.05):>10.3f} {pick(0.5):>10.3f} {pick(0.95):>10.3f}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="pool size (default: one per CPU)")
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--ride', type=Distribution, default='uniform:5,30',
+                        help="ride duration in minutes")
+    parser.add_argument('--arrival', type=Distribution, default='exp:120',
+                        help="idle time before a commuter's next request")
+    parser.add_argument('--start', type=int, default=360)
+    parser.add_argument('--end', type=int, default=1440)
+    parser.add_argument('--commuters', type=int, default=None,
+                        help="generated fleet instead of the create_net() scenario")
+    parser.add_argument('--scooters', type=int, default=50)
+    parser.add_argument('--stations', type=int, default=5)
+    args = parser.parse_args()
+    config = {'ride': args.ride, 'arrival': args.arrival,
+              'start': args.start, 'end': args.end,
+              'commuters': args.commuters, 'scooters': args.scooters,
+              'stations': args.stations}
+    workers = args.workers or os.cpu_count() or 1
+    began = time.perf_counter()
+    results = monte_carlo(args.runs, config, workers, args.first_seed)
+    report(results, time.perf_counter() - began, workers)
@@ -0,0 +1,78 @@
+"""
+Exercise 6: state space of the E-Scooter CPN up to renaming of scooters
+and commuters.
+
+The net never compares scooter or commuter ids with constants: Reserve
+takes any commuter and any scooter, the other transitions copy the ids
+along. Markings that differ only by a renaming of scooters (or of
+commuters) therefore behave identically, and petri_tools.symmetry keeps
+one of them. This script explores create_fleet_net(...) with one station
+and equal wallets (the Clock is never advanced, so every ride costs the
+unlock fee and the state space is finite) with and without symmetry
+reduction and reports states, deadlocks and time.
+
+    python3 reachability.py                    # 2 commuters, 2..8 scooters
+    python3 reachability.py --commuters 3 --max-scooters 12 --full-max 200000
+"""
+
+import os
+import sys
+
+from Solution_Exercise_06 import create_fleet_net
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import explore
+
+
+def fleet(commuters, scooters, wallet=3):
+    """Fleet net with one station and equal wallets."""
+    return create_fleet_net(commuters, scooters, stations=1,
+                            wallet=(wallet, wallet))
+
+
+def symmetric_ids(commuters, scooters):
+    """The interchangeable colour sets of a fleet net."""
+    return [[f'Scooter{i}' for i in range(1, scooters + 1)],
+            [f'User{i}' for i in range(1, commuters + 1)]]
+
+
+def analyse(commuters, scooters, symmetric=True, max_states=None):
+    """Explore the fleet net, up to renaming of ids if `symmetric`."""
+    return explore(fleet(commuters, scooters), max_states=max_states,
+                   symmetry=(symmetric_ids(commuters, scooters)
+                             if symmetric else None))
+
+
+def benchmark(commuters=2, max_scooters=8, min_scooters=2, full_max=100000):
+    print("=" * 78)
+    print("EXERCISE 6: Full vs Symmetry-Reduced State Space "
+          f"({commuters} commuters, 1 station)")
+    print("=" * 78)
+    print(f"{'scooters':>8} {'full':>10} {'sec':>7} {'classes':>8} "
+          f"{'sec':>7} {'deadlocks':>9}")
+    print("-" * 78)
+    for scooters in range(min_scooters, max_scooters + 1):
+        full = analyse(commuters, scooters, symmetric=False,
+                       max_states=full_max)
+        states = f"{full.states}{'' if full.complete else '+'}"
+        space = analyse(commuters, scooters)
+        print(f"{scooters:>8} {states:>10} {full.seconds:>7.2f} "
+              f"{space.states:>8} {space.seconds:>7.2f} "
+              f"{len(space.deadlocks):>9}")
+    print("(+ = full graph stopped at --full-max states)")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commuters', type=int, default=2)
+    parser.add_argument('--min-scooters', type=int, default=2)
+    parser.add_argument('--max-scooters', type=int, default=8)
+    parser.add_argument('--full-max', type=int, default=100000,
+                        help='stop the full graph after this many states')
+    args = parser.parse_args()
+    benchmark(args.commuters, args.max_scooters, args.min_scooters,
+              args.full_max)
@@ -0,0 +1,132 @@
+"""
+Exercise 6: nearest-scooter matching on a city fleet, grid index vs scan.
+
+In a create_city_net() fleet every commuter should reserve the parked
+scooter closest to them. The scan baseline walks the whole ScooterPool
+marking per request (O(#scooters)); petri_tools.spatial.SpatialIndex keeps
+the stations that hold scooters in a uniform grid and answers from a few
+cells around the commuter. For growing fleets the benchmark times
+
+    query   -- nearest scooter for random commuters (both methods agree)
+    match   -- nearest scooter + Reserve firing (compiled backend) for
+               every commuter, the index updated from the firing delta
+
+    python3 spatial_matching.py
+    python3 spatial_matching.py --sizes 1000 100000 --queries 5000
+"""
+
+import os
+import random
+import sys
+import time
+
+from Solution_Exercise_06 import (commuter_binding, create_city_net,
+                                  reserve_modes, station_positions)
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import CompiledNet
+from petri_tools.spatial import SpatialIndex
+
+
+def scan(parked, positions, x, y):
+    """(distance, scooter) nearest to (x, y) by a full pass over `parked`."""
+    best = None
+    for token in parked:
+        px, py = positions[token[1]]
+        d = ((px - x) ** 2 + (py - y) ** 2) ** 0.5
+        if best is None or d < best[0]:
+            best = (d, token)
+    return best
+
+
+def distance(positions, token, x, y):
+    px, py = positions[token[1]]
+    return ((px - x) ** 2 + (py - y) ** 2) ** 0.5
+
+
+def check_keyed(seed):
+    """SNAKES path: SpatialPlace answers as the compiled-side index does."""
+    net = create_city_net(50, 200, 20, keyed=True, seed=seed)
+    index = SpatialIndex(station_positions(net), place='ScooterPool',
+                         tokens=list(net.place('ScooterPool').tokens))
+    reserve = net.transition('Reserve')
+    for token in sorted(net.place('CommuterPool').tokens):
+        (mode,) = reserve_modes(net, user=token[0], nearest=1)
+        assert index.nearest(token[2], token[3]) == [(mode['s'], mode['loc'])]
+        reserve.fire(mode)
+        index.remove((mode['s'], mode['loc']))
+    assert len(net.place('ScooterPool').spatial) == len(index) == 150
+
+
+def benchmark(sizes, queries, scan_queries, seed):
+    check_keyed(seed)
+    print("=" * 78)
+    print("EXERCISE 6: Nearest-Scooter Matching (city fleet, 10 x 10 km)")
+    print(f"{queries} nearest queries per size, then one reservation for "
+          f"each of min({queries}, scooters // 2)")
+    print("commuters; stations = scooters // 20")
+    print("=" * 78)
+    print(f"{'scooters':>9} {'build s':>8} {'index s':>8} | {'scan us':>9} "
+          f"{'grid us':>8} {'speed-up':>8} | {'matches/s':>10} "
+          f"{'km':>8}")
+    print("-" * 78)
+    for scooters in sizes:
+        stations = max(1, scooters // 20)
+        start = time.perf_counter()
+        # at most half of the fleet gets reserved in the match phase
+        commuters = min(queries, scooters // 2)
+        engine = CompiledNet(create_city_net(commuters, scooters, stations,
+                                             seed=seed))
+        built = time.perf_counter() - start
+        positions = station_positions(engine)
+        start = time.perf_counter()
+        index = SpatialIndex(positions, place='ScooterPool',
+                             tokens=engine.marking['ScooterPool'])
+        indexed = time.perf_counter() - start
+
+        rng = random.Random(seed)
+        points = [(rng.uniform(0, 10), rng.uniform(0, 10))
+                  for _ in range(queries)]
+        parked = list(engine.marking['ScooterPool'])
+        sample = points[:scan_queries]
+        start = time.perf_counter()
+        expected = [scan(parked, positions, x, y)[0] for x, y in sample]
+        scanned = (time.perf_counter() - start) / len(sample)
+        start = time.perf_counter()
+        found = [index.nearest(x, y)[0] for x, y in points]
+        gridded = (time.perf_counter() - start) / len(points)
+        for (x, y), d, token in zip(sample, expected, found):
+            assert abs(distance(positions, token, x, y) - d) < 1e-9
+
+        # every commuter reserves its nearest scooter, the index follows
+        commuters = sorted(engine.marking['CommuterPool'])
+        walked = 0.0
+        start = time.perf_counter()
+        for token in commuters:
+            binding = commuter_binding(token)
+            (scooter,) = index.nearest(binding['x'], binding['y'])
+            index.apply(engine.fire('Reserve', dict(binding, s=scooter[0],
+                                                    loc=scooter[1])))
+            walked += distance(positions, scooter, binding['x'], binding['y'])
+        matched = time.perf_counter() - start
+        assert len(index) == len(engine.marking['ScooterPool'])
+        print(f"{scooters:>9} {built:>8.2f} {indexed:>8.2f} | "
+              f"{scanned * 1e6:>9.0f} {gridded * 1e6:>8.1f} "
+              f"{scanned / gridded:>7.0f}x | {len(commuters) / matched:>10.0f} "
+              f"{walked / len(commuters):>8.2f}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--scan-queries', type=int, default=200,
+                        help="requests timed with the full scan (slow)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.sizes, args.queries, args.scan_queries, args.seed)
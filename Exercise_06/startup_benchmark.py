@@ -0,0 +1,79 @@
+"""
+Startup time of the exercise models, with and without the gv plugin.
+
+Test harnesses launch the models thousands of times, one process each,
+and mostly only build a net and analyse or simulate it. The scripts now
+build their nets from plain snakes.nets classes (petri_tools.drawing
+loads gv on the first draw() call); before, every launch loaded the gv
+plugin stack at import time. Every scenario below runs in a fresh
+interpreter, --runs times, and the median wall time is reported:
+
+    python          the bare interpreter (floor)
+    import          import the exercise module
+    import + gv     the same with the gv plugin loaded first (as before)
+    build           import, create_net()
+    build + gv      the same with gv loaded first (as before)
+    build + draw    import, create_net(), DOT text of the net (gv loaded
+                    by the draw() call; no Graphviz process)
+
+    python3 startup_benchmark.py
+    python3 startup_benchmark.py --runs 50
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODELS = [('Exercise 5', os.path.join(HERE, '..', 'Exercise_05'), 'exercise5'),
+          ('Exercise 6', HERE, 'Solution_Exercise_06')]
+GV = "import snakes.plugins; snakes.plugins.load('gv', 'snakes.nets', 'nets'); "
+
+
+def scenarios(module):
+    build = "import %s as m; m.create_net(); " % module
+    return [("python", "pass"),
+            ("import", "import %s" % module),
+            ("import + gv", GV + "import %s" % module),
+            ("build", build),
+            ("build + gv", GV + build),
+            ("build + draw", "import %s as m; m.create_net().draw(None).dot()"
+             % module)]
+
+
+def launch(code, cwd, runs):
+    """Median seconds of `python -c code` in `cwd` over `runs` launches."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=cwd, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def benchmark(runs):
+    print("=" * 66)
+    print("Startup time per launch (median of %d fresh processes)" % runs)
+    print("=" * 66)
+    for title, cwd, module in MODELS:
+        print(f"{title} ({module}.py)")
+        results = {}
+        for label, code in scenarios(module):
+            results[label] = launch(code, cwd, runs)
+            line = f"    {label:<14} {results[label] * 1e3:>7.1f} ms"
+            if label.endswith(" + gv"):
+                saved = results[label] - results[label[:-len(" + gv")]]
+                line += f"   lazy gv saves {saved * 1e3:.0f} ms per launch"
+            print(line)
+    print("=" * 66)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    benchmark(args.runs)
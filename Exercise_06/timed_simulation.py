@@ -0,0 +1,365 @@
+"""
+Exercise 6: timed simulation of the E-Scooter CPN with an event queue.
+
+The Clock place holds the current time, but nothing in the net makes time
+pass. TimedSimulation drives a fleet net (compiled backend) with a
+discrete-event scheduler: a heap of (timestamp, transition, binding)
+events. Popping an event moves the Clock token straight to its timestamp,
+so idle stretches between rides cost nothing, and fires the transition:
+
+    request  -> Reserve          (commuter wants a ride, takes a free scooter)
+    walk     -> StartRide        (start_t = Clock)
+    ride     -> EndRide          (cost = calculate_cost(Clock - start_t))
+    same tick: ProcessPayment / PaymentDeclined, then the commuter's next
+               request is scheduled after a sampled idle gap
+
+    python3 timed_simulation.py                          # 06:00 - 24:00
+    python3 timed_simulation.py --commuters 20000 --scooters 5000
+    python3 timed_simulation.py --city                   # nearest scooter
+
+With --city the fleet is a create_city_net(): a request reserves the
+scooter closest to the commuter (petri_tools.spatial index of ScooterPool,
+updated from every firing delta) and a ride ends at a random station.
+
+--ledger FILE streams BillingHistory to a CSV file (petri_tools.Ledger)
+instead of keeping one token per paid ride in the marking.
+
+Long runs can be cut into pieces: --checkpoint FILE --end 720 stops at
+noon and saves the marking, event queue and RNG state; --resume FILE
+continues from there. --trace FILE records every firing (JSONL) and
+--replay FILE re-applies such a trace to a fresh net without any guard
+evaluation or mode search.
+"""
+
+import heapq
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+from Solution_Exercise_06 import (BILLING_FIELDS, commuter_binding,
+                                  create_city_net, create_fleet_net,
+                                  station_positions)
+
+# Shared Petri net tooling lives in ../petri_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petri_tools import CompiledNet, Ledger, TraceRecorder
+from petri_tools.checkpoint import (load_checkpoint, replay, restore,
+                                    save_checkpoint)
+from petri_tools.ledger import sink_places
+from petri_tools.spatial import SpatialIndex
+from petri_tools.trace import read_trace
+
+
+class TimedSimulation(object):
+    """
+    Discrete-event driver for a create_net()/create_fleet_net()/
+    create_city_net() net (or an already compiled petri_tools.CompiledNet
+    of one, which is then driven in place).
+
+    In a city net (one with a Stations place) Reserve takes the parked
+    scooter nearest to the commuter, found with a SpatialIndex of
+    ScooterPool (`self.scooters`), and EndRide docks at a random station.
+
+    Durations are whole minutes, drawn uniformly from a (low, high) range
+    or by a callable(rng) returning one duration:
+
+    walk_minutes -- Reserve -> StartRide (walking to the scooter)
+    ride_minutes -- StartRide -> EndRide
+    gap_minutes  -- time a commuter stays idle before the next request
+    retry_minutes -- wait before retrying when no scooter is free
+    trace        -- optional petri_tools.TraceRecorder receiving every
+                    firing and clock jump
+    ledger       -- the petri_tools.Ledger of a net built with ledger=...
+                    (its aggregates are saved in checkpoints)
+    """
+
+    def __init__(self, net, seed=0, walk_minutes=(1, 5),
+                 ride_minutes=(5, 30), gap_minutes=(60, 300),
+                 retry_minutes=5, trace=None, ledger=None):
+        self.engine = net if hasattr(net, 'marking') else CompiledNet(net)
+        self.trace = trace
+        self.ledger = ledger
+        self.rng = random.Random(seed)
+        self.walk_minutes = walk_minutes
+        self.ride_minutes = ride_minutes
+        self.gap_minutes = gap_minutes
+        self.retry_minutes = retry_minutes
+        self.queue = []                 # heap of (time, seq, name, binding)
+        self._seq = 0                   # FIFO order among equal timestamps
+        (self.now,) = self.engine.marking['Clock']
+        self.fired = Counter()
+        self.retries = 0
+        self.ride_time = 0              # minutes of completed rides
+        self.scooters = None            # spatial index (city nets)
+        self.distance = 0.0             # km walked to reserved scooters
+        if 'Stations' in self.engine.marking:
+            positions = station_positions(self.engine)
+            self.stations = sorted(positions)
+            self.scooters = SpatialIndex(
+                positions, place='ScooterPool',
+                tokens=self.engine.marking['ScooterPool'])
+
+    def _draw(self, bounds):
+        if callable(bounds):
+            return bounds(self.rng)
+        return self.rng.randint(*bounds)
+
+    def schedule(self, at, name, binding):
+        """Queue transition `name` to fire with `binding` at time `at`."""
+        heapq.heappush(self.queue, (at, self._seq, name, binding))
+        self._seq += 1
+
+    def set_clock(self, at):
+        """Move the Clock token to time `at`."""
+        if self.trace is not None:
+            self.trace.record(None, {'minutes': at - self.now},
+                              ((('Clock', self.now),), (('Clock', at),)))
+        self.engine.marking['Clock'] = {at: 1}
+        self.now = at
+
+    def _fire(self, name, binding):
+        delta = self.engine.fire(name, binding)
+        if self.trace is not None:
+            self.trace.record(name, binding, delta)
+        if self.scooters is not None:
+            self.scooters.apply(delta)
+        self.fired[name] += 1
+        return delta
+
+    def start(self, first_request=None):
+        """
+        Schedule one ride request per commuter currently in CommuterPool,
+        spread over `first_request` = (low, high) minutes from now
+        (default: the idle gap).
+        """
+        bounds = first_request or self.gap_minutes
+        for token, count in list(self.engine.marking['CommuterPool'].items()):
+            for _ in range(count):
+                self.schedule(self.now + self._draw(bounds), 'Reserve',
+                              commuter_binding(token))
+
+    # -----------------------------------------------------------------------
+    # EVENT HANDLERS
+    # -----------------------------------------------------------------------
+
+    def _reserve(self, binding):
+        if self.scooters is not None:
+            parked = self.scooters.nearest(binding['x'], binding['y'])
+        else:
+            parked = self.engine.marking['ScooterPool']
+        if not parked:
+            self.retries += 1
+            self.schedule(self.now + self.retry_minutes, 'Reserve', binding)
+            return
+        s, loc = next(iter(parked))
+        if self.scooters is not None:
+            x, y = self.scooters.positions[loc]
+            self.distance += ((x - binding['x']) ** 2
+                              + (y - binding['y']) ** 2) ** 0.5
+        self._fire('Reserve', dict(binding, s=s, loc=loc))
+        self.schedule(self.now + self._draw(self.walk_minutes), 'StartRide',
+                      dict(binding, s=s))
+
+    def _start_ride(self, binding):
+        self._fire('StartRide', dict(binding, t=self.now))
+        self.schedule(self.now + self._draw(self.ride_minutes), 'EndRide',
+                      dict(binding, start_t=self.now))
+
+    def _end_ride(self, binding):
+        if self.scooters is not None:
+            dest = self.rng.choice(self.stations)
+            x, y = self.scooters.positions[dest]
+            binding = dict(binding, dest=dest, x=x, y=y)
+        self._fire('EndRide', dict(binding, now=self.now))
+        self.ride_time += self.now - binding['start_t']
+        # Payment is immediate: settle this ride's PaymentQueue token now
+        # (one guard test picks ProcessPayment or PaymentDeclined)
+        name, payment = self.engine.choose('ProcessPayment')
+        delta = self._fire(name, payment)
+        if name == 'ProcessPayment':
+            # the commuter's token with the new balance (and position)
+            (commuter,) = [token for place, token in delta[1]
+                           if place == 'CommuterPool']
+            self.schedule(self.now + self._draw(self.gap_minutes), 'Reserve',
+                          commuter_binding(commuter))
+
+    # -----------------------------------------------------------------------
+    # CHECKPOINTS
+    # -----------------------------------------------------------------------
+
+    def checkpoint(self, path):
+        """Save marking, event queue, RNG state and counters to `path`."""
+        ledger = self.ledger.aggregates() if self.ledger is not None else None
+        save_checkpoint(path, self.engine.marking, self.engine.name,
+                        now=self.now, seq=self._seq, queue=self.queue,
+                        rng=self.rng.getstate(), fired=dict(self.fired),
+                        retries=self.retries, ride_time=self.ride_time,
+                        distance=self.distance, ledger=ledger)
+
+    def resume(self, path):
+        """Continue from a checkpoint written by `checkpoint()`."""
+        marking, state = load_checkpoint(path, self.engine.name)
+        restore(self.engine, marking)
+        self.now = state['now']
+        self._seq = state['seq']
+        self.queue = [tuple(event) for event in state['queue']]
+        heapq.heapify(self.queue)
+        self.rng.setstate(state['rng'])
+        self.fired = Counter(state['fired'])
+        self.retries = state['retries']
+        self.ride_time = state['ride_time']
+        self.distance = state.get('distance', 0.0)
+        if self.ledger is not None and state.get('ledger') is not None:
+            self.ledger.restore(state['ledger'])
+        if self.scooters is not None:
+            self.scooters.load(self.engine.marking['ScooterPool'])
+
+    def run(self, until):
+        """Process events in time order up to (and including) `until`."""
+        handlers = {'Reserve': self._reserve,
+                    'StartRide': self._start_ride,
+                    'EndRide': self._end_ride}
+        events = 0
+        while self.queue and self.queue[0][0] <= until:
+            at, _, name, binding = heapq.heappop(self.queue)
+            if at != self.now:
+                self.set_clock(at)
+            handlers[name](binding)
+            events += 1
+        return events
+
+
+def _summary(marking, ledger=None):
+    if ledger is not None:
+        revenue = ledger.total
+    else:
+        revenue = sum(cost * count for (u, cost, status), count
+                      in marking['BillingHistory'].items())
+    print(f"    still on the road : {len(marking['OnRide'])}")
+    print(f"    revenue           : {revenue:.2f}€")
+
+
+def _fleet(commuters, scooters, stations, seed, city, ledger=None):
+    create = create_city_net if city else create_fleet_net
+    return create(commuters, scooters, stations, wallet=(5, 60), seed=seed,
+                  ledger=ledger)
+
+
+def simulate_day(commuters, scooters, stations, start=360, end=1440, seed=0,
+                 checkpoint=None, resume=None, trace_path=None, city=False,
+                 ledger_path=None):
+    """
+    Simulate one day of fleet operation (or the part up to `end`); print
+    a summary.
+
+    checkpoint -- save the simulation state to this file at `end`
+    resume     -- continue from this checkpoint instead of `start`
+    trace_path -- record every firing to this JSONL file
+    city       -- create_city_net() fleet (nearest-scooter matching)
+    ledger_path -- stream BillingHistory to this CSV file (appended to)
+    """
+    ledger = None
+    if ledger_path is not None:
+        ledger = Ledger(ledger_path, BILLING_FIELDS)
+    net = _fleet(commuters, scooters, stations, seed, city, ledger)
+    trace = None
+    if trace_path is not None:
+        trace = TraceRecorder(net.get_marking(), capacity=0, path=trace_path,
+                              sinks=sink_places(net))
+    sim = TimedSimulation(net, seed, trace=trace, ledger=ledger)
+    if resume is not None:
+        sim.resume(resume)
+        start = sim.now
+    else:
+        sim.set_clock(start)
+        sim.start()
+    began = time.perf_counter()
+    events = sim.run(end)
+    seconds = time.perf_counter() - began
+    if checkpoint is not None:
+        sim.checkpoint(checkpoint)
+    if trace is not None:
+        trace.close()
+    if ledger is not None:
+        ledger.close()
+
+    print("=" * 70)
+    print("EXERCISE 6: Timed Simulation (event-queue scheduler)")
+    print(f"{commuters} commuters, {scooters} scooters, {stations} stations, "
+          f"clock {start} -> {end}")
+    print("=" * 70)
+    if resume is not None:
+        print(f"    resumed from      : {resume}")
+    print(f"    simulated minutes : {end - start}")
+    print(f"    events processed  : {events} in {seconds:.2f}s "
+          f"({events / max(seconds, 1e-9):.0f} events/s)")
+    print(f"    rides completed   : {sim.fired['EndRide']}")
+    print(f"    paid / declined   : {sim.fired['ProcessPayment']} / "
+          f"{sim.fired['PaymentDeclined']}")
+    print(f"    no scooter free   : {sim.retries} retries")
+    if sim.scooters is not None and sim.fired['Reserve']:
+        print(f"    walk to scooter   : "
+              f"{sim.distance / sim.fired['Reserve']:.2f} km on average")
+    _summary(sim.engine.marking, ledger)
+    if ledger is not None:
+        print(f"    ledger            : {ledger_path} ({ledger.count} records)")
+    if checkpoint is not None:
+        print(f"    checkpoint        : {checkpoint}")
+    print("=" * 70)
+    return sim
+
+
+def replay_day(path, commuters, scooters, stations, seed=0, city=False):
+    """Re-apply a recorded trace to a fresh fleet net; print a summary."""
+    engine = CompiledNet(_fleet(commuters, scooters, stations, seed, city))
+    initial, records = read_trace(path)
+    restore(engine, initial)
+    began = time.perf_counter()
+    count = replay(engine, records)
+    seconds = time.perf_counter() - began
+
+    print("=" * 70)
+    print(f"EXERCISE 6: Replay of {path}")
+    print("=" * 70)
+    print(f"    records replayed  : {count} in {seconds:.2f}s "
+          f"({count / max(seconds, 1e-9):.0f} records/s)")
+    print(f"    clock             : {next(iter(engine.marking['Clock']))}")
+    _summary(engine.marking)
+    print("=" * 70)
+    return engine
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commuters', type=int, default=2000)
+    parser.add_argument('--scooters', type=int, default=500)
+    parser.add_argument('--stations', type=int, default=25)
+    parser.add_argument('--start', type=int, default=360,
+                        help="clock at the start of the day (minutes)")
+    parser.add_argument('--end', type=int, default=1440)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help="save the simulation state at --end")
+    parser.add_argument('--resume', metavar='FILE',
+                        help="continue from a --checkpoint file")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="record every firing (JSONL)")
+    parser.add_argument('--replay', metavar='FILE',
+                        help="replay a --trace file instead of simulating")
+    parser.add_argument('--ledger', metavar='FILE',
+                        help="stream BillingHistory to FILE (CSV)")
+    parser.add_argument('--city', action='store_true',
+                        help="stations and commuters on a map, nearest-scooter "
+                             "matching")
+    args = parser.parse_args()
+    if args.replay:
+        replay_day(args.replay, args.commuters, args.scooters, args.stations,
+                   args.seed, args.city)
+    else:
+        simulate_day(args.commuters, args.scooters, args.stations,
+                     args.start, args.end, args.seed, args.checkpoint,
+                     args.resume, args.trace, args.city, args.ledger)
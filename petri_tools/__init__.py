@@ -0,0 +1,14 @@
+"""
+Shared Petri net tooling for the SNAKES models in Exercise_05 and
+Exercise_06 (execution backends, analysis and simulation helpers).
+"""
+
+from petri_tools.compiled import CompiledNet
+from petri_tools.keyed import KeyedPlace
+from petri_tools.arcs import Inhibitor
+from petri_tools.enabling import EnablingTracker
+from petri_tools.statespace import explore
+from petri_tools.symmetry import Symmetry
+from petri_tools.rendering import Renderer
+from petri_tools.trace import TraceRecorder
+from petri_tools.ledger import Ledger, SinkPlace
@@ -0,0 +1,60 @@
+"""
+Inhibitor arcs with a constant-time enabling check.
+
+`snakes.nets.Inhibitor` decides whether a place inhibits a transition by
+enumerating the modes of its annotation over every token of the place,
+even for the common case "the place must be empty"
+(`Inhibitor(Variable('x'))`). `Inhibitor` below is a drop-in subclass
+that answers that case from the number of distinct tokens
+(`MultiSet.size()`, a dict length), so the check costs the same for one
+token or a million. Annotations with a condition, or matching only some
+tokens, keep the SNAKES behaviour.
+
+Test arcs need no new type: `snakes.nets.Test` is supported as such by
+`petri_tools.CompiledNet` and `petri_tools.EnablingTracker`.
+"""
+
+from snakes.nets import Expression, Inhibitor as _Inhibitor
+from snakes.nets import ModeError, Substitution, Variable
+
+
+class Inhibitor(_Inhibitor):
+    """
+    Inhibitor arc. Without arguments: the transition is enabled only while
+    the place holds no token at all (checked in O(1)).
+
+    `Inhibitor(annotation, condition)` behaves as in SNAKES.
+    """
+
+    def __init__(self, annotation=None, condition=None):
+        if annotation is None:
+            annotation = Variable('token')
+        _Inhibitor.__init__(self, annotation, condition)
+
+    @property
+    def empty(self):
+        """True if any token at all inhibits (the place must be empty)."""
+        return (isinstance(self._annotation, Variable)
+                and self._condition == Expression("True"))
+
+    def vars(self):
+        if self.empty:
+            return []
+        return _Inhibitor.vars(self)
+
+    def modes(self, values):
+        if not self.empty:
+            return _Inhibitor.modes(self, values)
+        if values.size():
+            raise ModeError("inhibited: place not empty")
+        return [Substitution()]
+
+    def check(self, binding, tokens):
+        if not self.empty:
+            return _Inhibitor.check(self, binding, tokens)
+        return not tokens.size()
+
+    def __str__(self):
+        if self.empty:
+            return "{empty}"
+        return _Inhibitor.__str__(self)
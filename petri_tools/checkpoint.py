@@ -0,0 +1,102 @@
+"""
+Checkpoints of net markings and replay of recorded traces.
+
+A checkpoint is a gzip-compressed JSON document holding one marking (in
+the compiled form `{place: {token: count}}`, tokens encoded as in
+`petri_tools.trace`) plus any JSON-able state of the driver that took it
+(event queue, RNG state, counters, ...). `restore()` loads a marking into
+a SNAKES net or a `CompiledNet`.
+
+`replay()` re-applies the delta records of a trace to a net. Nothing is
+matched or evaluated: no mode search, no guards, no arc expressions, so a
+recorded run is reproduced at the speed of dictionary updates.
+"""
+
+import gzip
+import json
+
+from petri_tools.trace import (_dump_marking, _load_marking, apply_delta,
+                               to_counts, to_marking)
+
+FORMAT = 1
+
+
+def save_checkpoint(path, marking, net=None, **state):
+    """
+    Write `marking` (SNAKES `Marking` or compiled marking) to `path`.
+
+    net   -- optional net name stored for checking on load
+    state -- extra JSON-able values; lists come back as tuples
+    """
+    document = {"format": FORMAT, "net": net,
+                "marking": _dump_marking(to_counts(marking)),
+                "state": state}
+    with gzip.open(path, "wt", encoding="utf-8") as outfile:
+        json.dump(document, outfile, separators=(",", ":"))
+
+
+def _thaw(value):
+    # JSON has no tuples: every list in a checkpoint was a tuple
+    if isinstance(value, dict):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return tuple(_thaw(item) for item in value)
+    return value
+
+
+def load_checkpoint(path, net=None):
+    """
+    Read a checkpoint. Returns (compiled marking, state dict).
+    Raises ValueError if `net` is given and differs from the stored name.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as infile:
+        document = json.load(infile)
+    if document.get("format") != FORMAT:
+        raise ValueError("%s: unsupported checkpoint format %r"
+                         % (path, document.get("format")))
+    if net is not None and document["net"] not in (None, net):
+        raise ValueError("%s: checkpoint of net %r, not %r"
+                         % (path, document["net"], net))
+    return (_load_marking(document["marking"]),
+            _thaw(document["state"]))
+
+
+def restore(target, marking):
+    """Load a compiled marking into a SNAKES net or a `CompiledNet`."""
+    if hasattr(target, "marking"):
+        target.marking = {place: dict(marking.get(place, {}))
+                          for place in target.places}
+    else:
+        target.set_marking(to_marking(marking))
+
+
+def replay(target, records):
+    """
+    Apply the deltas of `records` (`Firing`s, e.g. from `read_trace()`)
+    to a SNAKES net or a `CompiledNet`, in place. Returns the number of
+    records applied.
+
+    The records are trusted: a delta that does not fit the marking
+    raises KeyError (compiled) or ValueError (SNAKES) half-way. Tokens
+    produced into a sink place go to its ledger, as in the recorded run.
+    """
+    count = 0
+    if hasattr(target, "marking"):
+        marking = target.marking
+        sinks = target.sinks
+        for record in records:
+            apply_delta(marking, record.consumed, record.produced, sinks)
+            if sinks:
+                for name, token in record.produced:
+                    if name in sinks:
+                        sinks[name].append(token)
+            count += 1
+        return count
+    place = target.place
+    for record in records:
+        for name, token in record.consumed:
+            place(name).remove([token])
+        for name, token in record.produced:
+            place(name).add([token])
+        count += 1
+    return count
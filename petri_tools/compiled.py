@@ -0,0 +1,417 @@
+"""
+Compiled execution backend for SNAKES Petri nets.
+
+SNAKES re-unifies every arc annotation (`Variable`, `Value`, `Tuple`,
+`Expression`) each time `Transition.modes()` or `Transition.fire()` is
+called. `CompiledNet` walks the net ONCE and generates a specialised
+Python function per transition:
+
+- `modes_<T>(m)`   nested loops over the input places, with the arc
+                   patterns unrolled into plain tuple indexing/comparisons
+- `first_<T>(m)`   the same loops, returning the first binding found
+- `fire_<T>(m, ...)` consumes/produces the tokens of one binding by
+                   direct dictionary lookups (no pattern matching at all)
+                   and returns them as the firing's delta
+- `choose_<T>(m)`  for T in an exclusive pair (petri_tools.guards), the
+                   loops of first_<T> and one guard test picking T or
+                   its partner
+
+The marking is a dict `{place_name: {token: count}}`. It can be copied
+to/from a SNAKES `Marking`, so a simulation can switch between the
+SNAKES path and the compiled path at any step.
+"""
+
+from snakes.nets import (Marking, MultiSet, Substitution, Inhibitor, Test,
+                         Value, Variable, Expression, Tuple)
+
+from petri_tools.guards import exclusive_pairs
+from petri_tools.ledger import SinkPlace, sink_places
+
+
+class CompiledNet(object):
+    """
+    Specialised firing functions generated from a SNAKES `PetriNet`.
+
+    Supported arc annotations: `Value`, `Variable`, `Tuple` (nested) and,
+    on output arcs only, `Expression`. Input arcs may also be `Test` arcs
+    (matched, never consumed) and `Inhibitor` arcs that forbid any token
+    or one constant token (O(1) checks). Guards may be any `Expression`.
+    Tokens produced into a `petri_tools.ledger.SinkPlace` are appended to
+    its ledger; that place stays empty in the compiled marking.
+    Pairs of transitions with the same inputs and complementary guards
+    (`exclusive`) also get a `choose` function deciding between them.
+    Place type constraints are not checked (all places in this repo use
+    the default `tAll`).
+    """
+
+    def __init__(self, net):
+        self.name = net.name
+        self.transitions = [t.name for t in net.transition()]
+        self.places = [p.name for p in net.place()]
+        self.marking = {}
+        # sink place name -> its Ledger (these places stay empty)
+        self.sinks = sink_places(net)
+        self.source = {}
+        self._modes = {}
+        self._first = {}
+        self._fire = {}
+        self._free = {}
+        self._params = {}
+        self._choose = {}
+        # transition -> places its fire function mutates
+        self.touched = {}
+
+        # Expressions are evaluated in a snapshot of the net's globals
+        env = dict(net.globals._env, _ONCE=(None,))
+        for trans in net.transition():
+            src, params, free = _compile_transition(trans, env)
+            exec(compile(src, "<compiled %s>" % trans.name, "exec"), env)
+            self.source[trans.name] = src
+            self._modes[trans.name] = env["modes_" + trans.name]
+            self._first[trans.name] = env["first_" + trans.name]
+            self._fire[trans.name] = env["fire_" + trans.name]
+            self._params[trans.name] = params
+            self._free[trans.name] = free
+            self.touched[trans.name] = sorted(
+                set(p.name for p, label in trans.input()
+                    if not isinstance(label, Test))
+                | set(p.name for p, _ in trans.output()))
+        # exclusive pairs (ProcessPayment / PaymentDeclined): name -> partner
+        self.exclusive = {}
+        for name, partner in exclusive_pairs(net):
+            if self._free[name] or self._free[partner]:
+                continue
+            src = _compile_choice(net.transition(name),
+                                  net.transition(partner), env)
+            exec(compile(src, "<compiled choose %s>" % name, "exec"), env)
+            self.source[name] += "\n" + src
+            self.exclusive[name] = partner
+            self.exclusive[partner] = name
+            self._choose[name] = self._choose[partner] = env["choose_" + name]
+        self.set_marking(net.get_marking())
+
+    # -----------------------------------------------------------------------
+    # MARKING
+    # -----------------------------------------------------------------------
+
+    def set_marking(self, marking):
+        """Load a SNAKES `Marking` (places not listed are emptied)."""
+        self.marking = {name: {} for name in self.places}
+        for name, tokens in marking.items():
+            if name in self.marking:
+                # dict.items keeps the token order (domain() is a set)
+                self.marking[name] = dict(dict.items(tokens))
+
+    def get_marking(self):
+        """Return the current marking as a SNAKES `Marking`."""
+        result = Marking()
+        for name, tokens in self.marking.items():
+            if tokens:
+                ms = MultiSet()
+                for token, count in tokens.items():
+                    ms.add([token], count)
+                result[name] = ms
+        return result
+
+    def sync(self, net):
+        """Copy the compiled marking back into a SNAKES net."""
+        net.set_marking(self.get_marking())
+
+    def tokens(self, place):
+        """Return the tokens of `place` as a list (with repetitions)."""
+        return [token for token, count in self.marking[place].items()
+                for _ in range(count)]
+
+    # -----------------------------------------------------------------------
+    # FIRING
+    # -----------------------------------------------------------------------
+
+    def modes(self, name, marking=None):
+        """
+        Return the bindings (dicts) that enable transition `name` in
+        `marking` (default: the current marking).
+
+        Like SNAKES, a transition whose output arcs use variables not
+        bound by its inputs has no computable modes and returns [].
+        """
+        if self._free[name]:
+            return []
+        return self._modes[name](self.marking if marking is None else marking)
+
+    def first(self, name, marking=None):
+        """
+        Return the first binding found that enables `name`, or None.
+
+        Stops at the first match instead of enumerating every mode, so a
+        driver can pick a binding in O(1) when the first tokens fit.
+        """
+        if self._free[name]:
+            return None
+        return self._first[name](self.marking if marking is None else marking)
+
+    def choose(self, name, marking=None):
+        """
+        Return (transition, binding) for the first binding that enables
+        `name` or its exclusive partner (see `exclusive`), or None.
+
+        Both transitions read the same tokens and have complementary
+        guards, so the guard is evaluated once per token instead of
+        first(name) and then first(partner) each scanning and testing.
+        Without a partner this is (name, first(name)).
+        """
+        choose = self._choose.get(name)
+        if choose is None:
+            binding = self.first(name, marking)
+            return None if binding is None else (name, binding)
+        return choose(self.marking if marking is None else marking)
+
+    def fire(self, name, binding, marking=None):
+        """
+        Fire transition `name` with `binding` (a dict or `Substitution`)
+        in `marking` (default: the current marking), in place.
+
+        Returns the delta `(consumed, produced)`, two tuples of
+        (place, token) pairs (see petri_tools.trace).
+
+        Raises ValueError if the binding does not enable the transition,
+        leaving the marking unchanged.
+        """
+        if isinstance(binding, Substitution):
+            binding = binding.dict()
+        if not self._params[name] <= binding.keys():
+            missing = self._params[name] - binding.keys()
+            raise ValueError("transition %s not enabled for %s (unbound: %s)"
+                             % (name, binding, ", ".join(sorted(missing))))
+        return self._fire[name](self.marking if marking is None else marking,
+                                **binding)
+
+    def successor(self, marking, name, binding):
+        """
+        Return the marking reached by firing `name` from `marking`,
+        leaving `marking` untouched (only the places the transition
+        touches are copied).
+        """
+        result = dict(marking)
+        for place in self.touched[name]:
+            result[place] = dict(marking[place])
+        self._fire[name](result, **binding)
+        return result
+
+
+# ---------------------------------------------------------------------------
+# CODE GENERATION
+# ---------------------------------------------------------------------------
+
+def _vars(annotation):
+    """Variables bound by an input pattern, in left-to-right order."""
+    if isinstance(annotation, Inhibitor):
+        return []
+    if isinstance(annotation, Test):
+        return _vars(annotation._annotation)
+    if isinstance(annotation, Variable):
+        return [annotation.name]
+    if isinstance(annotation, Tuple):
+        result = []
+        for component in annotation:
+            result.extend(v for v in _vars(component) if v not in result)
+        return result
+    if isinstance(annotation, Value):
+        return []
+    raise ValueError("unsupported input annotation %r" % annotation)
+
+
+def _const(value, env):
+    """Register a constant in the generated module and return its name."""
+    index = 0
+    while "_c%d" % index in env:
+        index += 1
+    name = "_c%d" % index
+    env[name] = value
+    return name
+
+
+def _build(annotation, env):
+    """Python expression producing the token of an arc annotation."""
+    if isinstance(annotation, Variable):
+        return annotation.name
+    if isinstance(annotation, Value):
+        return _const(annotation.value, env)
+    if isinstance(annotation, Expression):
+        return "(%s)" % annotation
+    if isinstance(annotation, Tuple):
+        items = [_build(c, env) for c in annotation]
+        return "(%s,)" % ", ".join(items)
+    raise ValueError("unsupported annotation %r" % annotation)
+
+
+def _match(annotation, src, bound, env, lines, indent):
+    """Emit the checks/assignments that unify `src` with a pattern."""
+    pad = "    " * indent
+    if isinstance(annotation, Variable):
+        if annotation.name in bound:
+            lines.append("%sif %s != %s: continue" % (pad, src, annotation.name))
+        else:
+            lines.append("%s%s = %s" % (pad, annotation.name, src))
+            bound.add(annotation.name)
+    elif isinstance(annotation, Value):
+        lines.append("%sif %s != %s: continue"
+                     % (pad, src, _const(annotation.value, env)))
+    elif isinstance(annotation, Tuple):
+        size = len(list(annotation))
+        lines.append("%sif %s.__class__ is not tuple or len(%s) != %d: continue"
+                     % (pad, src, src, size))
+        for i, component in enumerate(annotation):
+            _match(component, "%s[%d]" % (src, i), bound, env, lines, indent)
+    else:
+        raise ValueError("unsupported input annotation %r" % annotation)
+
+
+def _inhibited(place, label, env):
+    """Python condition, true when `label` inhibits (m[place] non-empty...)."""
+    inner = label._annotation
+    if label._condition == Expression("True"):
+        if isinstance(inner, Variable):
+            return "m[%r]" % place
+        if isinstance(inner, Value):
+            return "%s in m[%r]" % (_const(inner.value, env), place)
+    raise ValueError("unsupported inhibitor arc %r" % label)
+
+
+def _loops(inputs, inhibitors, env, lines):
+    """
+    Emit the one-shot outer loop, the inhibitor checks and one nested
+    loop per input place binding the input variables; return the indent
+    level of the innermost body.
+    """
+    lines.append("    for _ in _ONCE:")
+    for place, label in inhibitors:
+        lines.append("        if %s: continue"
+                     % _inhibited(place.name, label, env))
+    bound = set()
+    indent = 2
+    for i, (place, label) in enumerate(inputs):
+        pad = "    " * indent
+        lines.append("%s_p%d = m[%r]" % (pad, i, place.name))
+        if set(_vars(label)) <= bound:
+            # Fully bound by earlier arcs: O(1) membership test
+            lines.append("%sif %s in _p%d:" % (pad, _build(label, env), i))
+            indent += 1
+            continue
+        lines.append("%sfor _k%d in _p%d:" % (pad, i, i))
+        indent += 1
+        _match(label, "_k%d" % i, bound, env, lines, indent)
+    return indent
+
+
+def _split(trans):
+    """(inhibitors, inputs, tested) of a transition, see _compile_transition."""
+    # Inhibitors only block; test arcs are matched like input arcs (the
+    # inner annotation) but their tokens are not consumed
+    inhibitors = [(place, label) for place, label in trans.input()
+                  if isinstance(label, Inhibitor)]
+    inputs = [(place, label._annotation if isinstance(label, Test) else label)
+              for place, label in trans.input()
+              if not isinstance(label, Inhibitor)]
+    tested = [isinstance(label, Test) for place, label in trans.input()
+              if not isinstance(label, Inhibitor)]
+    return inhibitors, inputs, tested
+
+
+def _compile_transition(trans, env):
+    """Return (source, parameters, free_variables) for one transition."""
+    name = trans.name
+    inhibitors, inputs, tested = _split(trans)
+    outputs = list(trans.output())
+    guard = None if str(trans.guard) == "True" else str(trans.guard)
+
+    in_vars = []
+    for _, label in inputs:
+        in_vars.extend(v for v in _vars(label) if v not in in_vars)
+    out_vars = set()
+    for _, label in outputs:
+        out_vars.update(label.vars())
+    if guard:
+        out_vars.update(trans.guard.vars())
+    free = set(v for v in out_vars if v not in in_vars and v not in env)
+    params = in_vars + sorted(free)
+
+    # --- modes_<T>(m) / first_<T>(m): nested loops, one per input place ---
+    # (the one-shot outer loop lets every check use `continue`)
+    result = "{%s}" % ", ".join("%r: %s" % (v, v) for v in in_vars)
+    lines = []
+    for kind in ("modes", "first"):
+        lines.append("def %s_%s(m):" % (kind, name))
+        if kind == "modes":
+            lines.append("    _res = []")
+        indent = _loops(inputs, inhibitors, env, lines)
+        pad = "    " * indent
+        if guard:
+            lines.append("%sif not (%s): continue" % (pad, guard))
+        if kind == "modes":
+            lines.append("%s_res.append(%s)" % (pad, result))
+            lines.append("    return _res")
+        else:
+            lines.append("%sreturn %s" % (pad, result))
+            lines.append("    return None")
+        lines.append("")
+
+    # --- fire_<T>(m, **binding): direct consume/produce ---
+    lines.append("def fire_%s(m, %s**_):"
+                 % (name, "".join("%s, " % p for p in params)))
+    for i, (place, label) in enumerate(inputs):
+        lines.append("    _p%d = m[%r]" % (i, place.name))
+        lines.append("    _k%d = %s" % (i, _build(label, env)))
+        lines.append("    if not _p%d.get(_k%d):" % (i, i))
+        lines.append("        raise ValueError('transition %s not enabled: "
+                     "missing %%r in %s' %% (_k%d,))" % (name, place.name, i))
+    for place, label in inhibitors:
+        lines.append("    if %s:" % _inhibited(place.name, label, env))
+        lines.append("        raise ValueError('transition %s not enabled: "
+                     "inhibited by %s')" % (name, place.name))
+    if guard:
+        lines.append("    if not (%s):" % guard)
+        lines.append("        raise ValueError('transition %s not enabled: "
+                     "guard %s is False')" % (name, guard.replace("'", "\\'")))
+    for i, (place, label) in enumerate(inputs):
+        if tested[i]:
+            continue
+        lines.append("    _n = _p%d[_k%d] - 1" % (i, i))
+        lines.append("    if _n: _p%d[_k%d] = _n" % (i, i))
+        lines.append("    else: del _p%d[_k%d]" % (i, i))
+    for j, (place, label) in enumerate(outputs):
+        lines.append("    _t%d = %s" % (j, _build(label, env)))
+        if isinstance(place, SinkPlace):
+            lines.append("    %s(_t%d)" % (_const(place.ledger.append, env), j))
+            continue
+        lines.append("    _q = m[%r]" % place.name)
+        lines.append("    _q[_t%d] = _q.get(_t%d, 0) + 1" % (j, j))
+    lines.append("    return ((%s), (%s))" % (
+        "".join("(%r, _k%d), " % (place.name, i)
+                for i, (place, _) in enumerate(inputs) if not tested[i]),
+        "".join("(%r, _t%d), " % (place.name, j)
+                for j, (place, _) in enumerate(outputs))))
+    lines.append("")
+    return "\n".join(lines), set(params), free
+
+
+def _compile_choice(trans, other, env):
+    """
+    Source of choose_<T>(m) for an exclusive pair (see
+    petri_tools.guards.exclusive_pairs): the loops of first_<T>, and for
+    the first input binding found, one evaluation of the guard of `trans`
+    picks `trans` or `other`.
+    """
+    inhibitors, inputs, _ = _split(trans)
+    in_vars = []
+    for _, label in inputs:
+        in_vars.extend(v for v in _vars(label) if v not in in_vars)
+    result = "{%s}" % ", ".join("%r: %s" % (v, v) for v in in_vars)
+    lines = ["def choose_%s(m):" % trans.name]
+    indent = _loops(inputs, inhibitors, env, lines)
+    pad = "    " * indent
+    lines.append("%sif (%s): return (%r, %s)"
+                 % (pad, trans.guard, trans.name, result))
+    lines.append("%sreturn (%r, %s)" % (pad, other.name, result))
+    lines.append("    return None")
+    lines.append("")
+    return "\n".join(lines)
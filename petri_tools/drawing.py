@@ -0,0 +1,54 @@
+"""
+Drawing without loading the gv plugin up front.
+
+`snakes.plugins.load('gv', 'snakes.nets', 'nets')` imports the plugin
+machinery and the gv, pos and clusters plugins (and through them
+`inspect`, `subprocess`...) and rebuilds every net class, which costs
+more than building and simulating a small net. The exercise scripts
+build their nets from plain `snakes.nets` classes instead, with
+`PetriNet` taken from here: the same net, plus a `draw()` that loads gv
+on its first call.
+
+gv's `draw()` only needs the net's nodes and arcs and a `clusters`
+attribute (plugin clusters) listing the nodes, so `draw(net, ...)` runs
+it on a view of any plain SNAKES net: a gv `PetriNet` instance sharing
+the net's places and transitions, with one flat cluster of all nodes.
+"""
+
+import snakes.nets
+
+_gv = None
+
+
+def load_gv():
+    """The `snakes.nets` module extended by the gv plugin (loaded once)."""
+    global _gv
+    if _gv is None:
+        import snakes.plugins
+        _gv = snakes.plugins.load('gv', 'snakes.nets', 'nets')
+    return _gv
+
+
+def draw(net, filename, **options):
+    """
+    Draw `net` (any SNAKES `PetriNet`) with the gv plugin: see gv's
+    `PetriNet.draw(filename, engine="dot", ..., place_attr=None, ...)`.
+    Returns the gv `Graph` (`filename` None: lay out only, e.g. for
+    `.dot()`).
+    """
+    gv = load_gv()
+    if isinstance(net, gv.PetriNet):
+        return gv.PetriNet.draw(net, filename, **options)
+    from snakes.plugins.clusters import Cluster
+    view = gv.PetriNet.__new__(gv.PetriNet)
+    view.__dict__.update(net.__dict__)
+    view.clusters = Cluster(nodes=[node.name for node in net.node()])
+    return view.draw(filename, **options)
+
+
+class PetriNet(snakes.nets.PetriNet):
+    """A SNAKES `PetriNet` whose `draw()` loads the gv plugin on demand."""
+
+    def draw(self, filename, **options):
+        """Draw the net to `filename` (see `draw()`)."""
+        return draw(self, filename, **options)
@@ -0,0 +1,106 @@
+"""
+Incremental tracking of enabled transitions.
+
+A driver that asks "what can fire now?" after every step would normally
+call `modes()` on every transition of the net. `EnablingTracker` caches
+the modes of each transition and, after a firing, only recomputes the
+transitions that read from a place whose marking actually changed.
+
+Example (Exercise 5): after `EndWrite` the places Writing, Idle and Lock
+change, so only EndWrite, StartRead and StartWrite are recomputed;
+EndRead (which only reads Reading) keeps its cached modes.
+"""
+
+from snakes.nets import Test
+
+from petri_tools.trace import snakes_fire
+
+
+class EnablingTracker(object):
+    """
+    Cache of the modes of every transition of `net`, kept up to date
+    incrementally as transitions are fired through `fire()`.
+
+    engine -- optional petri_tools.CompiledNet built from `net`; when given,
+              modes are dicts and firing goes through the compiled backend,
+              otherwise modes are SNAKES `Substitution`s.
+
+    Changes made to the marking behind the tracker's back (e.g.
+    `net.set_marking(...)`) must be followed by `refresh()`.
+    """
+
+    def __init__(self, net, engine=None):
+        self.net = net
+        self.engine = engine
+        self.rechecks = 0
+
+        # place -> transitions that have an input arc from it
+        self._readers = {place.name: [] for place in net.place()}
+        # transition -> places whose marking changes when it fires
+        self._changes = {}
+        for trans in net.transition():
+            inputs = dict((p.name, label) for p, label in trans.input())
+            outputs = dict((p.name, label) for p, label in trans.output())
+            for place in inputs:
+                self._readers[place].append(trans.name)
+            # A place read and written back with the same annotation
+            # (e.g. Clock: Variable('t') in and out), or only read through
+            # a test or inhibitor arc, is left unchanged
+            self._changes[trans.name] = [
+                place for place in set(inputs) | set(outputs)
+                if not (place in inputs and place in outputs
+                        and inputs[place] == outputs[place])
+                and not (place not in outputs
+                         and isinstance(inputs[place], Test))]
+        self._modes = {}
+        self.refresh()
+
+    def _compute(self, name):
+        self.rechecks += 1
+        if self.engine is not None:
+            return self.engine.modes(name)
+        return self.net.transition(name).modes()
+
+    def refresh(self):
+        """Recompute the modes of every transition (full scan)."""
+        for trans in self.net.transition():
+            self._modes[trans.name] = self._compute(trans.name)
+
+    # -----------------------------------------------------------------------
+    # QUERIES
+    # -----------------------------------------------------------------------
+
+    def modes(self, name):
+        """Return the cached modes of transition `name`."""
+        return self._modes[name]
+
+    def is_enabled(self, name):
+        """Return True if transition `name` has at least one mode."""
+        return bool(self._modes[name])
+
+    def enabled(self):
+        """Return the current list of enabled (transition, binding) pairs."""
+        return [(name, binding)
+                for name, modes in self._modes.items()
+                for binding in modes]
+
+    # -----------------------------------------------------------------------
+    # FIRING
+    # -----------------------------------------------------------------------
+
+    def fire(self, name, binding):
+        """
+        Fire `name` with `binding` and update the modes of the transitions
+        adjacent to the places whose marking changed. Returns the delta
+        `(consumed, produced)` of the firing (see petri_tools.trace).
+        """
+        if self.engine is not None:
+            delta = self.engine.fire(name, binding)
+        else:
+            delta = snakes_fire(self.net, name, binding)
+        stale = set()
+        for place in self._changes[name]:
+            stale.update(self._readers[place])
+        for other in stale:
+            self._modes[other] = self._compute(other)
+        return delta
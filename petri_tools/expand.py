@@ -0,0 +1,209 @@
+"""
+Expansion of a coloured SNAKES net into a place/transition net.
+
+Structural techniques (stubborn sets, invariants, unfoldings, symbolic
+encodings) are defined on P/T nets. `expand()` turns a coloured net with
+finite colour domains into one: every (place, token) pair that can ever
+be marked becomes a P/T place ("slot"), every (transition, binding) pair
+that can ever fire becomes a P/T transition ("instance") with
+pre/post/test/inhibitor slot vectors.
+
+The colour domains are computed as a fixpoint over-approximation: the
+modes of each transition are enumerated on a marking holding every token
+seen so far in unlimited supply (inhibitor arcs ignored), and the tokens
+they produce are added, until nothing new appears. Instances found that
+way may be unreachable; they only make the analyses more conservative.
+Nets whose tokens keep changing (counters, balances, clocks) have no
+finite expansion and raise ValueError once `max_instances` is exceeded.
+"""
+
+from operator import itemgetter
+
+from snakes.nets import Expression, Inhibitor, Substitution, Test, Value, Variable
+
+from petri_tools.compiled import CompiledNet
+
+# Token supply of the over-approximating marking
+_PLENTY = 1 << 30
+
+
+class PTNet(object):
+    """
+    Place/transition expansion of a coloured net (see `expand()`).
+
+    slots        -- list of (place, token); slot number = index
+    slot         -- {(place, token): slot number}
+    instances    -- list of (transition, binding dict); index = instance
+    pre, post    -- per instance, tuple of (slot, count) consumed/produced
+    test         -- per instance, tuple of (slot, count) read, not consumed
+    inhibit      -- per instance, tuple of slots that must be empty
+    initial      -- initial marking, tuple of counts indexed by slot
+    """
+
+    def __init__(self, places):
+        self.places = list(places)
+        self.slots = []
+        self.slot = {}
+        self.instances = []
+        self.pre = []
+        self.post = []
+        self.test = []
+        self.inhibit = []
+        self.initial = ()
+
+    def _slot(self, place, token):
+        index = self.slot.get((place, token))
+        if index is None:
+            index = self.slot[place, token] = len(self.slots)
+            self.slots.append((place, token))
+        return index
+
+    def slots_of(self, place):
+        """Slot numbers of `place`, in slot order."""
+        return [i for i, (name, _) in enumerate(self.slots) if name == place]
+
+    # -----------------------------------------------------------------------
+    # P/T SEMANTICS (markings are sequences of counts indexed by slot)
+    # -----------------------------------------------------------------------
+
+    def enabled(self, marking, instance):
+        """True if `instance` may fire in `marking`."""
+        for slot, count in self.pre[instance]:
+            if marking[slot] < count:
+                return False
+        for slot, count in self.test[instance]:
+            if marking[slot] < count:
+                return False
+        for slot in self.inhibit[instance]:
+            if marking[slot]:
+                return False
+        return True
+
+    def fire(self, marking, instance):
+        """Return the successor of `marking` (a bytes key) by `instance`."""
+        result = bytearray(marking)
+        for slot, count in self.pre[instance]:
+            result[slot] -= count
+        for slot, count in self.post[instance]:
+            if result[slot] + count > 255:
+                raise ValueError("more than 255 tokens %r in %s"
+                                 % (self.slots[slot][1], self.slots[slot][0]))
+            result[slot] += count
+        return bytes(result)
+
+    def encode(self, marking):
+        """Bytes key of a compiled marking ({place: {token: n}})."""
+        vector = bytearray(len(self.slots))
+        for place, tokens in marking.items():
+            for token, count in tokens.items():
+                index = self.slot.get((place, token))
+                if index is None:
+                    raise ValueError("token %r in %s is outside the expansion"
+                                     % (token, place))
+                if count > 255:
+                    raise ValueError("more than 255 tokens %r in %s"
+                                     % (token, place))
+                vector[index] = count
+        return bytes(vector)
+
+    def decode(self, marking):
+        """Compiled marking of a slot-count sequence."""
+        result = {place: {} for place in self.places}
+        for index, count in enumerate(marking):
+            if count:
+                place, token = self.slots[index]
+                result[place][token] = count
+        return result
+
+    def __str__(self):
+        return ("%d places (slots), %d transitions (instances)"
+                % (len(self.slots), len(self.instances)))
+
+
+def _tested(label, binding):
+    """Tokens read by a test arc for `binding`."""
+    return label._annotation.flow(Substitution(**binding))
+
+
+def _inhibiting(ptnet, place, label):
+    """Slots of `place` that inhibit through `label`."""
+    inner = label._annotation
+    if label._condition == Expression("True"):
+        if isinstance(inner, Variable):
+            return ptnet.slots_of(place)
+        if isinstance(inner, Value):
+            return [ptnet._slot(place, inner.value)]
+    raise ValueError("unsupported inhibitor arc %r" % label)
+
+
+def expand(net, max_instances=100000):
+    """
+    Expand `net` (from its current marking) into a `PTNet`.
+
+    Raises ValueError if more than `max_instances` transition instances
+    are found (infinite or very large colour domains).
+    """
+    # The domain search ignores inhibitor arcs (they only restrict modes)
+    relaxed = net.copy()
+    for trans in net.transition():
+        for place, label in trans.input():
+            if isinstance(label, Inhibitor):
+                relaxed.remove_input(place.name, trans.name)
+    engine = CompiledNet(relaxed)
+    ptnet = PTNet(engine.places)
+    for place, tokens in engine.marking.items():
+        for token in tokens:
+            ptnet._slot(place, token)
+    ptnet.initial = tuple(engine.marking[place][token]
+                          for place, token in ptnet.slots)
+
+    domain = {place: dict.fromkeys(tokens, _PLENTY)
+              for place, tokens in engine.marking.items()}
+    seen = set()
+    changed = True
+    while changed:
+        changed = False
+        for name in engine.transitions:
+            for binding in engine.modes(name, domain):
+                key = (name, tuple(sorted(binding.items(), key=itemgetter(0))))
+                if key in seen:
+                    continue
+                seen.add(key)
+                if len(seen) > max_instances:
+                    raise ValueError("%s: more than %d transition instances; "
+                                     "colour domains too large to expand"
+                                     % (net.name, max_instances))
+                scratch = dict(domain)
+                for place in engine.touched[name]:
+                    scratch[place] = dict(domain[place])
+                consumed, produced = engine.fire(name, binding, scratch)
+                for place, token in produced:
+                    if token not in domain[place]:
+                        domain[place][token] = _PLENTY
+                        changed = True
+                ptnet.instances.append((name, binding))
+                pre, post = {}, {}
+                for place, token in consumed:
+                    slot = ptnet._slot(place, token)
+                    pre[slot] = pre.get(slot, 0) + 1
+                for place, token in produced:
+                    slot = ptnet._slot(place, token)
+                    post[slot] = post.get(slot, 0) + 1
+                ptnet.pre.append(tuple(sorted(pre.items())))
+                ptnet.post.append(tuple(sorted(post.items())))
+
+    # Test and inhibitor arcs, now that every slot is known
+    for name, binding in ptnet.instances:
+        trans = net.transition(name)
+        test, inhibit = {}, set()
+        for place, label in trans.input():
+            if isinstance(label, Inhibitor):
+                inhibit.update(_inhibiting(ptnet, place.name, label))
+            elif isinstance(label, Test):
+                for token in _tested(label, binding):
+                    slot = ptnet._slot(place.name, token)
+                    test[slot] = test.get(slot, 0) + 1
+        ptnet.test.append(tuple(sorted(test.items())))
+        ptnet.inhibit.append(tuple(sorted(inhibit)))
+    ptnet.initial += (0,) * (len(ptnet.slots) - len(ptnet.initial))
+    return ptnet
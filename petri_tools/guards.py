@@ -0,0 +1,181 @@
+"""
+Guards and arc expressions compiled once.
+
+SNAKES keeps an `Expression` as a code object, but every evaluation
+(`Transition.enabled()`/`modes()` for a guard, `fire()` for an output arc
+such as `Expression('bal - cost')`) goes through `Evaluator.__call__`:
+the binding's dict gets a `__binding__` entry added and removed, `eval`
+runs with it as locals, and the value is wrapped in a `Token` even for a
+guard. `CachedExpression` compiles the expression once into a plain
+function of its variables (`lambda bal, cost, **_: (bal >= cost)`, with
+the net's globals as its globals), so an evaluation is one call.
+`cache_expressions(net)` switches every guard and arc expression of a net
+to it.
+
+Transitions like ProcessPayment (`bal >= cost`) and PaymentDeclined
+(`bal < cost`) read the same input arcs and have complementary guards: for
+every token exactly one of them is enabled. `exclusive_pairs(net)` finds
+such pairs; `CompiledNet.choose()` uses them to decide between the two
+transitions with a single guard evaluation per token.
+"""
+
+import ast
+import builtins
+
+from snakes.nets import Expression, Token, Tuple
+
+# comparison operator -> its negation (a OP b is False iff a NEG b)
+_NEGATED = {ast.Lt: ast.GtE, ast.GtE: ast.Lt, ast.Gt: ast.LtE, ast.LtE: ast.Gt,
+            ast.Eq: ast.NotEq, ast.NotEq: ast.Eq, ast.In: ast.NotIn,
+            ast.NotIn: ast.In, ast.Is: ast.IsNot, ast.IsNot: ast.Is}
+# comparison operator -> the same comparison with its operands swapped
+_MIRRORED = {ast.Lt: ast.Gt, ast.Gt: ast.Lt, ast.LtE: ast.GtE,
+             ast.GtE: ast.LtE, ast.Eq: ast.Eq, ast.NotEq: ast.NotEq}
+
+
+class CachedExpression(Expression):
+    """
+    An `Expression` evaluated through a function compiled on first use
+    (and again only if the expression is substituted or its namespace
+    replaced, e.g. when it is attached to a net's globals).
+    """
+
+    _function = None
+    _env = None
+    _required = frozenset()
+
+    def _compile(self):
+        env = self.globals._env
+        # builtins (round, len...) are only variables if the binding has them
+        names = sorted(self.vars(), key=lambda n: (hasattr(builtins, n), n))
+        params = "".join("%s=%s, " % (n, n) if hasattr(builtins, n)
+                         else "%s, " % n for n in names)
+        self._function = eval("lambda %s**_: (%s)" % (params, self._str), env)
+        self._required = frozenset(n for n in names if not hasattr(builtins, n))
+        self._env = env
+        return self._function
+
+    def __call__(self, binding):
+        function = self._function
+        if function is None or self._env is not self.globals._env:
+            function = self._compile()
+        values = binding._dict
+        try:
+            return function(**values)
+        except TypeError:
+            if values.keys() >= self._required:
+                raise               # raised by the expression itself
+        # unbound variable: let SNAKES raise its NameError
+        return Expression.bind(self, binding).value
+
+    def bind(self, binding):
+        if self._true:
+            return Token(True)
+        return Token(self(binding))
+
+    def substitute(self, binding):
+        Expression.substitute(self, binding)
+        self._function = None
+
+
+def _expressions(label):
+    """The `Expression`s in an arc annotation (nested in tuples too)."""
+    if isinstance(label, Expression):
+        yield label
+    elif isinstance(label, Tuple):
+        for component in label:
+            for expr in _expressions(component):
+                yield expr
+    elif hasattr(label, "_annotation"):         # Test, Inhibitor, Flush...
+        for expr in _expressions(label._annotation):
+            yield expr
+
+
+def cache_expressions(net):
+    """
+    Make every guard and arc `Expression` of `net` (a SNAKES `PetriNet`)
+    a `CachedExpression`, in place: the expression objects stay where
+    they are (shared by the arcs of the place and of the transition),
+    only their class changes. Returns the number of expressions switched
+    (0 when called again on the same net).
+    """
+    count = 0
+    for trans in net.transition():
+        labels = [trans.guard]
+        labels.extend(label for _, label in trans.input())
+        labels.extend(label for _, label in trans.output())
+        for label in labels:
+            for expr in _expressions(label):
+                if type(expr) is Expression and "__binding__" not in expr._str:
+                    # NetElement.__setattr__ would only store an attribute
+                    object.__setattr__(expr, "__class__", CachedExpression)
+                    count += 1
+    return count
+
+
+def _negation(node):
+    """AST of `not node`, as a comparison when it is one, else None."""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return node.operand
+    if isinstance(node, ast.Compare) and len(node.ops) == 1:
+        negated = _NEGATED.get(type(node.ops[0]))
+        if negated is not None:
+            return ast.Compare(left=node.left, ops=[negated()],
+                               comparators=node.comparators)
+    return None
+
+
+def _same(a, b):
+    """True if two expression ASTs are equal, up to a mirrored comparison."""
+    if ast.dump(a) == ast.dump(b):
+        return True
+    if (isinstance(a, ast.Compare) and isinstance(b, ast.Compare)
+            and len(a.ops) == len(b.ops) == 1):
+        mirrored = _MIRRORED.get(type(a.ops[0]))
+        return (mirrored is not None and isinstance(b.ops[0], mirrored)
+                and ast.dump(a.left) == ast.dump(b.comparators[0])
+                and ast.dump(a.comparators[0]) == ast.dump(b.left))
+    return False
+
+
+def complementary(guard, other):
+    """
+    True if the guard expressions `guard` and `other` (`Expression`s or
+    strings) are syntactically each other's negation: `not g` / `g`, or
+    a single comparison and its negated operator (`bal >= cost` /
+    `bal < cost`, also written `cost > bal`). Order comparisons assume
+    totally ordered values (no NaN).
+    """
+    a = ast.parse(str(guard).strip(), mode="eval").body
+    b = ast.parse(str(other).strip(), mode="eval").body
+    for x, y in ((a, b), (b, a)):
+        negated = _negation(x)
+        if negated is not None and _same(negated, y):
+            return True
+    return False
+
+
+def exclusive_pairs(net):
+    """
+    Pairs (t1, t2) of transition names of `net` that consume and test
+    exactly the same arcs and whose guards are `complementary()`: for
+    any binding of their inputs exactly one of the two is enabled.
+    Each transition is in at most one pair; pairs come in net order.
+    """
+    def signature(trans):
+        return sorted(((place.name, repr(label))
+                       for place, label in trans.input()))
+    pairs = []
+    paired = set()
+    transitions = list(net.transition())
+    for i, trans in enumerate(transitions):
+        if trans.name in paired or str(trans.guard) == "True":
+            continue
+        for other in transitions[i + 1:]:
+            if (other.name not in paired
+                    and signature(trans) == signature(other)
+                    and complementary(trans.guard, other.guard)):
+                pairs.append((trans.name, other.name))
+                paired.update((trans.name, other.name))
+                break
+    return pairs
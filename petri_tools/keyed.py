@@ -0,0 +1,128 @@
+"""
+Keyed places: SNAKES places whose tuple tokens are indexed by field.
+
+A plain `Place` stores tokens in a flat `MultiSet`, so finding the
+commuter `'UserA'` or the scooters parked at `'StationMain'` means
+scanning every token. `KeyedPlace` keeps, next to the `MultiSet` SNAKES
+needs, a primary index on one tuple field (e.g. UserID / ScooterID) and
+an optional secondary index on another (e.g. Location). Both indices are
+updated by `add`/`remove`/`reset`, so they stay in sync when transitions
+fire through SNAKES.
+"""
+
+from snakes.data import MultiSet, iterate
+from snakes.nets import Place
+
+
+class KeyedPlace(Place):
+    """
+    A place holding tuple tokens with at most one token per key.
+
+    key   -- tuple field used as the primary key (default: field 0)
+    index -- optional tuple field for a secondary index (e.g. 1 = Location)
+    """
+
+    def __init__(self, name, tokens=[], check=None, key=0, index=None):
+        self.key = key
+        self.index = index
+        self._by_key = {}
+        self._by_index = {}
+        Place.__init__(self, name, tokens, check)
+
+    def copy(self, name=None):
+        """Return a copy of the place (same key/index), with no arc attached."""
+        if name is None:
+            name = self.name
+        return self.__class__(name, self.tokens, self._check,
+                              key=self.key, index=self.index)
+
+    # -----------------------------------------------------------------------
+    # MARKING UPDATES (keep the indices in sync with self.tokens)
+    # -----------------------------------------------------------------------
+
+    def _insert(self, token):
+        k = token[self.key]
+        if k in self._by_key:
+            raise ValueError("place %s already holds a token with key %r"
+                             % (self.name, k))
+        self._by_key[k] = token
+        if self.index is not None:
+            self._by_index.setdefault(token[self.index], {})[k] = token
+
+    def _delete(self, token):
+        k = token[self.key]
+        if self._by_key.get(k) != token:
+            raise ValueError("token %r not in place %s" % (token, self.name))
+        del self._by_key[k]
+        if self.index is not None:
+            bucket = self._by_index[token[self.index]]
+            del bucket[k]
+            if not bucket:
+                del self._by_index[token[self.index]]
+
+    def add(self, tokens):
+        """Add tokens to the place (each token must have a fresh key)."""
+        tokens = list(iterate(tokens))
+        self.check(tokens)
+        done = []
+        try:
+            for token in tokens:
+                self._insert(token)
+                done.append(token)
+        except ValueError:
+            for token in done:
+                self._delete(token)
+            raise
+        self.tokens.add(tokens)
+
+    def remove(self, tokens):
+        """Remove tokens from the place."""
+        tokens = list(iterate(tokens))
+        for token in tokens:
+            if self._by_key.get(token[self.key]) != token:
+                raise ValueError("token %r not in place %s"
+                                 % (token, self.name))
+        for token in tokens:
+            self._delete(token)
+        self.tokens.remove(tokens)
+
+    def empty(self):
+        """Remove all the tokens."""
+        self._by_key = {}
+        self._by_index = {}
+        self.tokens = MultiSet()
+
+    def reset(self, tokens):
+        """Replace the marking with `tokens`."""
+        tokens = list(iterate(tokens))
+        self.check(tokens)
+        self.empty()
+        self.add(tokens)
+
+    # -----------------------------------------------------------------------
+    # LOOKUPS
+    # -----------------------------------------------------------------------
+
+    def get(self, key, default=None):
+        """Return the token with primary key `key` in O(1)."""
+        return self._by_key.get(key, default)
+
+    def remove_key(self, key):
+        """Remove and return the token with primary key `key` in O(1)."""
+        token = self._by_key[key]
+        self.remove([token])
+        return token
+
+    def keys(self):
+        """Return the primary keys currently in the place."""
+        return self._by_key.keys()
+
+    def select(self, value):
+        """Return the tokens whose indexed field equals `value`."""
+        if self.index is None:
+            raise ValueError("place %s has no secondary index" % self.name)
+        return list(self._by_index.get(value, {}).values())
+
+    def index_values(self):
+        """Return the distinct values of the indexed field (e.g. stations)."""
+        return self._by_index.keys()
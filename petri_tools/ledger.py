@@ -0,0 +1,200 @@
+"""
+Sink places: tokens streamed out of the marking into a ledger.
+
+Some places are only ever written, e.g. BillingHistory in Exercise 6
+collects one `(UserID, Cost, 'PAID')` token per ride and no transition
+reads it back. Kept in the marking, such a place grows with the length of
+the run and every marking copy, sync or drawing pays for it. A
+`SinkPlace` stays empty instead: the tokens added to it are handed to a
+`Ledger`, which
+
+- appends them to a CSV file in chunks of `chunk` rows (append-only, one
+  header line, read back with `read_ledger()`),
+- and/or passes them to a consumer (a callable or a started generator),
+- and keeps only running aggregates in memory: number of tokens, and per
+  key field (e.g. UserID) count and sum of a value field (e.g. Cost),
+  plus optionally the last `capacity` tokens.
+
+`CompiledNet` writes the tokens of a sink place straight to its ledger
+(the firing delta still lists them, so traces are unchanged; pass
+`sink_places(net)` to `TraceRecorder` so that its marking skips them,
+and `replay()` hands them to the ledger). The
+ledger is bound at compile time, and exploring such a net would stream
+every explored firing, so sinks are for simulation only.
+"""
+
+import csv
+import os
+from collections import deque
+
+from snakes.data import MultiSet, iterate
+from snakes.nets import Place
+
+
+class Ledger(object):
+    """
+    Append-only sink for tuple tokens.
+
+    path     -- CSV file the tokens are appended to (None: no file)
+    fields   -- column names written as the header of a new file
+    consumer -- callable(token), or a generator receiving every token
+                through send() (it is started here and closed by close())
+    key      -- tuple field the totals are grouped by (default: field 0)
+    value    -- tuple field summed per key (default: field 1)
+    capacity -- keep the last `capacity` tokens in `recent` (0: none,
+                None: all, i.e. unbounded)
+    chunk    -- rows buffered before a write to the file
+    """
+
+    def __init__(self, path=None, fields=None, consumer=None, key=0, value=1,
+                 capacity=0, chunk=1000):
+        self.path = path
+        self.key = key
+        self.value = value
+        self.chunk = chunk
+        self.count = 0
+        self.total = 0
+        self.totals = {}                # key -> [count, sum of value]
+        self.recent = deque(maxlen=capacity) if capacity is not None else deque()
+        self._keep = capacity != 0
+        self._rows = []
+        self._file = None
+        self._writer = None
+        if path is not None:
+            fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+            self._file = open(path, "a", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            if fresh and fields is not None:
+                self._writer.writerow(fields)
+        self._send = None
+        if consumer is not None:
+            if hasattr(consumer, "send"):
+                next(consumer)
+                self._send = consumer.send
+            else:
+                self._send = consumer
+        self._consumer = consumer
+
+    def append(self, token):
+        """Record one token."""
+        self.count += 1
+        amount = token[self.value]
+        self.total += amount
+        entry = self.totals.get(token[self.key])
+        if entry is None:
+            self.totals[token[self.key]] = [1, amount]
+        else:
+            entry[0] += 1
+            entry[1] += amount
+        if self._keep:
+            self.recent.append(token)
+        if self._writer is not None:
+            self._rows.append(token)
+            if len(self._rows) >= self.chunk:
+                self.flush()
+        if self._send is not None:
+            self._send(token)
+
+    def extend(self, tokens):
+        """Record several tokens."""
+        for token in tokens:
+            self.append(token)
+
+    def aggregates(self):
+        """Running aggregates as plain data (e.g. for a checkpoint)."""
+        return {"count": self.count, "total": self.total,
+                "totals": {k: list(v) for k, v in self.totals.items()}}
+
+    def restore(self, aggregates):
+        """Continue from `aggregates()` of an earlier run."""
+        self.count = aggregates["count"]
+        self.total = aggregates["total"]
+        self.totals = {k: list(v) for k, v in aggregates["totals"].items()}
+
+    def flush(self):
+        """Write the buffered rows to the file."""
+        if self._rows:
+            self._writer.writerows(self._rows)
+            self._rows = []
+            self._file.flush()
+
+    def close(self):
+        """Flush and close the file, close a generator consumer."""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+            self._writer = None
+        if self._consumer is not None and hasattr(self._consumer, "close"):
+            self._consumer.close()
+            self._consumer = self._send = None
+
+    def __str__(self):
+        return "%d tokens, total %.2f over %d keys" % (
+            self.count, self.total, len(self.totals))
+
+
+def _cell(text):
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def read_ledger(path, header=True):
+    """
+    Yield the tokens of a ledger file one by one (numbers come back as
+    int/float, anything else as str); `header` skips the first line.
+    """
+    with open(path, newline="", encoding="utf-8") as infile:
+        rows = csv.reader(infile)
+        if header:
+            next(rows, None)
+        for row in rows:
+            yield tuple(_cell(cell) for cell in row)
+
+
+def sink_places(net):
+    """{place name: Ledger} of the `SinkPlace`s of a SNAKES net."""
+    return {place.name: place.ledger for place in net.place()
+            if isinstance(place, SinkPlace)}
+
+
+class SinkPlace(Place):
+    """
+    A place whose tokens go to `ledger` (a `Ledger`) instead of its
+    marking, which stays empty. Nothing can be removed from it, so it may
+    only be the target of output arcs.
+    """
+
+    def __init__(self, name, ledger, check=None):
+        self.ledger = ledger
+        Place.__init__(self, name, [], check)
+
+    def copy(self, name=None):
+        """Return a copy of the place writing to the same ledger."""
+        if name is None:
+            name = self.name
+        return self.__class__(name, self.ledger, self._check)
+
+    def add(self, tokens):
+        """Hand `tokens` to the ledger."""
+        tokens = list(iterate(tokens))
+        self.check(tokens)
+        self.ledger.extend(tokens)
+
+    def remove(self, tokens):
+        if list(iterate(tokens)):
+            raise ValueError("cannot remove tokens from sink place %s"
+                             % self.name)
+
+    def empty(self):
+        """Nothing to remove: the marking of a sink is always empty."""
+        self.tokens = MultiSet()
+
+    def reset(self, tokens):
+        """Hand `tokens` to the ledger (the marking stays empty)."""
+        self.empty()
+        self.add(tokens)
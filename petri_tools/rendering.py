@@ -0,0 +1,204 @@
+"""
+Rendering of marking snapshots with Graphviz, on demand.
+
+`net.draw(filename)` (SNAKES gv plugin) lays the net out and spawns one
+`dot` process per call, which is far slower than firing a transition.
+`Renderer` sits between a simulation and `net.draw()` and decides, per
+snapshot, whether any Graphviz work happens:
+
+    none      never render (headless batch runs)
+    final     render only the last snapshot, when the run is closed
+    every     render every k-th snapshot (0, k, 2k, ...)
+    all       render every snapshot immediately (previous behaviour)
+    parallel  serialise every snapshot to DOT immediately and hand it to
+              a `RenderPipeline` (process pool), the simulation goes on
+    deferred  copy the marking in memory; render all snapshots at close()
+              through a `RenderPipeline`
+
+`RenderPipeline` renders identical DOT texts only once (e.g. the initial
+and final marking of Exercise 5) and copies the image for the others.
+
+Nothing Graphviz-related (gv plugin, subprocess, process pool) is
+imported before the first snapshot that needs it, so headless runs
+(mode 'none') never pay for it.
+"""
+
+import os
+import re
+
+from petri_tools.drawing import draw
+
+MODES = ('none', 'final', 'every', 'all', 'parallel', 'deferred')
+
+# The gv plugin names subgraphs after id() of Python objects
+_CLUSTER = re.compile(r"cluster_\d+")
+
+
+def render_dot(dot, filename, engine="dot"):
+    """
+    Render DOT text to `filename` (format taken from its extension),
+    the same way the gv plugin does. Returns `filename`.
+    """
+    import subprocess
+    source = filename + ".dot"
+    with open(source, "w", encoding="utf-8") as outfile:
+        outfile.write(dot)
+    try:
+        proc = subprocess.run([engine, "-T" + filename.rsplit(".", 1)[-1],
+                               "-o" + filename, source],
+                              stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              universal_newlines=True)
+    finally:
+        os.unlink(source)
+    if proc.returncode != 0:
+        raise IOError("%s exited with status %s\n%s"
+                      % (engine, proc.returncode, proc.stdout))
+    return filename
+
+
+def canonical_label(place, attr):
+    """
+    gv `place_attr` hook: list the tokens in sorted order, so that equal
+    markings give equal DOT texts whatever order the tokens arrived in.
+    """
+    tokens = sorted((repr(token) for token in place.tokens), key=str)
+    attr['label'] = "%s\\n{%s}" % (place.name, ", ".join(tokens))
+
+
+def normalise_dot(dot):
+    """Number the subgraphs in order of appearance instead of by id()."""
+    names = {}
+    return _CLUSTER.sub(
+        lambda match: names.setdefault(match.group(0),
+                                       "cluster_%d" % len(names)), dot)
+
+
+class RenderPipeline(object):
+    """
+    Renders DOT texts to image files in a pool of worker processes.
+
+    `submit()` returns at once; `close()` waits for every image. A DOT text
+    already submitted (same SHA-1) is not rendered again: its file is
+    copied to the new name once the first rendering is done.
+    """
+
+    def __init__(self, workers=None, engine="dot"):
+        from concurrent.futures import ProcessPoolExecutor
+        self.engine = engine
+        self.pool = ProcessPoolExecutor(workers or os.cpu_count() or 1)
+        self.jobs = {}        # digest -> (future, first filename)
+        self.copies = []      # (source filename, duplicate filename)
+        self.hits = 0
+
+    def submit(self, dot, filename):
+        import hashlib
+        dot = normalise_dot(dot)
+        digest = hashlib.sha1(dot.encode("utf-8")).digest()
+        job = self.jobs.get(digest)
+        if job is not None:
+            self.hits += 1
+            self.copies.append((job[1], filename))
+        else:
+            future = self.pool.submit(render_dot, dot, filename, self.engine)
+            self.jobs[digest] = (future, filename)
+
+    def close(self):
+        """Wait for the pool, write the duplicates; return all files."""
+        import shutil
+        try:
+            files = [future.result() for future, _ in self.jobs.values()]
+        finally:
+            self.pool.shutdown()
+        for source, filename in self.copies:
+            if source != filename:
+                shutil.copyfile(source, filename)
+            files.append(filename)
+        return files
+
+
+class Renderer(object):
+    """
+    Snapshot sink for a SNAKES net, drawn through petri_tools.drawing
+    (the gv plugin is loaded by the first image or DOT text).
+
+    mode    -- one of MODES
+    every   -- k for mode 'every'
+    workers -- processes of the pool of modes 'parallel' and 'deferred'
+               (default: one per CPU)
+
+    Call `snapshot(filename)` wherever the simulation used to call
+    `net.draw(filename)`, and `close()` at the end of the run.
+    """
+
+    def __init__(self, net, mode='all', every=1, workers=None, engine="dot"):
+        if mode not in MODES:
+            raise ValueError("unknown render mode %r (expected one of %s)"
+                             % (mode, ", ".join(MODES)))
+        if every < 1:
+            raise ValueError("every must be >= 1")
+        self.net = net
+        self.mode = mode
+        self.every = every
+        self.workers = workers or os.cpu_count() or 1
+        self.engine = engine
+        self.count = 0        # snapshots taken
+        self.rendered = []    # files written so far
+        self._pending = []    # (filename, Marking) waiting for close()
+        self._pipeline = None
+        if mode == 'parallel':
+            self._pipeline = RenderPipeline(self.workers, engine)
+
+    def wants(self, index):
+        """True if snapshot number `index` gets an image in this mode."""
+        if self.mode in ('all', 'parallel', 'deferred'):
+            return True
+        if self.mode == 'every':
+            return index % self.every == 0
+        return False
+
+    def snapshot(self, filename):
+        """
+        Record the current marking under `filename`. Returns True if the
+        image is written now, False if it is skipped or left for close().
+        """
+        index = self.count
+        self.count += 1
+        if self.mode == 'final':
+            self._pending = [(filename, self.net.get_marking())]
+        elif self.mode == 'deferred':
+            self._pending.append((filename, self.net.get_marking()))
+        elif self.mode == 'parallel':
+            self._pipeline.submit(self._dot(), filename)
+        elif self.wants(index):
+            draw(self.net, filename, engine=self.engine)
+            self.rendered.append(filename)
+            return True
+        return False
+
+    def _dot(self, marking=None):
+        if marking is None:
+            return draw(self.net, None, place_attr=canonical_label).dot()
+        saved = self.net.get_marking()
+        self.net.set_marking(marking)
+        try:
+            return draw(self.net, None, place_attr=canonical_label).dot()
+        finally:
+            self.net.set_marking(saved)
+
+    def close(self):
+        """Render what was left for the end of the run; return all files."""
+        pending, self._pending = self._pending, []
+        if self.mode == 'final':
+            for filename, marking in pending:
+                render_dot(self._dot(marking), filename, self.engine)
+                self.rendered.append(filename)
+        elif pending:
+            # DOT text is built here (needs the net), Graphviz runs in the pool
+            self._pipeline = RenderPipeline(self.workers, self.engine)
+            for filename, marking in pending:
+                self._pipeline.submit(self._dot(marking), filename)
+        if self._pipeline is not None:
+            pipeline, self._pipeline = self._pipeline, None
+            self.rendered.extend(pipeline.close())
+        return self.rendered
@@ -0,0 +1,280 @@
+"""
+Spatial indices for tokens parked at locations with coordinates.
+
+In a city-scale fleet net (create_city_net() in Exercise_06) every
+scooter token `(ScooterID, Station)` sits at a station with (x, y)
+coordinates, and a commuter should only reserve one of the scooters
+closest to them. Scanning ScooterPool for the closest scooter costs
+O(#scooters) per request. Here the locations that currently hold tokens
+live in a uniform grid (`GridIndex`): a nearest-neighbour query visits
+the commuter's cell and then rings of cells around it, and stops as soon
+as no unvisited ring can hold anything closer, so with about one station
+per cell a query touches a handful of cells whatever the fleet size.
+
+`SpatialIndex` groups the tokens of one place by location and keeps the
+grid in sync: a location is in the grid exactly while it holds a token.
+It follows a compiled marking through the firing deltas of
+`CompiledNet.fire()` (`apply(delta)`); `SpatialPlace` is a `KeyedPlace`
+that updates one on every SNAKES `add`/`remove`.
+"""
+
+import heapq
+import math
+
+from petri_tools.keyed import KeyedPlace
+
+
+class GridIndex(object):
+    """
+    Points (x, y) stored under hashable keys in square cells of side
+    `cell`, with k-nearest-neighbour queries.
+    """
+
+    def __init__(self, cell):
+        if cell <= 0:
+            raise ValueError("cell size must be positive, got %r" % (cell,))
+        self.cell = float(cell)
+        self._cells = {}        # (i, j) -> {key: (x, y)}
+        self._where = {}        # key -> (i, j)
+        self._box = None        # [min i, max i, min j, max j] ever occupied
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def _cell(self, x, y):
+        return (int(math.floor(x / self.cell)), int(math.floor(y / self.cell)))
+
+    def add(self, key, x, y):
+        """Insert point (x, y) under `key` (keys are unique)."""
+        if key in self._where:
+            raise ValueError("key %r already in the grid" % (key,))
+        i, j = where = self._cell(x, y)
+        self._cells.setdefault(where, {})[key] = (x, y)
+        self._where[key] = where
+        if self._box is None:
+            self._box = [i, i, j, j]
+        else:
+            box = self._box
+            box[0], box[1] = min(box[0], i), max(box[1], i)
+            box[2], box[3] = min(box[2], j), max(box[3], j)
+
+    def remove(self, key):
+        """Remove the point stored under `key`."""
+        where = self._where.pop(key)
+        points = self._cells[where]
+        del points[key]
+        if not points:
+            del self._cells[where]
+
+    def _ring(self, ci, cj, r):
+        """Cells at Chebyshev distance exactly `r` from cell (ci, cj)."""
+        if r == 0:
+            return [(ci, cj)]
+        cells = []
+        for i in range(ci - r, ci + r + 1):
+            cells.append((i, cj - r))
+            cells.append((i, cj + r))
+        for j in range(cj - r + 1, cj + r):
+            cells.append((ci - r, j))
+            cells.append((ci + r, j))
+        return cells
+
+    def nearest(self, x, y, k=1):
+        """
+        Up to `k` (distance, key) pairs closest to (x, y), nearest first.
+
+        Rings of cells are visited outwards from the cell of (x, y). A
+        point in ring r >= 1 is at least (r - 1) * cell + margin away
+        (margin: distance from (x, y) to the border of its own cell), so
+        the search stops once the k-th best distance is below that.
+        """
+        if not self._where or k <= 0:
+            return []
+        ci, cj = self._cell(x, y)
+        size = self.cell
+        margin = min(x - ci * size, (ci + 1) * size - x,
+                     y - cj * size, (cj + 1) * size - y)
+        low_i, high_i, low_j, high_j = self._box
+        limit = max(ci - low_i, high_i - ci, cj - low_j, high_j - cj, 0)
+        best = []               # max-heap of (-squared distance, seq, key)
+        seq = 0
+        cells = self._cells
+        for r in range(limit + 1):
+            if r and len(best) == k:
+                bound = (r - 1) * size + margin
+                if -best[0][0] <= bound * bound:
+                    break
+            for where in self._ring(ci, cj, r):
+                points = cells.get(where)
+                if not points:
+                    continue
+                for key, (px, py) in points.items():
+                    d2 = (px - x) ** 2 + (py - y) ** 2
+                    seq += 1
+                    if len(best) < k:
+                        heapq.heappush(best, (-d2, seq, key))
+                    elif d2 < -best[0][0]:
+                        heapq.heapreplace(best, (-d2, seq, key))
+        best.sort(key=lambda entry: (-entry[0], entry[1]))
+        return [(math.sqrt(-d2), key) for d2, _, key in best]
+
+
+class SpatialIndex(object):
+    """
+    Tuple tokens of one place grouped by a location field, with the
+    locations that hold tokens in a `GridIndex`.
+
+    positions -- {location: (x, y)}, e.g. {'Station1': (2.5, 7.0)}
+    field     -- tuple field holding the location (default: field 1)
+    place     -- place name whose entries `apply()` follows
+    tokens    -- initial tokens ({token: count} or an iterable)
+    cell      -- grid cell size (default: about one location per cell)
+    """
+
+    def __init__(self, positions, field=1, place=None, tokens=(), cell=None):
+        self.positions = dict(positions)
+        self.field = field
+        self.place = place
+        if cell is None:
+            cell = _default_cell(self.positions.values())
+        self.grid = GridIndex(cell)
+        self._parked = {}       # location -> {token: count}
+        self._count = 0
+        self.load(tokens)
+
+    def __len__(self):
+        return self._count
+
+    def add(self, token, count=1):
+        """Add `count` copies of `token`."""
+        location = token[self.field]
+        bucket = self._parked.get(location)
+        if bucket is None:
+            if location not in self.positions:
+                raise ValueError("token %r: location %r has no coordinates"
+                                 % (token, location))
+            bucket = self._parked[location] = {}
+            x, y = self.positions[location]
+            self.grid.add(location, x, y)
+        bucket[token] = bucket.get(token, 0) + count
+        self._count += count
+
+    def remove(self, token, count=1):
+        """Remove `count` copies of `token`."""
+        location = token[self.field]
+        bucket = self._parked.get(location)
+        if bucket is None or bucket.get(token, 0) < count:
+            raise ValueError("token %r not in the index" % (token,))
+        left = bucket[token] - count
+        if left:
+            bucket[token] = left
+        else:
+            del bucket[token]
+            if not bucket:
+                del self._parked[location]
+                self.grid.remove(location)
+        self._count -= count
+
+    def load(self, tokens):
+        """Replace the indexed tokens ({token: count} or an iterable)."""
+        self._parked = {}
+        self._count = 0
+        self.grid = GridIndex(self.grid.cell)
+        items = tokens.items() if hasattr(tokens, 'items') else \
+            ((token, 1) for token in tokens)
+        for token, count in items:
+            self.add(token, count)
+
+    def apply(self, delta):
+        """
+        Follow one firing: `delta` = (consumed, produced) as returned by
+        `CompiledNet.fire()`; only the entries of `self.place` are used.
+        """
+        consumed, produced = delta
+        for place, token in consumed:
+            if place == self.place:
+                self.remove(token)
+        for place, token in produced:
+            if place == self.place:
+                self.add(token)
+
+    def at(self, location):
+        """Tokens at `location` (with repetitions)."""
+        return [token for token, count in self._parked.get(location, {}).items()
+                for _ in range(count)]
+
+    def nearest(self, x, y, k=1):
+        """
+        Up to `k` tokens closest to (x, y): the tokens of the nearest
+        occupied location first, then the next location, and so on.
+        """
+        result = []
+        for _, location in self.grid.nearest(x, y, k):
+            for token, count in self._parked[location].items():
+                result.extend([token] * min(count, k - len(result)))
+                if len(result) == k:
+                    return result
+        return result
+
+
+def _default_cell(points):
+    """Cell side giving about one of `points` per cell of their bounding box."""
+    points = list(points)
+    if len(points) < 2:
+        return 1.0
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    area = (max(xs) - min(xs)) * (max(ys) - min(ys))
+    if area <= 0:
+        return max(max(xs) - min(xs), max(ys) - min(ys), 1.0)
+    return math.sqrt(area / len(points))
+
+
+class SpatialPlace(KeyedPlace):
+    """
+    A `KeyedPlace` whose secondary index field is a location with
+    coordinates; `nearest()` answers from a `SpatialIndex` that every
+    `add`/`remove` (and so every SNAKES firing) keeps up to date.
+
+    positions -- {location: (x, y)}
+    index     -- tuple field holding the location (default: field 1)
+    """
+
+    def __init__(self, name, tokens=[], check=None, key=0, index=1,
+                 positions=None):
+        if positions is None:
+            raise ValueError("place %s: positions are required" % name)
+        self.spatial = SpatialIndex(positions, field=index, place=name)
+        KeyedPlace.__init__(self, name, tokens, check, key=key, index=index)
+
+    def copy(self, name=None):
+        """Return a copy of the place (same key/index/positions), no arcs."""
+        if name is None:
+            name = self.name
+        return self.__class__(name, self.tokens, self._check, key=self.key,
+                              index=self.index,
+                              positions=self.spatial.positions)
+
+    def _insert(self, token):
+        KeyedPlace._insert(self, token)
+        try:
+            self.spatial.add(token)
+        except ValueError:
+            KeyedPlace._delete(self, token)
+            raise
+
+    def _delete(self, token):
+        KeyedPlace._delete(self, token)
+        self.spatial.remove(token)
+
+    def empty(self):
+        """Remove all the tokens."""
+        KeyedPlace.empty(self)
+        self.spatial.load(())
+
+    def nearest(self, x, y, k=1):
+        """Up to `k` tokens closest to (x, y) (see `SpatialIndex.nearest`)."""
+        return self.spatial.nearest(x, y, k)
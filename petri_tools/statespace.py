@@ -0,0 +1,184 @@
+"""
+Explicit state-space (reachability graph) exploration.
+
+Markings are never stored as SNAKES `Marking`s of `MultiSet`s. Each
+(place, token) pair met during the search gets a slot number, and a
+marking is stored as the bytes of its slot-count vector (trailing empty
+slots trimmed). That encoding is canonical (one marking = one key), hashes
+fast and costs one byte per slot. Successors are computed with the
+compiled backend (`petri_tools.CompiledNet`). `explore(...,
+reduction="stubborn")` builds a partial-order reduced graph instead;
+`explore(..., symmetry=[...])` stores one marking per class of markings
+equal up to renaming interchangeable ids (see petri_tools.symmetry).
+"""
+
+import time
+from array import array
+from collections import deque
+
+from petri_tools.compiled import CompiledNet
+from petri_tools.symmetry import Symmetry
+
+
+class MarkingEncoder(object):
+    """Canonical compact encoding of compiled markings ({place: {token: n}})."""
+
+    def __init__(self, places):
+        self.places = list(places)
+        self.slot = {place: {} for place in self.places}  # token -> slot
+        self.entries = []    # slot number -> (place, token)
+
+    def _new_slot(self, place, token):
+        index = self.slot[place][token] = len(self.entries)
+        self.entries.append((place, token))
+        return index
+
+    def encode(self, marking):
+        vector = bytearray(len(self.entries))
+        for place in self.places:
+            tokens = marking[place]
+            if not tokens:
+                continue
+            slots = self.slot[place]
+            for token, count in tokens.items():
+                index = slots.get(token)
+                if index is None:
+                    index = self._new_slot(place, token)
+                    vector.append(0)
+                if count > 254:
+                    return self._encode_wide(marking)
+                vector[index] = count
+        return bytes(vector.rstrip(b"\0"))
+
+    def _encode_wide(self, marking):
+        # Marker byte 255 + uint32 counts, only for markings that need it
+        vector = array("I", bytes(4 * len(self.entries)))
+        for place in self.places:
+            for token, count in marking[place].items():
+                vector[self.slot[place][token]] = count
+        while vector and not vector[-1]:
+            vector.pop()
+        return b"\xff" + vector.tobytes()
+
+    def decode(self, key):
+        if key[:1] == b"\xff":
+            vector = array("I")
+            vector.frombytes(key[1:])
+        else:
+            vector = key
+        marking = {place: {} for place in self.places}
+        for index, count in enumerate(vector):
+            if count:
+                place, token = self.entries[index]
+                marking[place][token] = count
+        return marking
+
+
+class StateSpace(object):
+    """Result of `explore()`: counts, deadlocks and invariant violations."""
+
+    def __init__(self, engine, encoder):
+        self.engine = engine
+        self.encoder = encoder
+        self.states = 0
+        self.edges = 0
+        self.deadlocks = []     # encoded markings without successors
+        self.violations = []    # encoded markings breaking the invariant
+        self.graph = None       # array of (src, dst) ids when keep_edges
+        self.complete = True
+        self.seconds = 0.0
+
+    @property
+    def states_per_second(self):
+        return self.states / self.seconds if self.seconds else float("inf")
+
+    def marking(self, key):
+        """Decode a stored key back to a SNAKES `Marking`."""
+        saved = self.engine.marking
+        self.engine.marking = self.encoder.decode(key)
+        try:
+            return self.engine.get_marking()
+        finally:
+            self.engine.marking = saved
+
+    def __str__(self):
+        return ("%d states, %d edges, %d deadlocks, %d violations "
+                "(%.2fs, %.0f states/s)%s"
+                % (self.states, self.edges, len(self.deadlocks),
+                   len(self.violations), self.seconds,
+                   self.states_per_second,
+                   "" if self.complete else " [truncated]"))
+
+
+def explore(net, invariant=None, max_states=None, keep_edges=False,
+            reduction=None, visible=None, symmetry=None):
+    """
+    Build the reachability graph of `net` from its current marking.
+
+    invariant  -- optional callable(marking) -> bool evaluated on every
+                  reachable marking (compiled form: {place: {token: n}})
+    max_states -- stop after this many states (result marked incomplete)
+    keep_edges -- also store the edges as an array of state ids
+    reduction  -- None (full graph) or "stubborn": partial-order reduced
+                  graph, same deadlocks and invariant verdict (see
+                  petri_tools.stubborn)
+    visible    -- with "stubborn": the places `invariant` reads
+    symmetry   -- optional list of sets of interchangeable token values
+                  (e.g. [range(1, N + 1)]): markings are canonicalised
+                  with `petri_tools.Symmetry`, so `states` counts classes.
+                  `invariant` must not tell the values apart.
+    """
+    if symmetry is not None and reduction is not None:
+        raise ValueError("symmetry and reduction=%r cannot be combined"
+                         % (reduction,))
+    if reduction == "stubborn":
+        from petri_tools.stubborn import explore_stubborn
+        return explore_stubborn(net, invariant, visible, max_states,
+                                keep_edges)
+    if reduction is not None:
+        raise ValueError("unknown reduction %r" % (reduction,))
+    engine = CompiledNet(net)
+    encoder = MarkingEncoder(engine.places)
+    result = StateSpace(engine, encoder)
+    transitions = engine.transitions
+    modes = engine.modes
+    successor = engine.successor
+    if symmetry is None:
+        encode = encoder.encode
+    else:
+        canonical = Symmetry(symmetry).canonical
+        encode = lambda marking: encoder.encode(canonical(marking))
+    if keep_edges:
+        result.graph = array("I")
+
+    start = time.perf_counter()
+    init = encode(engine.marking)
+    seen = {init: 0}
+    queue = deque([init])
+    edges = 0
+    while queue:
+        key = queue.popleft()
+        marking = encoder.decode(key)
+        if invariant is not None and not invariant(marking):
+            result.violations.append(key)
+        dead = True
+        for name in transitions:
+            for binding in modes(name, marking):
+                dead = False
+                edges += 1
+                succ = encode(successor(marking, name, binding))
+                ident = seen.get(succ)
+                if ident is None:
+                    if max_states is not None and len(seen) >= max_states:
+                        result.complete = False
+                        continue
+                    ident = seen[succ] = len(seen)
+                    queue.append(succ)
+                if keep_edges:
+                    result.graph.extend((seen[key], ident))
+        if dead:
+            result.deadlocks.append(key)
+    result.seconds = time.perf_counter() - start
+    result.states = len(seen)
+    result.edges = edges
+    return result
@@ -0,0 +1,317 @@
+"""
+Compact array-backed markings.
+
+A SNAKES `Marking` holds one `MultiSet` (a dict of Python objects) per
+place, and the compiled form `{place: {token: count}}` one dict per place;
+every copy of a marking copies all of those dicts. `CompactMarking` stores
+the same marking in a few flat arrays, with the tokens themselves kept
+once in a `Layout` shared by all markings of the net:
+
+- counter places, which can only ever hold one constant token (the
+  'available' Lock of create_net(), a place of black tokens), are one
+  integer each in a single `counts` array;
+- every other place is a sorted array of interned token ids
+  (`array('I')`, 4 bytes per token, repeated ids for multiplicities); the
+  token of an id is looked up in the layout (id -> token list per place).
+  Sorted arrays make the encoding canonical and token counts a bisection.
+
+Markings are copy-on-write: `apply()` and `fire()` return a new marking
+that shares the arrays of every place the firing did not touch, so a
+successor costs the touched places only. Tokens produced into a
+`petri_tools.ledger.SinkPlace` are not stored (the sink keeps them).
+"""
+
+import sys
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+from snakes.nets import Expression, Value
+
+from petri_tools.ledger import SinkPlace
+from petri_tools.trace import to_counts, to_marking
+
+_VARIABLE = object()    # an output arc whose token depends on the binding
+
+
+def _constant(label, env):
+    """Token produced by an output arc, or _VARIABLE if not a constant."""
+    if isinstance(label, Value):
+        return label.value
+    if isinstance(label, Expression) and not label.vars():
+        return eval(str(label), env)
+    return _VARIABLE
+
+
+class Layout(object):
+    """
+    Storage plan for the markings of `net` (a SNAKES `PetriNet`), shared
+    by every `CompactMarking` packed with it.
+
+    counters -- counter place names, in `counts` order
+    constant -- token held by each counter place
+    coloured -- the other place names, in `ids` order
+    tokens   -- per coloured place, the token of each id (interned)
+
+    A place is a counter place when its initial tokens and the tokens of
+    all its output arcs (constant `Value`s or variable-free
+    `Expression`s) are one and the same value.
+    """
+
+    def __init__(self, net):
+        env = dict(net.globals._env)
+        self.counters = []
+        self.constant = {}
+        self.coloured = []
+        self.sinks = set()
+        for place in net.place():
+            if isinstance(place, SinkPlace):
+                self.sinks.add(place.name)
+                continue
+            values = set(place.tokens)
+            for label in place.pre.values():
+                value = _constant(label, env)
+                if value is _VARIABLE:
+                    break
+                values.add(value)
+            else:
+                if len(values) == 1:
+                    self.counters.append(place.name)
+                    (self.constant[place.name],) = values
+                    continue
+            self.coloured.append(place.name)
+        self.counter_index = {p: i for i, p in enumerate(self.counters)}
+        self.coloured_index = {p: j for j, p in enumerate(self.coloured)}
+        self.tokens = [[] for _ in self.coloured]
+        self._ids = [{} for _ in self.coloured]
+        # transition -> places its modes/fire functions read or write
+        self.adjacent = {
+            trans.name: sorted(set(p.name for p, _ in trans.input())
+                               | set(p.name for p, _ in trans.output()))
+            for trans in net.transition()}
+
+    def intern(self, j, token):
+        """Id of `token` in coloured place number `j` (new ids on demand)."""
+        ids = self._ids[j]
+        ident = ids.get(token)
+        if ident is None:
+            ident = ids[token] = len(self.tokens[j])
+            self.tokens[j].append(token)
+        return ident
+
+    def token_id(self, place, token):
+        """Id of `token` in coloured `place`; ValueError if never seen."""
+        ident = self._ids[self.coloured_index[place]].get(token)
+        if ident is None:
+            raise ValueError("token %r not in place %s" % (token, place))
+        return ident
+
+    def pack(self, marking):
+        """`CompactMarking` of a SNAKES `Marking` or a compiled marking."""
+        marking = to_counts(marking)
+        counts = array("I", bytes(4 * len(self.counters)))
+        ids = []
+        for place in self.counters:
+            for token, count in marking.get(place, {}).items():
+                if token != self.constant[place]:
+                    raise ValueError("counter place %s cannot hold %r"
+                                     % (place, token))
+                counts[self.counter_index[place]] = count
+        for j, place in enumerate(self.coloured):
+            tokens = []
+            for token, count in marking.get(place, {}).items():
+                tokens.extend([self.intern(j, token)] * count)
+            tokens.sort()
+            ids.append(array("I", tokens))
+        return CompactMarking(self, counts, tuple(ids))
+
+
+class CompactMarking(object):
+    """
+    One marking packed by a `Layout`: `counts` (array of the counter
+    places) and `ids` (tuple of sorted token-id arrays of the coloured
+    places).
+    Treat it as immutable: `apply()`/`fire()` build new markings.
+    """
+
+    __slots__ = ("layout", "counts", "ids")
+
+    def __init__(self, layout, counts, ids):
+        self.layout = layout
+        self.counts = counts
+        self.ids = ids
+
+    def copy(self):
+        """A copy owning its own arrays (nothing shared)."""
+        return CompactMarking(self.layout, self.counts[:],
+                              tuple(a[:] for a in self.ids))
+
+    def count(self, place):
+        """Number of tokens in `place`."""
+        layout = self.layout
+        i = layout.counter_index.get(place)
+        if i is not None:
+            return self.counts[i]
+        if place in layout.sinks:
+            return 0
+        return len(self.ids[layout.coloured_index[place]])
+
+    def tokens(self, place):
+        """Tokens of `place` as a list (with repetitions)."""
+        layout = self.layout
+        i = layout.counter_index.get(place)
+        if i is not None:
+            return [layout.constant[place]] * self.counts[i]
+        if place in layout.sinks:
+            return []
+        j = layout.coloured_index[place]
+        names = layout.tokens[j]
+        return [names[ident] for ident in self.ids[j]]
+
+    def unpack(self, places=None):
+        """Compiled marking {place: {token: count}} (of `places` only)."""
+        layout = self.layout
+        if places is None:
+            places = layout.counters + layout.coloured + sorted(layout.sinks)
+        result = {}
+        for place in places:
+            tokens = result[place] = {}
+            for token in self.tokens(place):
+                tokens[token] = tokens.get(token, 0) + 1
+        return result
+
+    def to_marking(self):
+        """SNAKES `Marking`."""
+        return to_marking(self.unpack())
+
+    def apply(self, delta):
+        """
+        Marking after a firing with `delta` = (consumed, produced), see
+        `CompiledNet.fire()`. Only the arrays of touched places are copied.
+        """
+        layout = self.layout
+        consumed, produced = delta
+        counts = self.counts
+        ids = list(self.ids)
+        copied = set()
+        for sign, entries in ((-1, consumed), (1, produced)):
+            for place, token in entries:
+                i = layout.counter_index.get(place)
+                if i is not None:
+                    if token != layout.constant[place]:
+                        raise ValueError("counter place %s cannot hold %r"
+                                         % (place, token))
+                    if counts is self.counts:
+                        counts = counts[:]
+                    if counts[i] + sign < 0:
+                        raise ValueError("token %r not in place %s"
+                                         % (token, place))
+                    counts[i] += sign
+                    continue
+                if place in layout.sinks:
+                    continue
+                j = layout.coloured_index[place]
+                if j not in copied:
+                    ids[j] = ids[j][:]
+                    copied.add(j)
+                if sign > 0:
+                    insort(ids[j], layout.intern(j, token))
+                    continue
+                tokens = ids[j]
+                ident = layout.token_id(place, token)
+                k = bisect_left(tokens, ident)
+                if k == len(tokens) or tokens[k] != ident:
+                    raise ValueError("token %r not in place %s"
+                                     % (token, place))
+                del tokens[k]
+        return CompactMarking(layout, counts, tuple(ids))
+
+    def modes(self, engine, name):
+        """Modes of transition `name` (a `CompiledNet` of the same net)."""
+        return engine.modes(name, self.unpack(self.layout.adjacent[name]))
+
+    def fire(self, engine, name, binding):
+        """
+        Fire `name` with `binding` through `engine` (a `CompiledNet` of the
+        same net); return (successor marking, delta). The compiled fire
+        function runs on `_View`s of the adjacent places, so nothing is
+        unpacked: it only asks for the tokens of the binding.
+        """
+        views = {place: _View(self, place)
+                 for place in self.layout.adjacent[name]}
+        delta = engine.fire(name, binding, views)
+        return self.apply(delta), delta
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactMarking) or other.layout is not self.layout:
+            return NotImplemented
+        return self.counts == other.counts and self.ids == other.ids
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash((self.counts.tobytes(),)
+                    + tuple(a.tobytes() for a in self.ids))
+
+    def sizeof(self):
+        """Bytes owned by this marking (arrays, tuple, object; not the layout)."""
+        return (sys.getsizeof(self) + sys.getsizeof(self.counts)
+                + sys.getsizeof(self.ids)
+                + sum(sys.getsizeof(a) for a in self.ids))
+
+
+class _View(object):
+    """
+    The dict interface the compiled fire functions use on one place
+    ({token: count} lookups and updates), answered from a `CompactMarking`
+    without unpacking it; updates stay in the view.
+    """
+
+    __slots__ = ("marking", "place", "changed")
+
+    def __init__(self, marking, place):
+        self.marking = marking
+        self.place = place
+        self.changed = {}
+
+    def _base(self, token):
+        marking, place = self.marking, self.place
+        layout = marking.layout
+        i = layout.counter_index.get(place)
+        if i is not None:
+            return marking.counts[i] if token == layout.constant[place] else 0
+        if place in layout.sinks:
+            return 0
+        j = layout.coloured_index[place]
+        ident = layout._ids[j].get(token)
+        if ident is None:
+            return 0
+        tokens = marking.ids[j]
+        return bisect_right(tokens, ident) - bisect_left(tokens, ident)
+
+    def get(self, token, default=None):
+        count = self.changed[token] if token in self.changed \
+            else self._base(token)
+        return count if count else default
+
+    def __getitem__(self, token):
+        count = self.get(token)
+        if count is None:
+            raise KeyError(token)
+        return count
+
+    def __setitem__(self, token, count):
+        self.changed[token] = count
+
+    def __delitem__(self, token):
+        self.changed[token] = 0
+
+    def __contains__(self, token):
+        return self.get(token) is not None
+
+    def __bool__(self):
+        total = self.marking.count(self.place)
+        for token, count in self.changed.items():
+            total += count - self._base(token)
+        return total > 0
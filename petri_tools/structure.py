@@ -0,0 +1,324 @@
+"""
+Structural analysis: incidence matrix, P- and T-invariants, bounds.
+
+Nothing here fires a transition. The incidence matrix C (places x
+transitions, C[p, t] = tokens t puts into p minus tokens it takes out)
+is read off the arcs once, and everything follows from linear algebra:
+
+- a P-invariant is a weight vector y >= 0 with y . C = 0: the weighted
+  token sum y . M is the same in every reachable marking M
+  (Exercise 5: Lock + Writing = 1, so Writing never holds two tokens)
+- a place covered by a P-invariant is bounded by (y . M0) / y[p]
+- a T-invariant is a firing count vector x >= 0 with C . x = 0: firing
+  those transitions that often returns to the same marking
+
+Invariants are the minimal-support semi-positive ones, computed with the
+Farkas algorithm on sparse integer rows (NumPy holds the matrix and does
+the checks). Test and inhibitor arcs move no tokens, so they are not in C.
+
+`analyse()` accepts a SNAKES net, where a place counts all of its tokens
+whatever their colour (one arc moves one token, a `MultiArc` one per
+component), or a `petri_tools.expand.PTNet`, where every (place, token)
+pair is a place of its own and the invariants can tell processes apart.
+"""
+
+import heapq
+import time
+from math import gcd
+
+import numpy as np
+from snakes.nets import Inhibitor, MultiArc, Test, Tuple
+
+from petri_tools.expand import PTNet
+
+
+class Structure(object):
+    """
+    Result of `analyse()`.
+
+    places, transitions -- row / column labels of the incidence matrix
+    rows, cols, values  -- the non-zero entries of C (NumPy arrays)
+    initial             -- token count per place in the initial marking
+    p_invariants        -- list of {place index: weight}
+    t_invariants        -- list of {transition index: count}
+    bounds              -- per place, the smallest bound implied by a
+                           P-invariant, or None if no invariant covers it
+    """
+
+    def __init__(self, places, transitions, entries, initial):
+        self.places = list(places)
+        self.transitions = list(transitions)
+        entries = sorted(entries.items())
+        self.rows = np.array([r for (r, _), _ in entries], dtype=np.int64)
+        self.cols = np.array([c for (_, c), _ in entries], dtype=np.int64)
+        self.values = np.array([v for _, v in entries], dtype=np.int64)
+        self.initial = np.array(initial, dtype=np.int64)
+        self.p_invariants = []
+        self.t_invariants = []
+        self.bounds = [None] * len(self.places)
+        self.seconds = 0.0
+
+    def matrix(self):
+        """Dense incidence matrix (only sensible for small nets)."""
+        result = np.zeros((len(self.places), len(self.transitions)),
+                          dtype=np.int64)
+        result[self.rows, self.cols] = self.values
+        return result
+
+    def _vector(self, weights, labels):
+        if isinstance(weights, dict):
+            index = {label: i for i, label in enumerate(labels)}
+            vector = np.zeros(len(labels), dtype=np.int64)
+            for label, weight in weights.items():
+                vector[index[label]] = weight
+            return vector
+        return np.asarray(weights, dtype=np.int64)
+
+    def is_p_invariant(self, weights):
+        """
+        Weighted token sum conserved by every transition? `weights` is
+        {place: weight} (or a vector). Returns the conserved total
+        (y . M0), or None if some transition changes the sum.
+        """
+        y = self._vector(weights, self.places)
+        change = np.bincount(self.cols, weights=y[self.rows] * self.values,
+                             minlength=len(self.transitions))
+        if change.any():
+            return None
+        return int(y @ self.initial)
+
+    def is_t_invariant(self, counts):
+        """True if firing each transition `counts` times changes nothing."""
+        x = self._vector(counts, self.transitions)
+        change = np.bincount(self.rows, weights=x[self.cols] * self.values,
+                             minlength=len(self.places))
+        return not change.any()
+
+    def total(self, invariant):
+        """Conserved weighted token sum of a P-invariant."""
+        return sum(weight * int(self.initial[p])
+                   for p, weight in invariant.items())
+
+    @property
+    def conservative(self):
+        """Every place is covered by a P-invariant (the net is bounded)."""
+        return all(bound is not None for bound in self.bounds)
+
+    @property
+    def uncovered(self):
+        """Places no P-invariant bounds."""
+        return [self.places[p] for p, bound in enumerate(self.bounds)
+                if bound is None]
+
+    def law(self, invariant):
+        """P-invariant as text, e.g. 'Lock + Writing = 1'."""
+        terms = []
+        for p, weight in sorted(invariant.items()):
+            name = label(self.places[p])
+            terms.append(name if weight == 1 else "%d*%s" % (weight, name))
+        return "%s = %d" % (" + ".join(terms), self.total(invariant))
+
+    def cycle(self, invariant):
+        """T-invariant as text, e.g. 'StartRead + EndRead + ...'."""
+        terms = []
+        for t, count in sorted(invariant.items()):
+            name = label(self.transitions[t])
+            terms.append(name if count == 1 else "%d*%s" % (count, name))
+        return " + ".join(terms)
+
+    def __str__(self):
+        return ("%d places, %d transitions, %d P-invariants, %d T-invariants, "
+                "%d/%d places bounded (%.2fs)"
+                % (len(self.places), len(self.transitions),
+                   len(self.p_invariants), len(self.t_invariants),
+                   len(self.places) - len(self.uncovered), len(self.places),
+                   self.seconds))
+
+
+def label(name):
+    """Printable place / transition label ('Writing', "Lock['available']")."""
+    if isinstance(name, tuple):
+        return "%s[%r]" % name
+    return str(name)
+
+
+def _weight(label):
+    """Tokens one firing moves through an arc."""
+    # a Tuple is a MultiArc too, but produces one (tuple) token
+    if isinstance(label, MultiArc) and not isinstance(label, Tuple):
+        return sum(_weight(component) for component in label)
+    return 1
+
+
+def incidence(net):
+    """
+    Structure (no invariants yet) of a SNAKES net or a `PTNet`.
+    """
+    entries = {}
+    if isinstance(net, PTNet):
+        for t in range(len(net.instances)):
+            for slot, count in net.pre[t]:
+                entries[slot, t] = entries.get((slot, t), 0) - count
+            for slot, count in net.post[t]:
+                entries[slot, t] = entries.get((slot, t), 0) + count
+        transitions = ["%s(%s)" % (name, ", ".join(
+                           "%s=%r" % item for item in sorted(binding.items())))
+                       for name, binding in net.instances]
+        places, initial = net.slots, net.initial
+    else:
+        places = [place.name for place in net.place()]
+        row = {name: i for i, name in enumerate(places)}
+        transitions = [trans.name for trans in net.transition()]
+        for t, trans in enumerate(net.transition()):
+            for place, label in trans.input():
+                if not isinstance(label, (Test, Inhibitor)):
+                    key = (row[place.name], t)
+                    entries[key] = entries.get(key, 0) - _weight(label)
+            for place, label in trans.output():
+                key = (row[place.name], t)
+                entries[key] = entries.get(key, 0) + _weight(label)
+        initial = [len(place.tokens) for place in net.place()]
+    return Structure(places, transitions,
+                     {key: value for key, value in entries.items() if value},
+                     initial)
+
+
+def _normalise(a, y):
+    """Divide both parts of a Farkas row by the gcd of all its entries."""
+    divisor = 0
+    for value in a.values():
+        divisor = gcd(divisor, value)
+    for value in y.values():
+        divisor = gcd(divisor, value)
+    if divisor > 1:
+        a = {key: value // divisor for key, value in a.items()}
+        y = {key: value // divisor for key, value in y.items()}
+    return a, y
+
+
+def farkas(matrix_rows, size, max_rows=100000):
+    """
+    Minimal-support solutions y >= 0, y != 0, of y . A = 0.
+
+    matrix_rows -- per row i of A (0 <= i < size), a dict {column: value}
+                   of its non-zero entries
+    Returns a list of dicts {row: weight} with coprime integer weights.
+
+    Columns are eliminated cheapest first (fewest positive x negative row
+    pairs, re-estimated when a column comes up); combinations whose support contains the support of another
+    row are dropped. Raises ValueError if more than `max_rows`
+    intermediate rows are needed.
+    """
+    rows = {}               # id -> (A part, y part), both sparse dicts
+    by_col = {}             # column -> {id: value}
+    by_y = {}               # row of A -> ids whose y part uses it
+    counter = [0]
+
+    def add(a, y):
+        ident = counter[0]
+        counter[0] += 1
+        rows[ident] = (a, y)
+        for col, value in a.items():
+            by_col.setdefault(col, {})[ident] = value
+        for i in y:
+            by_y.setdefault(i, set()).add(ident)
+        return ident
+
+    def remove(ident):
+        a, y = rows.pop(ident)
+        for col in a:
+            del by_col[col][ident]
+        for i in y:
+            by_y[i].discard(ident)
+
+    def dominated(support):
+        # some row's support is contained in `support`
+        for i in support:
+            for ident in by_y.get(i, ()):
+                if rows[ident][1].keys() <= support:
+                    return True
+        return False
+
+    def dominating(support):
+        # rows whose support strictly contains `support`
+        rarest = min(support, key=lambda i: len(by_y.get(i, ())))
+        return [ident for ident in by_y.get(rarest, ())
+                if rows[ident][1].keys() > support]
+
+    def cost(col):
+        entries = by_col.get(col, {})
+        pos = sum(1 for value in entries.values() if value > 0)
+        return pos * (len(entries) - pos)
+
+    for i in range(size):
+        add(dict(matrix_rows[i]), {i: 1})
+    heap = [(cost(col), col) for col in by_col]
+    heapq.heapify(heap)
+    done = set()
+    while heap:
+        estimate, col = heapq.heappop(heap)
+        if col in done:
+            continue
+        actual = cost(col)
+        if actual > estimate:
+            heapq.heappush(heap, (actual, col))
+            continue
+        done.add(col)
+        entries = by_col.pop(col, {})
+        pos = [(ident, value) for ident, value in entries.items() if value > 0]
+        neg = [(ident, value) for ident, value in entries.items() if value < 0]
+        combined = []
+        for i, vi in pos:
+            ai, yi = rows[i]
+            for k, vk in neg:
+                ak, yk = rows[k]
+                a = {key: -vk * value for key, value in ai.items()}
+                for key, value in ak.items():
+                    a[key] = a.get(key, 0) + vi * value
+                a = {key: value for key, value in a.items()
+                     if value and key != col}
+                y = {key: -vk * value for key, value in yi.items()}
+                for key, value in yk.items():
+                    y[key] = y.get(key, 0) + vi * value
+                combined.append((a, y))
+        for ident in entries:
+            a, _ = rows[ident]
+            del a[col]      # already gone from by_col
+            remove(ident)
+        combined.sort(key=lambda row: len(row[1]))
+        for a, y in combined:
+            if dominated(y.keys()):
+                continue
+            for ident in dominating(y.keys()):
+                remove(ident)
+            a, y = _normalise(a, y)
+            add(a, y)
+            if len(rows) > max_rows:
+                raise ValueError("Farkas algorithm needs more than %d rows"
+                                 % max_rows)
+    return [y for a, y in rows.values() if not a]
+
+
+def analyse(net, max_rows=100000):
+    """
+    Incidence matrix, minimal P- and T-invariants and place bounds of a
+    SNAKES net (colour-blind token counts) or a `PTNet`.
+    """
+    start = time.perf_counter()
+    result = incidence(net)
+    by_place = [{} for _ in result.places]
+    by_trans = [{} for _ in result.transitions]
+    for p, t, value in zip(result.rows.tolist(), result.cols.tolist(),
+                           result.values.tolist()):
+        by_place[p][t] = value
+        by_trans[t][p] = value
+    result.p_invariants = farkas(by_place, len(result.places), max_rows)
+    result.t_invariants = farkas(by_trans, len(result.transitions), max_rows)
+    for invariant in result.p_invariants:
+        total = result.total(invariant)
+        for p, weight in invariant.items():
+            bound = total // weight
+            if result.bounds[p] is None or bound < result.bounds[p]:
+                result.bounds[p] = bound
+    result.seconds = time.perf_counter() - start
+    return result
@@ -0,0 +1,202 @@
+"""
+Partial-order reduction of the state space with stubborn sets.
+
+Transitions of different processes that touch disjoint places (StartRead
+of P1 and of P2 in Exercise 5) can fire in any order, and a plain search
+(`explore()`) visits every interleaving of them. A stubborn set is a set
+of transition instances, computed per state, such that nothing outside it
+can disable or be disabled by what is inside it before one of its own
+enabled instances fires. Exploring only the enabled instances of a
+stubborn set keeps every deadlock, and with the two provisos below (only
+applied when an invariant is checked) every violation of a state invariant:
+
+- visibility: an instance that changes a `visible` place (one the
+  invariant reads) drags in every visible instance
+- cycle (stack proviso): a state is fully expanded when a reduced
+  successor closes a cycle on the depth-first search stack, so no
+  enabled instance is ignored forever
+
+The analysis runs on the P/T expansion of the net (`petri_tools.expand`),
+where "touch the same place" means "touch the same (place, token) slot".
+"""
+
+import time
+from array import array
+
+from petri_tools.compiled import CompiledNet
+from petri_tools.expand import expand
+from petri_tools.statespace import StateSpace
+
+
+class StubbornSets(object):
+    """
+    Stubborn-set computation for a `PTNet`.
+
+    visible -- places whose marking the checked property depends on
+    """
+
+    def __init__(self, ptnet, visible=()):
+        self.ptnet = ptnet
+        count = len(ptnet.instances)
+        reads = []
+        writes = []
+        for t in range(count):
+            pre = dict(ptnet.pre[t])
+            post = dict(ptnet.post[t])
+            reads.append(set(pre) | set(dict(ptnet.test[t]))
+                         | set(ptnet.inhibit[t]))
+            writes.append(set(slot for slot in set(pre) | set(post)
+                              if pre.get(slot, 0) != post.get(slot, 0)))
+        slots = len(ptnet.slots)
+        readers = [set() for _ in range(slots)]
+        writers = [set() for _ in range(slots)]
+        self.producers = [[] for _ in range(slots)]
+        self.consumers = [[] for _ in range(slots)]
+        for t in range(count):
+            pre = dict(ptnet.pre[t])
+            post = dict(ptnet.post[t])
+            for slot in reads[t]:
+                readers[slot].add(t)
+            for slot in writes[t]:
+                writers[slot].add(t)
+                if post.get(slot, 0) > pre.get(slot, 0):
+                    self.producers[slot].append(t)
+                else:
+                    self.consumers[slot].append(t)
+        # Two instances are dependent when one writes a slot the other
+        # reads or writes: they may disable each other or not commute
+        self.dependent = []
+        for t in range(count):
+            deps = set()
+            for slot in writes[t]:
+                deps |= readers[slot] | writers[slot]
+            for slot in reads[t]:
+                deps |= writers[slot]
+            deps.discard(t)
+            self.dependent.append(sorted(deps))
+        shown = set(visible)
+        self.visible = [t for t in range(count)
+                        if any(ptnet.slots[slot][0] in shown
+                               for slot in writes[t])]
+        self._is_visible = set(self.visible)
+
+    def _scapegoat(self, marking, t):
+        """Instances that must fire before disabled `t` can become enabled."""
+        ptnet = self.ptnet
+        best = None
+        for slot, count in ptnet.pre[t] + ptnet.test[t]:
+            if marking[slot] < count:
+                if best is None or len(self.producers[slot]) < len(best):
+                    best = self.producers[slot]
+        for slot in ptnet.inhibit[t]:
+            if marking[slot]:
+                if best is None or len(self.consumers[slot]) < len(best):
+                    best = self.consumers[slot]
+        return best
+
+    def _closure(self, marking, seed, enabled):
+        stubborn = {seed}
+        work = [seed]
+        with_visible = False
+        while work:
+            t = work.pop()
+            if t in enabled:
+                more = self.dependent[t]
+                if not with_visible and t in self._is_visible:
+                    with_visible = True
+                    more = more + self.visible
+            else:
+                more = self._scapegoat(marking, t)
+            for u in more:
+                if u not in stubborn:
+                    stubborn.add(u)
+                    work.append(u)
+        return stubborn
+
+    def reduced(self, marking, enabled):
+        """
+        Enabled instances (subset of `enabled`, a list) of the stubborn
+        set with the fewest enabled instances among those seeded by each
+        enabled instance.
+        """
+        if len(enabled) <= 1:
+            return enabled
+        members = set(enabled)
+        best = enabled
+        for seed in enabled:
+            stubborn = self._closure(marking, seed, members)
+            fire = [t for t in enabled if t in stubborn]
+            if len(fire) < len(best):
+                best = fire
+                if len(best) == 1:
+                    break
+        return best
+
+
+def explore_stubborn(net, invariant=None, visible=None, max_states=None,
+                     keep_edges=False):
+    """
+    Reduced reachability graph of `net` (depth-first, stubborn sets).
+
+    Same arguments and result as `explore()`, plus `visible`: the places
+    `invariant` depends on (default: every place when an invariant is
+    given, which is always sound but reduces less). State ids in
+    `graph` are ids of the reduced graph; keys are `PTNet` slot vectors.
+    """
+    ptnet = expand(net)
+    if visible is None:
+        visible = ptnet.places if invariant is not None else ()
+    sets = StubbornSets(ptnet, visible)
+    result = StateSpace(CompiledNet(net), ptnet)
+    if keep_edges:
+        result.graph = array("I")
+    instances = range(len(ptnet.instances))
+    enabled_in = ptnet.enabled
+    fire = ptnet.fire
+
+    def expand_state(key):
+        enabled = [t for t in instances if enabled_in(key, t)]
+        if not enabled:
+            result.deadlocks.append(key)
+            return []
+        chosen = sets.reduced(key, enabled)
+        succs = [fire(key, t) for t in chosen]
+        # Cycle proviso, needed for invariants only (deadlocks are kept
+        # without it): never close a cycle on the stack with a reduced set
+        if (invariant is not None and len(chosen) < len(enabled)
+                and any(s in on_stack for s in succs)):
+            succs = [fire(key, t) for t in enabled]
+        return succs
+
+    start = time.perf_counter()
+    init = bytes(ptnet.initial)
+    seen = {init: 0}
+    on_stack = {init}
+    if invariant is not None and not invariant(ptnet.decode(init)):
+        result.violations.append(init)
+    stack = [(init, iter(expand_state(init)))]
+    edges = 0
+    while stack:
+        key, successors = stack[-1]
+        succ = next(successors, None)
+        if succ is None:
+            stack.pop()
+            on_stack.discard(key)
+            continue
+        edges += 1
+        ident = seen.get(succ)
+        if ident is None:
+            if max_states is not None and len(seen) >= max_states:
+                result.complete = False
+                continue
+            ident = seen[succ] = len(seen)
+            if invariant is not None and not invariant(ptnet.decode(succ)):
+                result.violations.append(succ)
+            on_stack.add(succ)
+            stack.append((succ, iter(expand_state(succ))))
+        if keep_edges:
+            result.graph.extend((seen[key], ident))
+    result.seconds = time.perf_counter() - start
+    result.states = len(seen)
+    result.edges = edges
+    return result
@@ -0,0 +1,357 @@
+"""
+Symbolic state-space exploration with binary decision diagrams.
+
+`explore()` stores every reachable marking, which for the lock net with N
+processes means 3^N + N * 3^(N-1) byte strings. Here a set of markings is
+a reduced ordered BDD over one boolean variable per place of a safe P/T
+net (the expansion of `petri_tools.expand`: one variable per (place,
+token) slot). Sets with regular structure ("every process is in one of
+three places, at most one writes") have BDDs with a few nodes per
+process, whatever the number of markings in them.
+
+The reachable set is a fixed point: R = init, then R |= image_t(R) for
+every transition instance t (chained, so one sweep may fire several
+transitions) until R stops changing. image_t needs no primed variables
+for a safe net: keep the markings that enable t, cofactor the variables
+t changes to their required values, conjoin their new values.
+
+Only safe nets are supported (at most one token per slot); a firing that
+would put a second token into a slot raises ValueError. `BDD` is a small
+pure-Python package: nodes are integers, operations are memoised per call.
+"""
+
+import sys
+import time
+
+from petri_tools.expand import PTNet, expand
+
+
+class BDD(object):
+    """
+    Manager of reduced ordered BDDs over variables 0 .. count-1 (0 is the
+    top of the order). Nodes are ints: 0 is False, 1 is True.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.var = [count, count]   # terminals sit below every variable
+        self.low = [0, 1]
+        self.high = [0, 1]
+        self.unique = {}
+        # The recursive operations go at most one frame per variable deep
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * count + 1000))
+
+    def __len__(self):
+        return len(self.var)
+
+    def node(self, var, low, high):
+        """The node `if var then high else low` (reduced, shared)."""
+        if low == high:
+            return low
+        key = (var, low, high)
+        ident = self.unique.get(key)
+        if ident is None:
+            ident = self.unique[key] = len(self.var)
+            self.var.append(var)
+            self.low.append(low)
+            self.high.append(high)
+        return ident
+
+    def cube(self, assignment):
+        """Conjunction of literals, `assignment` = {var: bool}."""
+        result = 1
+        for var in sorted(assignment, reverse=True):
+            if assignment[var]:
+                result = self.node(var, 0, result)
+            else:
+                result = self.node(var, result, 0)
+        return result
+
+    def conj(self, a, b):
+        memo = {}
+        var, low, high = self.var, self.low, self.high
+
+        def rec(a, b):
+            if a == 0 or b == 0:
+                return 0
+            if a == 1 or a == b:
+                return b
+            if b == 1:
+                return a
+            if a > b:
+                a, b = b, a
+            key = (a, b)
+            result = memo.get(key)
+            if result is None:
+                va, vb = var[a], var[b]
+                top = min(va, vb)
+                a0, a1 = (low[a], high[a]) if va == top else (a, a)
+                b0, b1 = (low[b], high[b]) if vb == top else (b, b)
+                result = memo[key] = self.node(top, rec(a0, b0), rec(a1, b1))
+            return result
+
+        return rec(a, b)
+
+    def disj(self, a, b):
+        memo = {}
+        var, low, high = self.var, self.low, self.high
+
+        def rec(a, b):
+            if a == 1 or b == 1:
+                return 1
+            if a == 0 or a == b:
+                return b
+            if b == 0:
+                return a
+            if a > b:
+                a, b = b, a
+            key = (a, b)
+            result = memo.get(key)
+            if result is None:
+                va, vb = var[a], var[b]
+                top = min(va, vb)
+                a0, a1 = (low[a], high[a]) if va == top else (a, a)
+                b0, b1 = (low[b], high[b]) if vb == top else (b, b)
+                result = memo[key] = self.node(top, rec(a0, b0), rec(a1, b1))
+            return result
+
+        return rec(a, b)
+
+    def neg(self, a):
+        memo = {0: 1, 1: 0}
+
+        def rec(a):
+            result = memo.get(a)
+            if result is None:
+                result = memo[a] = self.node(self.var[a], rec(self.low[a]),
+                                             rec(self.high[a]))
+            return result
+
+        return rec(a)
+
+    def cofactor(self, a, assignment):
+        """`a` with the variables of `assignment` ({var: bool}) fixed."""
+        memo = {}
+        last = max(assignment) if assignment else -1
+
+        def rec(a):
+            var = self.var[a]
+            if var > last:
+                return a
+            result = memo.get(a)
+            if result is None:
+                value = assignment.get(var)
+                if value is None:
+                    result = self.node(var, rec(self.low[a]),
+                                       rec(self.high[a]))
+                else:
+                    result = rec(self.high[a] if value else self.low[a])
+                memo[a] = result
+            return result
+
+        return rec(a)
+
+    def at_least(self, variables, k):
+        """At least `k` of `variables` are true."""
+        order = sorted(variables)
+        # below[j]: at least j true among the variables built so far
+        below = [1] + [0] * k
+        for var in reversed(order):
+            below = [1] + [self.node(var, below[j], below[j - 1])
+                           for j in range(1, k + 1)]
+        return below[k]
+
+    def size(self, a):
+        """Number of nodes reachable from `a` (terminals included)."""
+        seen = set()
+        stack = [a]
+        while stack:
+            n = stack.pop()
+            if n not in seen:
+                seen.add(n)
+                if n > 1:
+                    stack.append(self.low[n])
+                    stack.append(self.high[n])
+        return len(seen)
+
+    def satcount(self, a):
+        """Number of assignments of all `count` variables satisfying `a`."""
+        memo = {0: 0, 1: 1}
+
+        def rec(a):
+            result = memo.get(a)
+            if result is None:
+                var = self.var[a]
+                low, high = self.low[a], self.high[a]
+                result = memo[a] = (
+                    rec(low) << (self.var[low] - var - 1)) + (
+                    rec(high) << (self.var[high] - var - 1))
+            return result
+
+        return rec(a) << self.var[a]
+
+    def pick(self, a):
+        """One satisfying assignment {var: bool} (unlisted vars: False)."""
+        if a == 0:
+            return None
+        result = {}
+        while a > 1:
+            if self.low[a] != 0:
+                result[self.var[a]] = False
+                a = self.low[a]
+            else:
+                result[self.var[a]] = True
+                a = self.high[a]
+        return result
+
+
+class SymbolicSpace(object):
+    """
+    Result of `reachable()`.
+
+    bdd       -- the BDD manager (variable i = slot order[i] of the PTNet)
+    reached   -- BDD node of the reachable set
+    order     -- slot number per variable
+    """
+
+    def __init__(self, ptnet, bdd, order):
+        self.ptnet = ptnet
+        self.bdd = bdd
+        self.order = order
+        self.var = {slot: i for i, slot in enumerate(order)}
+        self.reached = 0
+        self.iterations = 0
+        self.seconds = 0.0
+
+    @property
+    def states(self):
+        return self.bdd.satcount(self.reached)
+
+    @property
+    def nodes(self):
+        return self.bdd.size(self.reached)
+
+    def variables(self, places):
+        """BDD variables of every slot of `places` (coloured place names)."""
+        wanted = set(places)
+        return [self.var[slot] for slot, (place, _) in
+                enumerate(self.ptnet.slots) if place in wanted]
+
+    def marking(self, node):
+        """One marking of the set `node` (compiled form), or None."""
+        assignment = self.bdd.pick(node)
+        if assignment is None:
+            return None
+        vector = [0] * len(self.ptnet.slots)
+        for var, value in assignment.items():
+            if value:
+                vector[self.order[var]] = 1
+        return self.ptnet.decode(vector)
+
+    def at_least(self, places, count=2):
+        """Reachable markings with `count` or more tokens in `places`."""
+        return self.bdd.conj(self.reached,
+                             self.bdd.at_least(self.variables(places), count))
+
+    def deadlocks(self):
+        """Reachable markings enabling no transition instance."""
+        enabled = 0
+        for t in range(len(self.ptnet.instances)):
+            enabled = self.bdd.disj(enabled, self.bdd.cube(_enabling(self, t)))
+        return self.bdd.conj(self.reached, self.bdd.neg(enabled))
+
+    def __str__(self):
+        return ("%d states in %d BDD nodes (%d variables, %d sweeps, "
+                "%d nodes allocated, %.2fs)"
+                % (self.states, self.nodes, len(self.order), self.iterations,
+                   len(self.bdd), self.seconds))
+
+
+def _enabling(space, t):
+    """{var: bool} an enabling marking of instance `t` must satisfy."""
+    ptnet, var = space.ptnet, space.var
+    needed = {}
+    for slot, count in ptnet.pre[t] + ptnet.test[t]:
+        if count > 1:
+            raise ValueError("instance %r needs %d tokens in a safe slot"
+                             % (ptnet.instances[t], count))
+        needed[var[slot]] = True
+    for slot in ptnet.inhibit[t]:
+        needed[var[slot]] = False
+    return needed
+
+
+def _variable_order(ptnet):
+    """Slots grouped by token (all places of process 1, then 2, ...)."""
+    rank = {}
+    for place, token in ptnet.slots:
+        rank.setdefault(token, len(rank))
+    return sorted(range(len(ptnet.slots)),
+                  key=lambda slot: (rank[ptnet.slots[slot][1]], slot))
+
+
+def reachable(net, max_sweeps=None):
+    """
+    Reachable set of `net` (a SNAKES net, expanded with
+    `petri_tools.expand`, or a safe `PTNet`) as a `SymbolicSpace`.
+    """
+    ptnet = net if isinstance(net, PTNet) else expand(net)
+    start = time.perf_counter()
+    if any(count > 1 for count in ptnet.initial):
+        raise ValueError("net is not safe: initial marking")
+    order = _variable_order(ptnet)
+    bdd = BDD(len(order))
+    space = SymbolicSpace(ptnet, bdd, order)
+    var = space.var
+
+    steps = []
+    for t in range(len(ptnet.instances)):
+        enabling = _enabling(space, t)
+        pre = dict(ptnet.pre[t])
+        post = dict(ptnet.post[t])
+        keep = {}       # conditions on variables t does not change
+        change = {}     # required value of each variable t changes
+        result = {}     # new value of each variable t changes
+        produced = []
+        for slot in set(pre) | set(post):
+            if pre.get(slot, 0) == post.get(slot, 0):
+                continue
+            if post.get(slot, 0) > 1:
+                raise ValueError("instance %r puts %d tokens in a slot"
+                                 % (ptnet.instances[t], post[slot]))
+            change[var[slot]] = bool(pre.get(slot, 0))
+            result[var[slot]] = bool(post.get(slot, 0))
+            if post.get(slot, 0):
+                produced.append(var[slot])
+        for v, value in enabling.items():
+            if v not in change:
+                keep[v] = value
+        steps.append((bdd.cube(keep), change, bdd.cube(result), produced, t))
+
+    def image(states, step):
+        keep, change, result, produced, t = step
+        enabled = bdd.conj(states, keep)
+        if enabled == 0:
+            return 0
+        for v in produced:
+            # a token already there would make the slot hold two
+            occupied = dict(change)
+            occupied[v] = True
+            if bdd.cofactor(enabled, occupied) != 0:
+                raise ValueError("net is not safe: %r adds a second token to "
+                                 "%r" % (ptnet.instances[t],
+                                         ptnet.slots[space.order[v]]))
+        return bdd.conj(bdd.cofactor(enabled, change), result)
+
+    reached = bdd.cube({var[slot]: bool(count)
+                        for slot, count in enumerate(ptnet.initial)})
+    while max_sweeps is None or space.iterations < max_sweeps:
+        space.iterations += 1
+        before = reached
+        for step in steps:
+            reached = bdd.disj(reached, image(reached, step))
+        if reached == before:
+            break
+    space.reached = reached
+    space.seconds = time.perf_counter() - start
+    return space
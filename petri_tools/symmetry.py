@@ -0,0 +1,188 @@
+"""
+Symmetry reduction of the state space.
+
+Process ids 1..N in Exercise 5 and scooter / commuter ids in Exercise 6
+are only ever copied from arc to arc: no arc, guard or initial token
+tells "Scooter1" from "Scooter2" except through the other fields it is
+stored with. Renaming such ids consistently in a marking gives a marking
+with the same behaviour (same deadlocks, same verdict for an invariant
+that does not name ids either), yet a plain search visits every renaming.
+
+`Symmetry` maps a marking to a representative of its class: every
+declared value is described by the tokens it occurs in (place, token
+with the value masked, count), the values of a set are sorted by that
+description and renamed, in that order, to the first values of the set.
+When every token holds at most one symmetric value (the lock net) the
+representative is canonical. When a token holds several (Exercise 6:
+`ReservedState` holds a user and a scooter), tied values are described
+again with the class of the other values they share tokens with, until
+the classes stop splitting (colour refinement). Values still tied after
+that keep their original order, so a class may keep a few
+representatives: fewer states are merged, none wrongly.
+
+Declaring a set is a claim about the net: its values must not appear as
+constants in arcs or guards (e.g. the `p <= writers` guard of
+create_scaled_net(read_ratio=...) tells writers from readers, so writers
+and readers must be declared as two sets).
+"""
+
+
+class _Self(object):
+    """Placeholder for the described value inside a masked token."""
+
+    def __repr__(self):
+        return "<self>"
+
+
+class _Other(object):
+    """Placeholder for another value of symmetric set `group` (and class)."""
+
+    def __init__(self, group, colour=None):
+        self.group = group
+        self.colour = colour
+
+    def __repr__(self):
+        if self.colour is None:
+            return "<set %d>" % self.group
+        return "<set %d:%d>" % (self.group, self.colour)
+
+
+_SELF = _Self()
+
+
+class Symmetry(object):
+    """
+    Canonicalisation of compiled markings ({place: {token: n}}) under
+    permutations of each declared set of interchangeable values.
+
+    sets -- iterable of iterables of atomic token values (ints, strings),
+            e.g. [range(1, N + 1)] or [scooter_ids, user_ids]. Values may
+            appear alone or inside (nested) tuple tokens.
+    """
+
+    def __init__(self, sets):
+        self.groups = []
+        self.group_of = {}
+        for index, values in enumerate(sets):
+            group = list(values)
+            for value in group:
+                if value.__class__ is tuple:
+                    raise ValueError("symmetric value %r is not atomic"
+                                     % (value,))
+                if value in self.group_of:
+                    raise ValueError("value %r declared in two sets"
+                                     % (value,))
+                self.group_of[value] = index
+            self.groups.append(group)
+        self._others = [_Other(i) for i in range(len(self.groups))]
+        # (place, token, count) -> ((value, description), ...)
+        self._described = {}
+
+    def _values(self, token, found):
+        """Collect the symmetric values of `token` (nested tuples) in `found`."""
+        if token.__class__ is tuple:
+            for item in token:
+                self._values(item, found)
+        elif token in self.group_of:
+            found.append(token)
+
+    def _mask(self, token, value):
+        if token.__class__ is tuple:
+            return tuple(self._mask(item, value) for item in token)
+        if token == value:
+            return _SELF
+        group = self.group_of.get(token)
+        return token if group is None else self._others[group]
+
+    def _rename(self, token, mapping):
+        if token.__class__ is tuple:
+            return tuple(self._rename(item, mapping) for item in token)
+        return mapping.get(token, token)
+
+    def _describe(self, place, token, count):
+        found = []
+        self._values(token, found)
+        return tuple((value, repr((place, self._mask(token, value), count)))
+                     for value in set(found))
+
+    def _paint(self, token, value, colour):
+        if token.__class__ is tuple:
+            return tuple(self._paint(item, value, colour) for item in token)
+        if token == value:
+            return _SELF
+        group = self.group_of.get(token)
+        return token if group is None else _Other(group, colour[token])
+
+    def _classes(self, keys):
+        """Class number per present value of each group, from sort keys."""
+        colour = {}
+        for group in self.groups:
+            present = sorted((keys[value], value) for value in group
+                             if value in keys)
+            rank, last = -1, None
+            for key, value in present:
+                if key != last:
+                    rank, last = rank + 1, key
+                colour[value] = rank
+        return colour
+
+    def _count(self, colour):
+        return len(set((self.group_of[value], rank)
+                       for value, rank in colour.items()))
+
+    def _tied(self, colour, values):
+        seen = set()
+        for value in values:
+            key = (self.group_of[value], colour[value])
+            if key in seen:
+                return True
+            seen.add(key)
+        return False
+
+    def canonical(self, marking):
+        """Representative of `marking` (a new dict, or `marking` itself)."""
+        described = self._described
+        contexts = {}
+        shared = {}     # value -> tokens it shares with other symmetric values
+        for place, tokens in marking.items():
+            for token, count in tokens.items():
+                key = (place, token, count)
+                pairs = described.get(key)
+                if pairs is None:
+                    pairs = described[key] = self._describe(place, token, count)
+                for value, text in pairs:
+                    contexts.setdefault(value, []).append(text)
+                    if len(pairs) > 1:
+                        shared.setdefault(value, []).append(key)
+        keys = {value: sorted(texts) for value, texts in contexts.items()}
+        colour = self._classes(keys)
+        classes = self._count(colour)
+        while shared and self._tied(colour, contexts):
+            for value, occurrences in shared.items():
+                keys[value] = (colour[value], sorted(
+                    repr((place, self._paint(token, value, colour), count))
+                    for place, token, count in occurrences))
+            for value in contexts:
+                if value not in shared:
+                    keys[value] = (colour[value], [])
+            colour = self._classes(keys)
+            refined = self._count(colour)
+            if refined == classes:
+                break
+            classes = refined
+        mapping = {}
+        for group in self.groups:
+            present = [value for value in group if value in colour]
+            present.sort(key=colour.__getitem__)
+            for old, new in zip(present, group):
+                if old != new:
+                    mapping[old] = new
+        if not mapping:
+            return marking
+        result = {}
+        for place, tokens in marking.items():
+            renamed = {}
+            for token, count in tokens.items():
+                renamed[self._rename(token, mapping)] = count
+            result[place] = renamed
+        return result
@@ -0,0 +1,233 @@
+"""
+Firing traces as compact delta records.
+
+Printing every place after every step costs more than the simulation
+itself on large nets. A `TraceRecorder` instead logs each firing as one
+record: transition, binding, and the (place, token) pairs it consumed and
+produced. The records go to an in-memory ring buffer and/or a JSONL file;
+the marking at any recorded step is rebuilt by replaying the deltas onto
+the initial marking. Printing is just one optional consumer of the records
+(`print_firing`).
+
+Markings are in the compiled form `{place: {token: count}}`, see
+`petri_tools.CompiledNet`. `snakes_fire()` gives the same delta for a
+firing on the SNAKES path.
+"""
+
+import json
+from collections import deque, namedtuple
+
+from snakes.nets import Marking, MultiSet, Substitution
+
+Firing = namedtuple("Firing", "step transition binding consumed produced")
+
+
+def snakes_fire(net, name, binding):
+    """
+    Fire transition `name` of a SNAKES net like `Transition.fire()` and
+    return its delta `(consumed, produced)` as tuples of (place, token).
+    """
+    if not isinstance(binding, Substitution):
+        binding = Substitution(**binding)
+    consumed, produced = net.transition(name).flow(binding)
+    for place, tokens in consumed.items():
+        net.place(place).remove(tokens)
+    for place, tokens in produced.items():
+        net.place(place).add(tokens)
+    return (tuple((place, token) for place, tokens in consumed.items()
+                  for token in tokens),
+            tuple((place, token) for place, tokens in produced.items()
+                  for token in tokens))
+
+
+def to_counts(marking):
+    """Copy a SNAKES `Marking` (or compiled marking) to {place: {token: n}}."""
+    if isinstance(marking, Marking):
+        # dict.items: MultiSet.items() repeats tokens, domain() is a set
+        return {place: dict(dict.items(tokens))
+                for place, tokens in marking.items()}
+    return {place: dict(tokens) for place, tokens in marking.items()}
+
+
+def to_marking(counts):
+    """Convert {place: {token: n}} to a SNAKES `Marking`."""
+    result = Marking()
+    for place, tokens in counts.items():
+        if tokens:
+            ms = MultiSet()
+            for token, count in tokens.items():
+                ms.add([token], count)
+            result[place] = ms
+    return result
+
+
+def apply_delta(marking, consumed, produced, sinks=()):
+    """
+    Replay one delta onto a compiled marking, in place. Tokens produced
+    into the places named in `sinks` (sink places, see
+    petri_tools.ledger) are left out.
+    """
+    for place, token in consumed:
+        tokens = marking[place]
+        count = tokens[token] - 1
+        if count:
+            tokens[token] = count
+        else:
+            del tokens[token]
+    for place, token in produced:
+        if place in sinks:
+            continue
+        tokens = marking.setdefault(place, {})
+        tokens[token] = tokens.get(token, 0) + 1
+
+
+# ---------------------------------------------------------------------------
+# JSON ENCODING (tokens are str/int/float/bool or tuples of them)
+# ---------------------------------------------------------------------------
+
+def _dump(value):
+    if isinstance(value, tuple):
+        return [_dump(v) for v in value]
+    return value
+
+
+def _load(value):
+    if isinstance(value, list):
+        return tuple(_load(v) for v in value)
+    return value
+
+
+def _dump_marking(marking):
+    return {place: [[_dump(token), count] for token, count in tokens.items()]
+            for place, tokens in marking.items()}
+
+
+def _load_marking(data):
+    return {place: {_load(token): count for token, count in tokens}
+            for place, tokens in data.items()}
+
+
+def _dump_firing(record):
+    return json.dumps([record.step, record.transition,
+                       {k: _dump(v) for k, v in record.binding.items()},
+                       [[p, _dump(t)] for p, t in record.consumed],
+                       [[p, _dump(t)] for p, t in record.produced]],
+                      separators=(",", ":"))
+
+
+def _load_firing(line):
+    step, transition, binding, consumed, produced = json.loads(line)
+    return Firing(step, transition,
+                  {k: _load(v) for k, v in binding.items()},
+                  tuple((p, _load(t)) for p, t in consumed),
+                  tuple((p, _load(t)) for p, t in produced))
+
+
+def read_trace(path):
+    """
+    Read a JSONL trace written by `TraceRecorder(path=...)`.
+    Returns (initial marking, list of `Firing` records).
+    """
+    with open(path, encoding="utf-8") as infile:
+        initial = _load_marking(json.loads(infile.readline())["initial"])
+        return initial, [_load_firing(line) for line in infile if line.strip()]
+
+
+# ---------------------------------------------------------------------------
+# RECORDER
+# ---------------------------------------------------------------------------
+
+class TraceRecorder(object):
+    """
+    Log of firings, starting from `initial` (a SNAKES `Marking` or a
+    compiled marking; it is copied).
+
+    capacity -- keep only the last `capacity` records in memory (ring
+                buffer); older markings can then no longer be rebuilt,
+                0 keeps none (e.g. when only the file is wanted)
+    path     -- also append every record to this JSONL file (first line:
+                the initial marking)
+    sinks    -- names of sink places (e.g. `petri_tools.ledger.sink_places(
+                net)`): their tokens stay in the records but not in the
+                rebuilt markings, as in the net
+
+    `marking` is the current marking, kept up to date delta by delta.
+    Records with transition None are marking changes made outside the
+    net (e.g. advance_clock() in Exercise 6).
+    """
+
+    def __init__(self, initial, capacity=None, path=None, sinks=()):
+        self.marking = to_counts(initial)
+        self.sinks = frozenset(sinks)
+        self.records = deque()
+        self.capacity = capacity
+        self.steps = 0
+        self.consumers = []
+        # Marking before the oldest record still in memory
+        self._base = to_counts(self.marking)
+        self._base_step = 0
+        self._file = None
+        if path is not None:
+            self._file = open(path, "w", encoding="utf-8")
+            self._file.write(json.dumps(
+                {"initial": _dump_marking(self.marking)}) + "\n")
+
+    def subscribe(self, consumer):
+        """Call `consumer(record)` for every record from now on."""
+        self.consumers.append(consumer)
+
+    def record(self, name, binding, delta):
+        """Log the firing of `name` with `binding` and its delta."""
+        if isinstance(binding, Substitution):
+            binding = binding.dict()
+        consumed, produced = delta
+        self.steps += 1
+        record = Firing(self.steps, name, dict(binding), consumed, produced)
+        apply_delta(self.marking, consumed, produced, self.sinks)
+        if self.capacity == 0:
+            self._base_step = self.steps
+        else:
+            self.records.append(record)
+        if self.capacity and len(self.records) > self.capacity:
+            old = self.records.popleft()
+            apply_delta(self._base, old.consumed, old.produced, self.sinks)
+            self._base_step = old.step
+        if self._file is not None:
+            self._file.write(_dump_firing(record) + "\n")
+        for consumer in self.consumers:
+            consumer(record)
+        return record
+
+    def tokens(self, place):
+        """Tokens of `place` in the current marking (with repetitions)."""
+        return [token for token, count in self.marking.get(place, {}).items()
+                for _ in range(count)]
+
+    def marking_at(self, step):
+        """Rebuild the marking after `step` firings (0 = initial)."""
+        if step == self.steps:
+            return to_counts(self.marking)
+        if not self._base_step <= step <= self.steps:
+            raise ValueError("step %d not in the recorded window %d..%d"
+                             % (step, self._base_step, self.steps))
+        marking = to_counts(self._base)
+        for record in self.records:
+            if record.step > step:
+                break
+            apply_delta(marking, record.consumed, record.produced,
+                        self.sinks)
+        return marking
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def print_firing(record):
+    """Consumer printing one line per firing: -consumed +produced."""
+    print("    #%d %s %s: %s" % (
+        record.step, record.transition or "(outside the net)",
+        ", ".join("%s=%r" % item for item in sorted(record.binding.items())),
+        " ".join(["-%s:%r" % item for item in record.consumed]
+                 + ["+%s:%r" % item for item in record.produced])))
@@ -0,0 +1,356 @@
+"""
+Net unfoldings: complete finite prefixes of safe nets.
+
+`explore()` stores one state per interleaving of concurrent firings. An
+unfolding stores each firing once, as an event, together with the
+conditions (tokens) it consumes and produces. Events never share a token
+unless they are causally ordered or in conflict, so N processes reading
+independently cost N events, not 3^N states. The unfolding is cut
+(McMillan): an event whose local configuration (the event and all its
+causes) reaches a marking already reached by a smaller local
+configuration is a cut-off, and nothing is appended after it. The result
+is a complete prefix: every reachable marking is the marking of a
+configuration of the prefix, and every transition enabled there has an
+event in the prefix.
+
+The construction works on the P/T expansion of the net
+(`petri_tools.expand`), which must be safe (at most one token per
+(place, token) slot; checked while unfolding). Test arcs become
+consume-and-produce loops. Inhibitor arcs become tests on complement
+places ("slot is empty"), which is exact for safe slots.
+
+Questions answered on the prefix:
+
+- `coverable(places, 2)`: can two tokens be in `places` at once? Two
+  conditions are in some reachable marking together iff they are
+  concurrent (co-relation, kept as integer bit masks).
+- `deadlock()`: a configuration without cut-off events whose marking
+  enables no event of the prefix (backtracking over events, McMillan's
+  method). Returns a firing sequence to the dead marking.
+"""
+
+import heapq
+import time
+
+from petri_tools.expand import PTNet, expand
+
+
+def _bits(mask):
+    """Indices of the set bits of `mask`."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Prefix(object):
+    """
+    Complete finite prefix built by `unfold()`.
+
+    conditions  -- P/T place per condition: a PTNet slot number, or
+                   ('not', slot) for a complement place
+    producer    -- event per condition (None: initial condition)
+    events      -- PTNet instance per event
+    preset      -- tuple of condition ids per event
+    postset     -- tuple of condition ids per event
+    cutoff      -- per event, True for cut-off events
+    co          -- per condition, bit mask of the concurrent conditions
+    """
+
+    def __init__(self, ptnet):
+        self.ptnet = ptnet
+        self.conditions = []
+        self.producer = []
+        self.consumers = []
+        self.co = []
+        self.events = []
+        self.preset = []
+        self.postset = []
+        self.cutoff = []
+        self.local = []     # per event, bit mask of its local configuration
+        self.complete = True
+        self.seconds = 0.0
+
+    # -----------------------------------------------------------------------
+    # QUERIES
+    # -----------------------------------------------------------------------
+
+    def _configuration(self, conditions):
+        """Events needed to produce `conditions`, in causal order."""
+        mask = 0
+        for b in conditions:
+            if self.producer[b] is not None:
+                mask |= self.local[self.producer[b]]
+        return list(_bits(mask))
+
+    def sequence(self, events):
+        """Firing sequence [(transition, binding)] of a set of events."""
+        return [self.ptnet.instances[self.events[e]] for e in sorted(events)]
+
+    def marking(self, events):
+        """Compiled marking ({place: {token: n}}) of a configuration."""
+        slots = self._cut(events)
+        vector = [0] * len(self.ptnet.slots)
+        for label in slots:
+            if label.__class__ is int:
+                vector[label] += 1
+        return self.ptnet.decode(vector)
+
+    def _cut(self, events):
+        """Labels of the conditions marked after `events` (a configuration)."""
+        marked = set(b for b, e in enumerate(self.producer)
+                     if e is None or e in events)
+        for e in events:
+            marked.difference_update(self.preset[e])
+        return [self.conditions[b] for b in marked]
+
+    def coverable(self, places, count=2):
+        """
+        Firing sequence to a reachable marking with at least `count`
+        tokens in `places` (names of the coloured net), or None.
+        """
+        wanted = set(places)
+        candidates = [b for b, label in enumerate(self.conditions)
+                      if label.__class__ is int
+                      and self.ptnet.slots[label][0] in wanted]
+
+        def extend(chosen, allowed, start):
+            if len(chosen) == count:
+                return chosen
+            for i in range(start, len(candidates)):
+                b = candidates[i]
+                if allowed >> b & 1:
+                    found = extend(chosen + [b], allowed & self.co[b], i + 1)
+                    if found is not None:
+                        return found
+            return None
+
+        found = extend([], -1, 0)
+        if found is None:
+            return None
+        return self.sequence(self._configuration(found))
+
+    def deadlock(self):
+        """
+        Firing sequence to a dead reachable marking, or None.
+
+        Events are decided in order (which is causal order) as in or out
+        of a configuration C. An event is out when a cause is out or when
+        C already consumes one of its preset conditions; both leave it
+        disabled. Otherwise it may go in (unless it is a cut-off) or stay
+        out, and then C must consume one of its preset conditions later.
+        """
+        count = len(self.events)
+        state = [None] * count          # True: in C, False: out
+        consumed = [False] * len(self.conditions)
+        pending = []                    # out events that must end disabled
+
+        def doomed(e):
+            # no preset condition of `e` can still be consumed by C
+            for b in self.preset[e]:
+                if consumed[b]:
+                    return False
+                for f in self.consumers[b]:
+                    if state[f] is None:
+                        return False
+            return True
+
+        def options(e):
+            for b in self.preset[e]:
+                producer = self.producer[b]
+                if producer is not None and not state[producer] or consumed[b]:
+                    return ["out"]
+            return ["wait"] if self.cutoff[e] else ["in", "wait"]
+
+        def apply(e, option):
+            state[e] = option == "in"
+            if option == "in":
+                for b in self.preset[e]:
+                    consumed[b] = True
+            elif option == "wait":
+                pending.append(e)
+
+        def undo(e, option):
+            if option == "in":
+                for b in self.preset[e]:
+                    consumed[b] = False
+            elif option == "wait":
+                pending.pop()
+            state[e] = None
+
+        stack = []      # [event, remaining options, applied option]
+        e = 0
+        while True:
+            if not any(doomed(p) for p in pending):
+                if e == count:
+                    return self.sequence(f for f in range(count) if state[f])
+                stack.append([e, iter(options(e)), None])
+            while stack:
+                top = stack[-1]
+                if top[2] is not None:
+                    undo(top[0], top[2])
+                top[2] = next(top[1], None)
+                if top[2] is not None:
+                    apply(top[0], top[2])
+                    e = top[0] + 1
+                    break
+                stack.pop()
+            else:
+                return None
+
+    def __str__(self):
+        return ("%d events (%d cut-offs), %d conditions (%.2fs)%s"
+                % (len(self.events), sum(self.cutoff), len(self.conditions),
+                   self.seconds, "" if self.complete else " [truncated]"))
+
+
+def _safe_net(ptnet):
+    """
+    Plain P/T transitions (pre, post label tuples) of a PTNet: test arcs
+    as loops, inhibitor arcs as tests on complement places.
+    """
+    inhibited = set()
+    for slots in ptnet.inhibit:
+        inhibited.update(slots)
+    transitions = []
+    for t in range(len(ptnet.instances)):
+        pre = dict(ptnet.pre[t])
+        post = dict(ptnet.post[t])
+        labels_pre = []
+        labels_post = []
+        for slot, count in ptnet.pre[t] + ptnet.test[t]:
+            labels_pre.extend([slot] * count)
+        for slot, count in ptnet.post[t] + ptnet.test[t]:
+            labels_post.extend([slot] * count)
+        for slot in inhibited:
+            change = post.get(slot, 0) - pre.get(slot, 0)
+            blocked = slot in ptnet.inhibit[t]
+            if blocked or change > 0:
+                labels_pre.append(("not", slot))
+            if blocked and change <= 0 or change < 0:
+                labels_post.append(("not", slot))
+        transitions.append((tuple(labels_pre), tuple(labels_post)))
+    initial = [slot for slot, count in enumerate(ptnet.initial)
+               for _ in range(count)]
+    initial += [("not", slot) for slot in sorted(inhibited)
+                if not ptnet.initial[slot]]
+    return transitions, initial
+
+
+def unfold(net, max_events=100000):
+    """
+    McMillan complete finite prefix of `net` (a SNAKES net, expanded with
+    `petri_tools.expand`, or a `PTNet`) from its current marking.
+
+    Raises ValueError if the net is not safe. Stops after `max_events`
+    events (result marked incomplete).
+    """
+    ptnet = net if isinstance(net, PTNet) else expand(net)
+    start = time.perf_counter()
+    transitions, initial = _safe_net(ptnet)
+    prefix = Prefix(ptnet)
+    if len(set(initial)) != len(initial):
+        raise ValueError("net is not safe: initial marking %r" % (initial,))
+    uses = {}           # label -> transitions with it in their preset
+    for t, (pre, _) in enumerate(transitions):
+        for label in set(pre):
+            uses.setdefault(label, []).append(t)
+    by_label = {}       # label -> bit mask of its conditions
+    seen = {frozenset(initial): 0}      # marking -> smallest local size
+    queue = []
+    queued = set()
+    counter = [0]
+
+    def add_conditions(labels, event, co):
+        """
+        New conditions, concurrent with `co` and with each other. Those of
+        a cut-off event are not entered in `by_label`: no event of the
+        prefix consumes them.
+        """
+        if len(set(labels)) != len(labels):
+            raise ValueError("net is not safe: two tokens in %r" % (labels,))
+        first = len(prefix.conditions)
+        siblings = ((1 << len(labels)) - 1) << first
+        for i, label in enumerate(labels):
+            b = first + i
+            if co & by_label.get(label, 0):
+                raise ValueError("net is not safe: two concurrent tokens "
+                                 "in %r" % (label,))
+            prefix.conditions.append(label)
+            prefix.producer.append(event)
+            prefix.consumers.append([])
+            prefix.co.append(co | (siblings & ~(1 << b)))
+        if event is None or not prefix.cutoff[event]:
+            for i, label in enumerate(labels):
+                by_label[label] = by_label.get(label, 0) | 1 << (first + i)
+        for c in _bits(co):
+            prefix.co[c] |= siblings
+        return list(range(first, first + len(labels)))
+
+    def extensions(b):
+        """Queue the events that can consume `b` with concurrent conditions."""
+        label = prefix.conditions[b]
+        for t in uses.get(label, ()):
+            pre = list(transitions[t][0])
+            pre.remove(label)
+
+            def choose(rest, allowed, chosen):
+                if not rest:
+                    preset = tuple(sorted(chosen))
+                    if (t, preset) in queued:
+                        return
+                    queued.add((t, preset))
+                    local = 0
+                    for c in preset:
+                        if prefix.producer[c] is not None:
+                            local |= prefix.local[prefix.producer[c]]
+                    size = bin(local).count("1") + 1
+                    counter[0] += 1
+                    heapq.heappush(queue, (size, counter[0], t, preset, local))
+                    return
+                for c in _bits(by_label.get(rest[0], 0) & allowed):
+                    choose(rest[1:], allowed & prefix.co[c], chosen + [c])
+
+            choose(pre, prefix.co[b], [b])
+
+    for b in add_conditions(initial, None, 0):
+        extensions(b)
+
+    while queue:
+        if len(prefix.events) >= max_events:
+            prefix.complete = False
+            break
+        size, _, t, preset, local = heapq.heappop(queue)
+        e = len(prefix.events)
+        local |= 1 << e
+        prefix.events.append(t)
+        prefix.preset.append(preset)
+        prefix.local.append(local)
+        for b in preset:
+            prefix.consumers[b].append(e)
+        # marking of the local configuration
+        events = set(_bits(local))
+        events.discard(e)
+        marked = prefix._cut(events)
+        for b in preset:
+            marked.remove(prefix.conditions[b])
+        marked.extend(transitions[t][1])
+        key = frozenset(marked)
+        smallest = seen.get(key)
+        cutoff = smallest is not None and smallest < size
+        if smallest is None:
+            seen[key] = size
+        prefix.cutoff.append(cutoff)
+        # postset: concurrent with what the preset was concurrent with
+        co = -1
+        for b in preset:
+            co &= prefix.co[b]
+        for b in preset:
+            co &= ~(1 << b)
+        postset = add_conditions(transitions[t][1], e, co)
+        prefix.postset.append(tuple(postset))
+        if not cutoff:
+            for b in postset:
+                extensions(b)
+    prefix.seconds = time.perf_counter() - start
+    return prefix